@@ -382,21 +382,65 @@ def clone(
 
 @app.command()
 def index(
-    path: str = typer.Argument(".", help="Path to index for RAG.")
+    path: str = typer.Argument(".", help="Path to index for RAG."),
+    full: bool = typer.Option(False, "--full", help="Re-parse every file instead of only changed ones."),
+    jobs: int = typer.Option(1, "--jobs", "-j", help="Parse files in N worker processes (0 = one per CPU)."),
+    export_json: Optional[str] = typer.Option(None, "--export-json", help="Also export the index as JSON to this file."),
+    watch: bool = typer.Option(False, "--watch", "-w", help="Keep running and re-index files as they are saved."),
+    sharded: Optional[bool] = typer.Option(None, "--sharded/--no-sharded", help="Split the index by top-level directory (default: keep the current layout)."),
+    memory_limit: int = typer.Option(256, "--memory-limit", help="MB of parsed data kept in memory during a rebuild before spilling to disk (0 = no limit).")
 ):
     """
     Build a local vector index (RAG) for the project.
     """
     console.print(Panel(f"🔍 [bold blue]Axion[/] is indexing: [yellow]{path}[/]", title="Index Mode"))
     try:
-        indexer = CodeIndexer(path)
+        indexer = CodeIndexer(path, jobs=jobs, sharded=sharded, memory_limit=memory_limit * 1024 * 1024)
         with console.status("[bold green]Indexing project files..."):
-            indexer.index_project()
+            stats = indexer.index_project(full=full)
+            if export_json:
+                indexer.export_json(export_json)
+        console.print(
+            f"[dim]{stats['added']} added, {stats['modified']} modified, "
+            f"{stats['deleted']} deleted, {stats['unchanged']} unchanged[/]"
+        )
         console.print("[bold green]✅ Indexing complete! Semantic search is now active.[/]")
+        if watch:
+            from axion.core.watch import IndexWatcher
+            watcher = IndexWatcher(indexer)
+            console.print(f"[dim]Watching for changes ({watcher.mode}). Press Ctrl+C to stop.[/]")
+            watcher.run(on_update=lambda stats: console.print(
+                f"[green]↻ Re-indexed:[/] {stats['added']} added, {stats['modified']} modified, {stats['deleted']} deleted"
+            ))
+    except KeyboardInterrupt:
+        console.print("[yellow]Index watcher stopped.[/]")
     except Exception as e:
         console.print(f"[bold red]Indexing failed:[/] {e}")
         raise typer.Exit(code=1)
 
+@app.command()
+def grep(
+    pattern: str = typer.Argument(..., help="Text (or regex with --regex) to search for."),
+    path: str = typer.Argument(".", help="Indexed project to search."),
+    regex: bool = typer.Option(False, "--regex", "-E", help="Treat the pattern as a regular expression."),
+    ignore_case: bool = typer.Option(False, "--ignore-case", "-i", help="Case-insensitive matching."),
+    max_results: int = typer.Option(100, "--max-results", "-n", help="Stop after N matching lines.")
+):
+    """
+    Search code contents through the trigram index built by 'axion index'.
+    """
+    try:
+        matches = CodeIndexer(path).grep(pattern, regex=regex, ignore_case=ignore_case, max_results=max_results)
+    except Exception as e:
+        console.print(f"[bold red]Search failed:[/] {e}")
+        raise typer.Exit(code=1)
+    if not matches:
+        console.print("[yellow]No matches.[/]")
+        return
+    for match in matches:
+        console.print(f"[cyan]{match['path']}[/]:[green]{match['line']}[/]: ", end="")
+        console.print(match["text"].strip(), markup=False, highlight=False)
+
 @app.command()
 def test():
     """
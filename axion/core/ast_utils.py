@@ -1,77 +1,759 @@
 import tree_sitter_python as tspython
 from tree_sitter import Language, Parser
+import hashlib
+import json
+import os
 import pathlib
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
+from axion.core.search import tokenize
+from axion.core.languages import GRAMMARS, PYTHON, LanguageSpec, language_of, load_language
+
+# Definitions longer than this are indexed as a head plus method-level chunks
+CHUNK_LINES = 80
+DEFINITION_TYPES = ("class_definition", "function_definition", "decorated_definition")
+# Bumped whenever get_definitions output changes, so on-disk results are not reused
+DEFINITIONS_FORMAT = 2
+# Nodes whose children may be statements, hence definitions; everything else is skipped
+STATEMENT_CONTAINERS = frozenset({
+    "module", "block", "ERROR", "decorated_definition", "class_definition", "function_definition",
+    "if_statement", "elif_clause", "else_clause", "for_statement", "while_statement",
+    "try_statement", "except_clause", "except_group_clause", "finally_clause",
+    "with_statement", "match_statement", "case_clause",
+})
+# Source bytes whose parse trees are kept in memory (trees are several times larger)
+PARSE_CACHE_BYTES = 32 * 1024 * 1024
+# Files modified more recently than this are re-hashed instead of trusting their stat
+RACY_MTIME_NS = 2 * 10**9
+# On-disk size of the definitions cache; least recently used results are evicted beyond it
+DEFINITIONS_CACHE_BYTES = 64 * 1024 * 1024
+
+_language: Optional[Language] = None
+
+
+def python_language() -> Language:
+    """The Python grammar, loaded once per process."""
+    global _language
+    if _language is None:
+        _language = Language(tspython.language())
+    return _language
+
+
+class ParseCache:
+    """
+    Thread-safe LRU of parse trees keyed by language and the SHA-1 of the
+    parsed bytes, bounded by the total size of those bytes. Shared by every ASTParser of
+    the process, so the indexer and ContextBuilder never parse the same
+    content twice. Cached trees must not be edited in place (copy them).
+    """
+    def __init__(self, max_bytes: int = PARSE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Tuple[str, bytes], Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, content: bytes, language: str = PYTHON) -> Optional[Any]:
+        key = (language, hashlib.sha1(content).digest())
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def parse(self, parser: Parser, content: bytes, old_tree: Any = None, language: str = PYTHON) -> Any:
+        """Cached tree of `content`; a miss is parsed, incrementally from `old_tree` if given."""
+        key = (language, hashlib.sha1(content).digest())
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            self.misses += 1
+        tree = parser.parse(content, old_tree) if old_tree is not None else parser.parse(content)
+        if len(content) <= self.max_bytes:
+            with self._lock:
+                if key not in self._items:
+                    self._items[key] = (tree, len(content))
+                    self.size += len(content)
+                while self.size > self.max_bytes:
+                    _, (_, size) = self._items.popitem(last=False)
+                    self.size -= size
+        return tree
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+
+parse_cache = ParseCache()
+
+class SourceFile(NamedTuple):
+    content: bytes
+    # Byte offset of every line start, followed by len(content)
+    line_starts: List[int]
+    # SHA-1 of content (hex)
+    digest: str
+
+
+class SourceCache:
+    """
+    Thread-safe LRU of file contents with their line-offset tables, bounded
+    by the total size of the contents. A file is re-read only when its stat
+    changed (or is too recent to be trusted), and its table is rebuilt only
+    when its content hash changed.
+    """
+    def __init__(self, max_bytes: int = PARSE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: "OrderedDict[str, Tuple[Optional[Tuple[int, int]], SourceFile]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_path: str) -> Optional[SourceFile]:
+        key = os.path.abspath(file_path)
+        try:
+            st = os.stat(key)
+        except OSError:
+            return None
+        # A file modified within the timestamp granularity may change again unnoticed
+        settled = time.time_ns() - st.st_mtime_ns > RACY_MTIME_NS
+        stamp = (st.st_mtime_ns, st.st_size) if settled else None
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and stamp is not None and item[0] == stamp:
+                self._items.move_to_end(key)
+                return item[1]
+        with open(key, "rb") as f:
+            content = f.read()
+        digest = hashlib.sha1(content).hexdigest()
+        if item is not None and item[1].digest == digest:
+            # Touched but identical: keep the table
+            source = item[1]
+        else:
+            source = SourceFile(content, line_offsets(content), digest)
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[1].content)
+            if len(content) <= self.max_bytes:
+                self._items[key] = (stamp, source)
+                self.size += len(content)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.size -= len(evicted.content)
+        return source
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+
+source_cache = SourceCache()
+
+# (first changed line, removed line count, added line count), 0-based, in old-file lines
+LineHunk = Tuple[int, int, int]
+
+
+class ByteEdit(NamedTuple):
+    """One changed region: bytes [old_start, old_end) became [new_start, new_end)."""
+    old_start: int
+    old_end: int
+    new_start: int
+    new_end: int
+
+
+def line_offsets(content: bytes) -> List[int]:
+    """Byte offset of every line start, followed by len(content)."""
+    starts = [0]
+    pos = content.find(b"\n")
+    while pos != -1:
+        starts.append(pos + 1)
+        pos = content.find(b"\n", pos + 1)
+    starts.append(len(content))
+    return starts
+
+
+def _point(line_starts: List[int], pos: int) -> Tuple[int, int]:
+    row = bisect_right(line_starts, pos, 0, len(line_starts) - 1) - 1
+    return row, pos - line_starts[row]
+
+
+def byte_edits(old: bytes, new: bytes, hunks: List[LineHunk]) -> Optional[List[ByteEdit]]:
+    """
+    Translate line hunks (e.g. those of an applied unified diff) into byte
+    edits. Returns None when the bytes outside the hunks differ, i.e. the
+    hunks do not describe the change.
+    """
+    old_lines, new_lines = line_offsets(old), line_offsets(new)
+    edits: List[ByteEdit] = []
+    shift = 0
+    prev_old = prev_new = 0
+    for start, removed, added in sorted(hunks):
+        new_start_line = start + shift
+        if start + removed > len(old_lines) - 1 or new_start_line + added > len(new_lines) - 1 or start < 0:
+            return None
+        edit = ByteEdit(old_lines[start], old_lines[start + removed],
+                        new_lines[new_start_line], new_lines[new_start_line + added])
+        if edit.old_start < prev_old or old[prev_old:edit.old_start] != new[prev_new:edit.new_start]:
+            return None
+        edits.append(edit)
+        prev_old, prev_new = edit.old_end, edit.new_end
+        shift += added - removed
+    if old[prev_old:] != new[prev_new:]:
+        return None
+    return edits
+
+
+def _text_of(content: bytes):
+    """Source text of a node of `content`."""
+    def text(node) -> str:
+        return content[node.start_byte:node.end_byte].decode("utf-8", errors="replace")
+    return text
+
+
+def _touching(ranges: Optional[List[Tuple[int, int]]]):
+    """Predicate: does a node overlap one of the byte `ranges` (always true without ranges)?"""
+    def touches(node) -> bool:
+        return ranges is None or any(node.start_byte <= end and node.end_byte >= start for start, end in ranges)
+    return touches
+
+
+def prune_definitions_cache(directory: pathlib.Path, max_bytes: int = DEFINITIONS_CACHE_BYTES) -> int:
+    """
+    Bound a get_definitions cache directory: results of another
+    DEFINITIONS_FORMAT are removed, then the least recently used ones
+    (by mtime, refreshed on every hit) until at most `max_bytes` remain.
+    Returns the number of files removed.
+    """
+    suffix = f"-{DEFINITIONS_FORMAT}.json"
+    entries: List[Tuple[int, int, str]] = []
+    stale: List[str] = []
+    try:
+        buckets = [entry.path for entry in os.scandir(directory) if entry.is_dir()]
+    except OSError:
+        return 0
+    for bucket in buckets:
+        try:
+            with os.scandir(bucket) as scan:
+                for entry in scan:
+                    if not entry.name.endswith(suffix):
+                        stale.append(entry.path)
+                        continue
+                    st = entry.stat()
+                    entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        except OSError:
+            continue
+    total = sum(size for _, size, _ in entries)
+    if total > max_bytes:
+        # Evict down to 3/4 of the cap, so the next builds do not prune again right away
+        entries.sort()
+        for _, size, path in entries:
+            if total <= max_bytes * 3 // 4:
+                break
+            stale.append(path)
+            total -= size
+    removed = 0
+    for path in stale:
+        try:
+            os.unlink(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
 
 class ASTParser:
-    def __init__(self):
-        self.language = Language(tspython.language())
+    def __init__(self, definitions_cache: Optional[str] = None):
+        """
+        `definitions_cache`: optional directory where get_definitions keeps
+        its results per content hash, so they survive the process.
+        """
+        self.language = python_language()
         self.parser = Parser(self.language)
+        self.definitions_cache = pathlib.Path(definitions_cache) if definitions_cache else None
+        # Results written to the definitions cache (see prune_definitions_cache)
+        self.definitions_written = 0
+        # Other grammars are loaded the first time one of their files shows up
+        self._parsers: Dict[str, Optional[Parser]] = {PYTHON: self.parser}
+
+    def _parser_for(self, language: str) -> Optional[Parser]:
+        if language not in self._parsers:
+            grammar = load_language(language)
+            self._parsers[language] = Parser(grammar) if grammar is not None else None
+        return self._parsers[language]
+
+    @staticmethod
+    def language_for(file_path: str) -> str:
+        """Language of a file from its suffix; anything unknown is read as Python."""
+        return language_of(file_path) or PYTHON
+
+    def supports(self, file_path: str) -> bool:
+        """Whether definitions can be extracted from this file (its grammar is installed)."""
+        language = language_of(file_path)
+        return language is not None and self._parser_for(language) is not None
+
+    def parse(self, content: bytes, language: str = PYTHON) -> Any:
+        """Parse tree of `content`, from the process-wide cache when possible."""
+        return parse_cache.parse(self._parser_for(language), content, language=language)
+
+    def reparse(self, old: bytes, new: bytes, edits: List[ByteEdit],
+                language: str = PYTHON) -> Tuple[Any, Optional[List[Tuple[int, int]]]]:
+        """
+        Parse `new` incrementally from the tree of `old`: a copy of the old
+        tree gets one Tree.edit per changed region, applied bottom-up so the
+        offsets of the regions above stay valid. The result is cached as the
+        tree of `new`.
+        Returns the tree and the byte ranges of `new` whose syntax changed
+        (edited regions plus e.g. methods moved out of a class). When the tree
+        of `new` is already cached, it is returned and the incremental parse
+        only serves to find those ranges.
+        """
+        cached = parse_cache.get(new, language)
+        tree = self.parse(old, language).copy()
+        old_lines, new_lines = line_offsets(old), line_offsets(new)
+        for edit in reversed(edits):
+            # Regions above this one are not edited yet, so it still starts at its old offset
+            start_point = _point(old_lines, edit.old_start)
+            end_row, end_column = _point(new_lines, edit.new_end)
+            rows = end_row - _point(new_lines, edit.new_start)[0]
+            tree.edit(
+                start_byte=edit.old_start,
+                old_end_byte=edit.old_end,
+                new_end_byte=edit.old_start + (edit.new_end - edit.new_start),
+                start_point=start_point,
+                old_end_point=_point(old_lines, edit.old_end),
+                new_end_point=(start_point[0] + rows, end_column),
+            )
+        if cached is not None:
+            # changed_ranges needs a tree parsed from the edited one
+            new_tree = self._parser_for(language).parse(new, tree)
+        else:
+            new_tree = parse_cache.parse(self._parser_for(language), new, old_tree=tree, language=language)
+        changed = [(e.new_start, e.new_end) for e in edits]
+        changed.extend((r.start_byte, r.end_byte) for r in tree.changed_ranges(new_tree))
+        return cached if cached is not None else new_tree, sorted(changed)
 
     def parse_file(self, file_path: str) -> Optional[Any]:
+        content = self._read_bytes(file_path)
+        language = self.language_for(file_path)
+        if content is None or self._parser_for(language) is None:
+            return None
+        return self.parse(content, language)
+
+    @staticmethod
+    def _read_bytes(file_path: str) -> Optional[bytes]:
         path = pathlib.Path(file_path)
         if not path.exists():
             return None
-        
         with open(path, "rb") as f:
-            content = f.read()
-        
-        return self.parser.parse(content)
+            return f.read()
 
-    def get_definitions(self, file_path: str) -> List[Dict[str, Any]]:
-        """Extract classes and functions with their line ranges using recursive traversal."""
-        tree = self.parse_file(file_path)
-        if not tree:
+    def get_definitions(self, file_path: str, content: Optional[bytes] = None) -> List[Dict[str, Any]]:
+        """
+        Classes and functions with their line ranges, from an iterative
+        TreeCursor walk of the parse tree (see _collect_definitions).
+        """
+        language = self.language_for(file_path)
+        if self._parser_for(language) is None:
             return []
+        if content is None:
+            content = self._read_bytes(file_path)
+            if content is None:
+                return []
+        if self.definitions_cache is None:
+            return self._collect_definitions(self.parse(content, language), content, language=language)
 
-        with open(file_path, "rb") as f:
-            content = f.read()
+        digest = hashlib.sha1(content).hexdigest()
+        cached = self.definitions_cache / digest[:2] / f"{digest}-{language}-{DEFINITIONS_FORMAT}.json"
+        try:
+            with open(cached, "r", encoding="utf-8") as f:
+                definitions = json.load(f)
+            # Recently used results are the last to be evicted
+            os.utime(cached)
+            return definitions
+        except Exception:
+            pass
+        definitions = self._collect_definitions(self.parse(content, language), content, language=language)
+        try:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cached.with_name(f"{cached.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(definitions, f)
+            os.replace(tmp_file, cached)
+            self.definitions_written += 1
+        except Exception:
+            pass
+        return definitions
 
-        definitions = []
-        
-        def explore(node):
-            # Check for definitions
-            if node.type in ["class_definition", "function_definition", "decorated_definition"]:
-                # Find name
+    def extract_definitions(self, file_path: str, content: Optional[bytes] = None,
+                            ranges: Optional[List[Tuple[int, int]]] = None, tree: Any = None) -> List[Dict[str, Any]]:
+        """
+        Single-pass extraction for indexing: the file is read and parsed once.
+        Each definition also carries its `source` text and `keywords`
+        (term -> count over name, type, docstring and source).
+        Definitions longer than CHUNK_LINES are split (see _chunk_spans).
+        With `ranges` (byte ranges of `content`), only the definitions
+        overlapping them are extracted; `tree` is `content` already parsed.
+        """
+        language = self.language_for(file_path)
+        if self._parser_for(language) is None:
+            return []
+        if content is None:
+            content = self._read_bytes(file_path)
+            if content is None:
+                return []
+
+        if tree is None:
+            tree = self.parse(content, language)
+        definitions = self._collect_definitions(tree, content, chunk_lines=CHUNK_LINES, ranges=ranges, language=language)
+        return self._with_sources(definitions, content)
+
+    @staticmethod
+    def _with_sources(definitions: List[Dict[str, Any]], content: bytes) -> List[Dict[str, Any]]:
+        """
+        Attach `source` and `keywords` to each definition. The byte span
+        (`start_byte`, `end_byte`) is widened to whole lines and `source`
+        is exactly that span.
+        """
+        if not definitions:
+            return definitions
+
+        # Byte offset of every line start, so segments are plain slices
+        line_starts = line_offsets(content)
+
+        for d in definitions:
+            if "start_byte" in d:
+                start = line_starts[bisect_right(line_starts, d["start_byte"]) - 1]
+                end = line_starts[min(bisect_right(line_starts, max(d["end_byte"] - 1, start)), len(line_starts) - 1)]
+            else:
+                start = line_starts[d["start_line"] - 1]
+                end = line_starts[min(d["end_line"], len(line_starts) - 1)]
+            d["start_byte"], d["end_byte"] = start, end
+            d["source"] = content[start:end].decode("utf-8", errors="replace")
+            search_blob = f"{d['name']} {d['type']} {d['docstring'] or ''} {d['source']}"
+            d["keywords"] = dict(Counter(tokenize(search_blob)))
+        return definitions
+
+    def extract_file(self, file_path: str, content: Optional[bytes] = None,
+                     ranges: Optional[List[Tuple[int, int]]] = None) -> Dict[str, Any]:
+        """
+        Everything the indexer needs from one read and one parse:
+        `definitions` (as in extract_definitions) and `references`
+        (as in extract_references). With `ranges` (byte ranges of `content`),
+        only the definitions overlapping them are extracted.
+        Cross-references are only extracted from Python files.
+        """
+        empty = {"definitions": [], "references": {"imports": [], "calls": [], "attributes": []}}
+        language = self.language_for(file_path)
+        if self._parser_for(language) is None:
+            return empty
+        if content is None:
+            content = self._read_bytes(file_path)
+            if content is None:
+                return empty
+        tree = self.parse(content, language)
+        return {
+            "definitions": self.extract_definitions(file_path, content, ranges=ranges, tree=tree),
+            "references": self.extract_references(tree, content) if language == PYTHON else empty["references"],
+        }
+
+    def extract_references(self, tree: Any, content: bytes) -> Dict[str, List[Any]]:
+        """
+        Cross-reference facts of a parsed file:
+        - imports: {"module", "names", "line"} (relative modules keep their dots)
+        - calls: [scope, callee, line] with the callee's last name component
+        - attributes: [scope, attribute, line] for non-call attribute accesses
+        `scope` is the qualified name of the enclosing definition ("" at module level).
+        """
+        text = _text_of(content)
+
+        imports, calls, attributes = [], [], []
+        stack = [(tree.root_node, "")]
+        while stack:
+            node, scope = stack.pop()
+            line = node.start_point[0] + 1
+
+            if node.type == "import_statement":
+                for name in node.children_by_field_name("name"):
+                    target = name.child_by_field_name("name") if name.type == "aliased_import" else name
+                    imports.append({"module": text(target), "names": [], "line": line})
+                continue
+            if node.type == "import_from_statement":
+                module = node.child_by_field_name("module_name")
+                names = []
+                for name in node.children_by_field_name("name"):
+                    target = name.child_by_field_name("name") if name.type == "aliased_import" else name
+                    names.append(text(target))
+                imports.append({"module": text(module) if module else "", "names": names, "line": line})
+                continue
+
+            if node.type in ("class_definition", "function_definition"):
                 name_node = node.child_by_field_name("name")
-                if not name_node and node.type == "decorated_definition":
-                    # For decorated definitions, the name is in the class/function child
-                    inner = node.child_by_field_name("definition")
-                    if inner:
-                        name_node = inner.child_by_field_name("name")
-                
-                name = content[name_node.start_byte:name_node.end_byte].decode("utf-8") if name_node else "anonymous"
-                
-                # Docstring extraction
-                docstring = None
-                body = node.child_by_field_name("body")
-                if body and body.children:
-                    for stmt in body.children:
-                        if stmt.type == "expression_statement":
-                            child = stmt.children[0]
-                            if child.type == "string":
-                                docstring = content[child.start_byte:child.end_byte].decode("utf-8").strip('"\' \n')
-                        break # Only first statement
+                if name_node:
+                    scope = f"{scope}.{text(name_node)}" if scope else text(name_node)
+            elif node.type == "call":
+                func = node.child_by_field_name("function")
+                if func is not None and func.type == "identifier":
+                    calls.append([scope, text(func), line])
+                elif func is not None and func.type == "attribute":
+                    attr = func.child_by_field_name("attribute")
+                    if attr is not None:
+                        calls.append([scope, text(attr), line])
+                    # The receiver may hold further references (a.b().c())
+                    receiver = func.child_by_field_name("object")
+                    if receiver is not None:
+                        stack.append((receiver, scope))
+                    arguments = node.child_by_field_name("arguments")
+                    if arguments is not None:
+                        stack.append((arguments, scope))
+                    continue
+            elif node.type == "attribute":
+                attr = node.child_by_field_name("attribute")
+                if attr is not None:
+                    attributes.append([scope, text(attr), line])
+
+            for child in reversed(node.children):
+                stack.append((child, scope))
+
+        calls.sort(key=lambda c: c[2])
+        attributes.sort(key=lambda a: a[2])
+        return {"imports": imports, "calls": calls, "attributes": attributes}
+
+    @staticmethod
+    def _chunk_spans(body: Any, max_lines: int, nested=DEFINITION_TYPES) -> List[List[int]]:
+        """
+        Group the statements of a definition body into [start_byte, end_byte,
+        start_line, end_line] runs of at most `max_lines` lines. Nested
+        definitions are indexed on their own and break a run.
+        """
+        spans: List[List[int]] = []
+        current = None
+        for stmt in body.named_children:
+            if stmt.type in nested:
+                if current:
+                    spans.append(current)
+                current = None
+                continue
+            start_line, end_line = stmt.start_point[0] + 1, stmt.end_point[0] + 1
+            if current and end_line - current[2] + 1 > max_lines:
+                spans.append(current)
+                current = None
+            if current is None:
+                current = [stmt.start_byte, stmt.end_byte, start_line, end_line]
+            else:
+                current[1], current[3] = stmt.end_byte, end_line
+        if current:
+            spans.append(current)
+        return spans
 
+    def _collect_definitions(self, tree: Any, content: bytes, chunk_lines: Optional[int] = None,
+                             ranges: Optional[List[Tuple[int, int]]] = None, language: str = PYTHON) -> List[Dict[str, Any]]:
+        """
+        Classes and functions with their line ranges and byte spans, in
+        document order. A decorated definition is reported once, its range
+        starting at the first decorator.
+        With `chunk_lines`, a longer definition keeps its full line range but
+        its byte span only covers the head (signature, docstring and leading
+        statements); the rest of its own code becomes "chunk" entries of at
+        most `chunk_lines` lines, methods being indexed anyway.
+        With `ranges`, subtrees that do not touch any of the byte ranges are skipped.
+
+        Iterative TreeCursor walk (no recursion limit on deeply nested code)
+        that only descends into nodes able to hold statements, so expression
+        subtrees are never visited. Other languages go through _collect_generic.
+        """
+        if language != PYTHON:
+            return self._collect_generic(tree, content, GRAMMARS[language], chunk_lines, ranges)
+        definitions = []
+        touches = _touching(ranges)
+
+        cursor = tree.walk()
+        # Qualified name of the enclosing definition, per cursor depth
+        scopes = [""]
+        while True:
+            node = cursor.node
+            child_scope = scopes[-1]
+            if node.type in ("class_definition", "function_definition") and touches(node):
+                child_scope = self._add_definition(node, content, scopes[-1], chunk_lines, definitions)
+            if node.type in STATEMENT_CONTAINERS and touches(node) and cursor.goto_first_child():
+                scopes.append(child_scope)
+                continue
+            while not cursor.goto_next_sibling():
+                if not cursor.goto_parent():
+                    return definitions
+                scopes.pop()
+
+    def _add_definition(self, node: Any, content: bytes, scope: str, chunk_lines: Optional[int],
+                        definitions: List[Dict[str, Any]]) -> str:
+        """Append the definition (and its chunks) of a class/function node; returns its qualified name."""
+        name_node = node.child_by_field_name("name")
+        name = content[name_node.start_byte:name_node.end_byte].decode("utf-8") if name_node else "anonymous"
+        qualname = f"{scope}.{name}" if scope else name
+        # Decorators belong to the definition they wrap
+        outer = node.parent if node.parent is not None and node.parent.type == "decorated_definition" else node
+
+        # Docstring extraction (only the first statement)
+        docstring = None
+        body = node.child_by_field_name("body")
+        first = body.child(0) if body is not None and body.child_count else None
+        if first is not None and first.type == "expression_statement":
+            child = first.child(0)
+            if child is not None and child.type == "string":
+                docstring = content[child.start_byte:child.end_byte].decode("utf-8").strip('"\' \n')
+
+        kind = "class" if node.type == "class_definition" else "function"
+        self._append_definition(definitions, node, outer, body, name, qualname, kind, docstring, chunk_lines)
+        return qualname
+
+    def _collect_generic(self, tree: Any, content: bytes, spec: LanguageSpec, chunk_lines: Optional[int],
+                         ranges: Optional[List[Tuple[int, int]]]) -> List[Dict[str, Any]]:
+        """
+        Definitions of a file in another language, as described by its
+        LanguageSpec (same fields as the Python ones). The comment right
+        above a definition stands in for its docstring.
+        """
+        definitions: List[Dict[str, Any]] = []
+        nested = spec.classes | spec.functions | spec.bindings
+
+        text = _text_of(content)
+
+        def name_of(node) -> Optional[str]:
+            target = node.child_by_field_name("name") or node.child_by_field_name("property")
+            if target is None:
+                # C/C++ functions: the name is at the end of the declarator chain
+                target = node.child_by_field_name("declarator")
+                while target is not None and target.child_by_field_name("declarator") is not None:
+                    target = target.child_by_field_name("declarator")
+            return text(target) if target is not None else None
+
+        def kind_of(node) -> Optional[str]:
+            if node.type in spec.classes:
+                # Forward declarations (`class Foo;`) have no body
+                return "class" if node.child_by_field_name("body") is not None else None
+            if node.type in spec.functions:
+                return "function"
+            if node.type in spec.bindings:
+                value = node.child_by_field_name("value")
+                if value is not None and value.type in ("arrow_function", "function_expression", "function", "generator_function"):
+                    return "function"
+            return None
+
+        touches = _touching(ranges)
+
+        cursor = tree.walk()
+        scopes = [""]
+        while True:
+            node = cursor.node
+            child_scope = scopes[-1]
+            inside = touches(node)
+            kind = kind_of(node) if inside else None
+            if kind is not None or (inside and node.type in spec.scopes):
+                name = name_of(node)
+                if name:
+                    parts = [p for p in name.replace("::", ".").split(".") if p]
+                    child_scope = ".".join(([scopes[-1]] if scopes[-1] else []) + parts)
+                    if kind is not None:
+                        self._add_generic_definition(node, kind, parts[-1], child_scope, content, spec,
+                                                     chunk_lines, nested, definitions)
+            if inside and cursor.goto_first_child():
+                scopes.append(child_scope)
+                continue
+            while not cursor.goto_next_sibling():
+                if not cursor.goto_parent():
+                    return definitions
+                scopes.pop()
+
+    def _add_generic_definition(self, node: Any, kind: str, name: str, qualname: str, content: bytes,
+                                spec: LanguageSpec, chunk_lines: Optional[int], nested, definitions: List[Dict[str, Any]]):
+        outer = node
+        while outer.parent is not None and outer.parent.type in spec.wrappers:
+            outer = outer.parent
+
+        # Leading comment block (adjacent comments directly above)
+        comments = []
+        previous, row = outer.prev_named_sibling, outer.start_point[0]
+        while previous is not None and previous.type == "comment" and previous.end_point[0] >= row - 1:
+            comments.insert(0, content[previous.start_byte:previous.end_byte].decode("utf-8", errors="replace"))
+            previous, row = previous.prev_named_sibling, previous.start_point[0]
+        docstring = None
+        if comments:
+            lines = []
+            for comment in comments:
+                for line in comment.splitlines():
+                    line = line.strip().lstrip("/").strip()
+                    line = line[2:] if line.startswith("**") else line
+                    line = line.lstrip("*").rstrip("/").rstrip("*").strip()
+                    if line:
+                        lines.append(line)
+            docstring = "\n".join(lines) or None
+
+        body = node.child_by_field_name("body")
+        if body is None and node.type in spec.bindings:
+            value = node.child_by_field_name("value")
+            body = value.child_by_field_name("body") if value is not None else None
+        self._append_definition(definitions, node, outer, body, name, qualname, kind, docstring, chunk_lines, nested)
+
+    def _append_definition(self, definitions: List[Dict[str, Any]], node: Any, outer: Any, body: Any,
+                           name: str, qualname: str, kind: str, docstring: Optional[str],
+                           chunk_lines: Optional[int], nested=DEFINITION_TYPES):
+        """
+        Append one definition entry, spanning `outer` (the node with its
+        decorators or export wrappers) to the end of `node`. When longer than
+        `chunk_lines`, its byte span is cut after the head and the rest of
+        `body` is appended as "chunk" entries (see _chunk_spans).
+        """
+        definition = {
+            "name": name,
+            "qualname": qualname,
+            "type": kind,
+            "start_line": outer.start_point[0] + 1,
+            "end_line": node.end_point[0] + 1,
+            "start_byte": outer.start_byte,
+            "end_byte": node.end_byte,
+            "docstring": docstring
+        }
+        definitions.append(definition)
+
+        lines = node.end_point[0] - outer.start_point[0] + 1
+        if chunk_lines and body is not None and body.named_child_count and lines > chunk_lines:
+            spans = self._chunk_spans(body, chunk_lines, nested)
+            head_end = body.prev_sibling.end_byte if body.prev_sibling else body.start_byte
+            if spans and spans[0][0] == body.named_children[0].start_byte:
+                head_end = spans.pop(0)[1]
+            definition["end_byte"] = head_end
+            for part, (start_byte, end_byte, start_line, end_line) in enumerate(spans, 1):
                 definitions.append({
                     "name": name,
-                    "type": "class" if "class" in node.type else "function",
-                    "start_line": node.start_point[0] + 1,
-                    "end_line": node.end_point[0] + 1,
-                    "docstring": docstring
+                    "qualname": qualname,
+                    "type": "chunk",
+                    "part": part,
+                    "start_line": start_line,
+                    "end_line": end_line,
+                    "start_byte": start_byte,
+                    "end_byte": end_byte,
+                    "docstring": None
                 })
 
-            # Always explore children regardless of current node type
-            for child in node.children:
-                explore(child)
-
-        explore(tree.root_node)
-        return definitions
-
     def get_source_segment(self, file_path: str, start_line: int, end_line: int) -> str:
-        """Extract a segment of code from a file by line numbers."""
-        with open(file_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        
-        # Lines are 1-indexed in our definitions, but 0-indexed in the list
-        return "".join(lines[start_line-1 : end_line])
+        """
+        Extract a segment of code from a file by line numbers (1-indexed,
+        inclusive): a slice of the cached content (see SourceCache).
+        """
+        source = source_cache.get(file_path)
+        if source is None:
+            raise FileNotFoundError(file_path)
+        starts = source.line_starts
+        last = len(starts) - 1
+        start = starts[min(max(start_line - 1, 0), last)]
+        end = starts[min(max(end_line, 0), last)]
+        segment = source.content[start:end] if end > start else b""
+        return segment.decode("utf-8").replace("\r\n", "\n")
@@ -0,0 +1,179 @@
+import os
+import subprocess
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+# Never part of a project's sources, whatever the caller excludes
+ALWAYS_EXCLUDED = (".git", ".axion")
+
+
+class FileListing(NamedTuple):
+    # rel_path -> absolute path, sorted by rel_path
+    files: Dict[str, Path]
+    # rel_path -> git blob SHA, only for tracked files identical to the git index
+    blobs: Dict[str, str]
+    # "git" or "walk"
+    source: str
+    # rel_path -> stat from the directory scan (walk listings asked `with_stats` only)
+    stats: Optional[Dict[str, os.stat_result]] = None
+
+
+def _wanted(rel_path: str, suffixes: Optional[Iterable[str]], exclude_dirs: set) -> bool:
+    parts = PurePosixPath(rel_path).parts
+    if any(p in exclude_dirs for p in parts[:-1]):
+        return False
+    return suffixes is None or PurePosixPath(rel_path).suffix in suffixes
+
+
+def _git(root: Path, *args: str, input: Optional[bytes] = None, ok: Iterable[int] = (0,)) -> Optional[bytes]:
+    try:
+        result = subprocess.run(["git", "-C", str(root), *args], input=input, capture_output=True, check=False)
+    except OSError:
+        return None
+    return result.stdout if result.returncode in ok else None
+
+
+def git_files(root: Path) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Files of a git work tree, from the git index instead of a directory walk:
+    tracked files map to their blob SHA, or to None when modified in the
+    work tree; untracked files that are not ignored map to None.
+    Returns None when `root` is not inside a git repository.
+    """
+    staged = _git(root, "ls-files", "-s", "-z")
+    if staged is None:
+        return None
+    listing: Dict[str, Optional[str]] = {}
+    for record in staged.split(b"\0"):
+        if not record:
+            continue
+        info, _, path = record.partition(b"\t")
+        mode, blob, stage = info.split(b" ")
+        # Regular files only (no symlinks or submodules), merged entries only
+        if mode in (b"100644", b"100755") and stage == b"0":
+            listing[os.fsdecode(path)] = blob.decode("ascii")
+
+    others = _git(root, "ls-files", "-t", "-m", "-o", "-d", "--exclude-standard", "-z")
+    if others is None:
+        return None
+    deleted = set()
+    for record in others.split(b"\0"):
+        if not record:
+            continue
+        tag, path = record[:1], os.fsdecode(record[2:])
+        if tag == b"R":
+            deleted.add(path)
+        elif not path.endswith("/"):  # nested repositories show up as directories
+            listing[path] = None
+    for path in deleted:
+        listing.pop(path, None)
+    return listing
+
+
+def git_ignored(root: Path, rel_paths: Iterable[str]) -> Set[str]:
+    """
+    Those of `rel_paths` that .gitignore excludes, as list_files() would
+    (tracked files are never ignored). Empty outside a git work tree.
+    """
+    by_posix = {Path(p).as_posix(): p for p in rel_paths}
+    if not by_posix:
+        return set()
+    # Exit status 1 means none of the paths is ignored
+    out = _git(Path(root), "check-ignore", "-z", "--stdin",
+               input=b"\0".join(os.fsencode(p) for p in by_posix), ok=(0, 1))
+    if not out:
+        return set()
+    return {by_posix[path] for path in map(os.fsdecode, out.split(b"\0")) if path in by_posix}
+
+
+def git_ignored_dirs(root: Path, top: str = "") -> Set[str]:
+    """
+    Directories under `top` (relative to `root`, included) that .gitignore
+    excludes as a whole, e.g. build/ or node_modules/. Empty outside a git work tree.
+    """
+    args = ["ls-files", "-o", "-i", "--exclude-standard", "--directory", "-z"]
+    if top:
+        args += ["--", Path(top).as_posix()]
+    out = _git(Path(root), *args)
+    if not out:
+        return set()
+    return {str(Path(os.fsdecode(p[:-1]))) for p in out.split(b"\0") if p.endswith(b"/")}
+
+
+def recent_git_files(root: Path, commits: int = 100) -> Optional[List[str]]:
+    """
+    Files changed in the last `commits` commits under `root`, most recently
+    changed first (paths relative to `root`). None outside a git repository.
+    """
+    log = _git(Path(root), "log", f"-{commits}", "--relative", "--name-only", "--format=", "-z")
+    if log is None:
+        return None
+    seen: Dict[str, None] = {}
+    for path in log.replace(b"\n", b"\0").split(b"\0"):
+        if path:
+            seen.setdefault(str(Path(os.fsdecode(path))), None)
+    return list(seen)
+
+
+def walk_files(root: Path, suffixes: Optional[Iterable[str]] = None, exclude_dirs: Iterable[str] = (),
+               stats: Optional[Dict[str, os.stat_result]] = None) -> Dict[str, Path]:
+    """
+    Stat-based fallback: walk the tree with os.scandir, pruning excluded
+    directories (symlinked directories are not followed, as in os.walk).
+    With `stats`, each file's stat is stored there, taken from its directory
+    entry (free on Windows, one call per file elsewhere).
+    """
+    exclude = set(exclude_dirs) | set(ALWAYS_EXCLUDED)
+    suffixes = set(suffixes) if suffixes is not None else None
+    found: Dict[str, Path] = {}
+    pending = [(Path(root), "")]
+    while pending:
+        directory, prefix = pending.pop()
+        try:
+            with os.scandir(directory) as scan:
+                entries = list(scan)
+        except OSError:
+            continue
+        for entry in entries:
+            rel_path = prefix + entry.name
+            try:
+                if entry.is_dir():
+                    if entry.name not in exclude and not entry.is_symlink():
+                        pending.append((directory / entry.name, rel_path + os.sep))
+                    continue
+                if suffixes is not None and PurePosixPath(entry.name).suffix not in suffixes:
+                    continue
+                if stats is not None:
+                    stats[rel_path] = entry.stat()
+            except OSError:  # vanished or dangling symlink
+                continue
+            found[rel_path] = directory / entry.name
+    return dict(sorted(found.items()))
+
+
+def list_files(root: Path, suffixes: Optional[Iterable[str]] = None, exclude_dirs: Iterable[str] = (),
+               use_git: bool = True, with_stats: bool = False) -> FileListing:
+    """
+    Enumerate project files, through git when `root` is in a work tree
+    (honours .gitignore, never walks ignored directories) and with a
+    directory walk otherwise. `with_stats` keeps the stats of a walk
+    (git listings have none: callers stat those files themselves).
+    """
+    root = Path(root)
+    tracked = git_files(root) if use_git else None
+    if tracked is None:
+        stats: Optional[Dict[str, os.stat_result]] = {} if with_stats else None
+        return FileListing(walk_files(root, suffixes, exclude_dirs, stats), {}, "walk", stats)
+
+    exclude = set(exclude_dirs) | set(ALWAYS_EXCLUDED)
+    suffixes = set(suffixes) if suffixes is not None else None
+    files: Dict[str, Path] = {}
+    blobs: Dict[str, str] = {}
+    for rel_path in sorted(tracked):
+        if not _wanted(rel_path, suffixes, exclude):
+            continue
+        local = str(Path(rel_path))
+        files[local] = root / local
+        if tracked[rel_path]:
+            blobs[local] = tracked[rel_path]
+    return FileListing(files, blobs, "git")
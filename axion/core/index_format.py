@@ -0,0 +1,428 @@
+"""
+Compact binary layout of the code index (`index.bin` of an index snapshot).
+
+    magic "AXIX" | u32 format version | u32 section count
+    section table: (u64 offset, u64 length) per section
+    sections, in _SECTIONS order
+
+Terms are interned in a sorted dictionary and referred to by their integer
+position (term id). The symbol table maps qualified definition names
+("Class.method") to doc ids, sorted so exact and prefix lookups are
+binary searches. Postings and lengths are little-endian u32 arrays so the
+reader can slice them straight out of the memory map without decoding.
+"""
+import heapq
+import itertools
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+from axion.core.search import RankedIndex, InvertedIndex
+
+MAGIC = b"AXIX"
+FORMAT_VERSION = 2
+
+_SECTIONS = (
+    "meta",              # JSON: fingerprints, entry field names, path table, stats
+    "terms",             # UTF-8 terms, concatenated in byte order
+    "term_offsets",      # u64[T+1] offsets into "terms"
+    "postings_offsets",  # u32[T+1] offsets (in pairs) into "postings"
+    "postings",          # u32 pairs: doc_id, term_frequency
+    "name_offsets",      # u32[T+1] offsets into "name_postings"
+    "name_postings",     # u32 doc ids
+    "doc_lengths",       # u32[N]
+    "entry_offsets",     # u64[N+1] offsets into "entries"
+    "entries",           # one compact JSON array per definition
+    "symbols",           # UTF-8 qualified names, sorted in byte order (version 2)
+    "symbol_offsets",    # u64[S+1] offsets into "symbols"
+    "symbol_docs",       # u32[S] doc id of each symbol
+)
+# Sections present in each supported format version
+_SECTION_COUNTS = {1: 10, 2: len(_SECTIONS)}
+_HEADER = struct.Struct("<4sII")
+_SECTION = struct.Struct("<QQ")
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _pack(typecode: str, values) -> bytes:
+    arr = array(typecode, values)
+    if not _LITTLE_ENDIAN:
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _view(buf, typecode: str) -> Sequence[int]:
+    """Zero-copy typed view over a section (copied only on big-endian hosts)."""
+    if _LITTLE_ENDIAN:
+        return memoryview(buf).cast(typecode)
+    arr = array(typecode)
+    arr.frombytes(bytes(buf))
+    arr.byteswap()
+    return arr
+
+
+def write_index(path: Path, entries: List[Dict[str, Any]], inverted: InvertedIndex, meta: Dict[str, Any]):
+    """Serialize entries and their inverted index to `path`."""
+    # Intern paths and store entries as positional arrays
+    fields: List[str] = []
+    for item in entries:
+        for key in item:
+            if key not in fields:
+                fields.append(key)
+    paths: List[str] = []
+    path_ids: Dict[str, int] = {}
+    entry_blobs = []
+    for item in entries:
+        row = []
+        for key in fields:
+            value = item.get(key)
+            if key == "path":
+                if value not in path_ids:
+                    path_ids[value] = len(paths)
+                    paths.append(value)
+                value = path_ids[value]
+            row.append(value)
+        entry_blobs.append(json.dumps(row, separators=(",", ":")).encode("utf-8"))
+
+    terms = sorted(set(inverted.postings) | set(inverted.name_postings), key=lambda t: t.encode("utf-8"))
+    term_bytes = [t.encode("utf-8") for t in terms]
+
+    term_offsets = [0]
+    postings_offsets = [0]
+    postings: List[int] = []
+    name_offsets = [0]
+    name_postings: List[int] = []
+    for term, raw in zip(terms, term_bytes):
+        term_offsets.append(term_offsets[-1] + len(raw))
+        for doc_id, tf in inverted.postings.get(term, ()):
+            postings.append(doc_id)
+            postings.append(tf)
+        postings_offsets.append(len(postings) // 2)
+        name_postings.extend(inverted.name_postings.get(term, ()))
+        name_offsets.append(len(name_postings))
+
+    entry_offsets = [0]
+    for blob in entry_blobs:
+        entry_offsets.append(entry_offsets[-1] + len(blob))
+
+    # Chunks of long definitions share their qualified name but are not symbols
+    symbols = sorted(((item.get("qualname") or item["name"]).encode("utf-8"), doc_id)
+                     for doc_id, item in enumerate(entries) if item.get("type") != "chunk")
+    symbol_offsets = [0]
+    for raw, _ in symbols:
+        symbol_offsets.append(symbol_offsets[-1] + len(raw))
+
+    meta = dict(meta, fields=fields, paths=paths, total_length=inverted.total_length)
+    sections = {
+        "meta": json.dumps(meta, separators=(",", ":")).encode("utf-8"),
+        "terms": b"".join(term_bytes),
+        "term_offsets": _pack("Q", term_offsets),
+        "postings_offsets": _pack("I", postings_offsets),
+        "postings": _pack("I", postings),
+        "name_offsets": _pack("I", name_offsets),
+        "name_postings": _pack("I", name_postings),
+        "doc_lengths": _pack("I", inverted.doc_lengths),
+        "entry_offsets": _pack("Q", entry_offsets),
+        "entries": b"".join(entry_blobs),
+        "symbols": b"".join(raw for raw, _ in symbols),
+        "symbol_offsets": _pack("Q", symbol_offsets),
+        "symbol_docs": _pack("I", [doc_id for _, doc_id in symbols]),
+    }
+
+    _assemble(path, sections)
+
+
+def _assemble(path: Path, sections: Dict[str, Any]):
+    """
+    Write header, section table and sections. A section is either bytes or
+    the path of a spill file, copied in without loading it into memory.
+    """
+    sizes = {name: len(part) if isinstance(part, bytes) else os.path.getsize(part) for name, part in sections.items()}
+    offset = _HEADER.size + _SECTION.size * len(_SECTIONS)
+    table = []
+    for name in _SECTIONS:
+        table.append(_SECTION.pack(offset, sizes[name]))
+        offset += sizes[name]
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(_SECTIONS)))
+        f.write(b"".join(table))
+        for name in _SECTIONS:
+            part = sections[name]
+            if isinstance(part, bytes):
+                f.write(part)
+            else:
+                with open(part, "rb") as src:
+                    shutil.copyfileobj(src, f, 1 << 20)
+        # Make the data durable before the caller swaps the file in
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def merge_indexes(path: Path, readers: List["MappedIndex"], meta: Dict[str, Any]):
+    """
+    Concatenate index segments into one index file: documents keep their
+    order (segment by segment) and postings are merged term by term, so
+    memory stays bounded by the postings of a single term.
+    """
+    fields: List[str] = []
+    for reader in readers:
+        for key in reader._fields:
+            if key not in fields:
+                fields.append(key)
+    paths: List[str] = []
+    path_ids: Dict[str, int] = {}
+    doc_base = []
+    num_docs = 0
+    for reader in readers:
+        doc_base.append(num_docs)
+        num_docs += reader.num_docs
+
+    spill_dir = path.parent
+    spills = {name: spill_dir / f"{path.name}.{name}.spill" for name in _SECTIONS if name != "meta"}
+    files = {name: open(spill, "wb") for name, spill in spills.items()}
+    try:
+        # Entries and document lengths, segment by segment
+        entry_offset = 0
+        files["entry_offsets"].write(_pack("Q", [0]))
+        for reader in readers:
+            for doc_id in range(reader.num_docs):
+                item = reader.entry(doc_id)
+                if "path" in item and item["path"] not in path_ids:
+                    path_ids[item["path"]] = len(paths)
+                    paths.append(item["path"])
+                row = [path_ids[item[key]] if key == "path" else item.get(key) for key in fields]
+                blob = json.dumps(row, separators=(",", ":")).encode("utf-8")
+                files["entries"].write(blob)
+                entry_offset += len(blob)
+                files["entry_offsets"].write(_pack("Q", [entry_offset]))
+            files["doc_lengths"].write(_pack("I", list(reader._doc_lengths)))
+
+        # Terms: k-way merge of the sorted term dictionaries
+        def terms(i: int):
+            reader = readers[i]
+            for term_id in range(reader.num_terms):
+                yield reader.term(term_id).encode("utf-8"), i, term_id
+
+        streams = [terms(i) for i in range(len(readers))]
+        term_offset = postings_count = names_count = 0
+        for sec in ("term_offsets", "postings_offsets", "name_offsets"):
+            files[sec].write(_pack("Q" if sec == "term_offsets" else "I", [0]))
+        for raw, group in itertools.groupby(heapq.merge(*streams), key=lambda item: item[0]):
+            postings: List[int] = []
+            names: List[int] = []
+            for _, i, term_id in group:
+                base = doc_base[i]
+                for doc_id, tf in readers[i]._term_postings_by_id(term_id):
+                    postings.append(base + doc_id)
+                    postings.append(tf)
+                names.extend(base + doc_id for doc_id in readers[i]._name_docs_by_id(term_id))
+            files["terms"].write(raw)
+            term_offset += len(raw)
+            postings_count += len(postings) // 2
+            names_count += len(names)
+            files["term_offsets"].write(_pack("Q", [term_offset]))
+            files["postings"].write(_pack("I", postings))
+            files["postings_offsets"].write(_pack("I", [postings_count]))
+            files["name_postings"].write(_pack("I", names))
+            files["name_offsets"].write(_pack("I", [names_count]))
+
+        # Symbols: same k-way merge over the sorted symbol tables
+        def symbols(i: int):
+            reader = readers[i]
+            for symbol_id in range(reader.num_symbols):
+                yield reader._symbol_bytes(symbol_id), doc_base[i] + reader._symbol_docs[symbol_id]
+
+        symbol_offset = 0
+        files["symbol_offsets"].write(_pack("Q", [0]))
+        for raw, doc_id in heapq.merge(*(symbols(i) for i in range(len(readers)))):
+            files["symbols"].write(raw)
+            symbol_offset += len(raw)
+            files["symbol_offsets"].write(_pack("Q", [symbol_offset]))
+            files["symbol_docs"].write(_pack("I", [doc_id]))
+    finally:
+        for f in files.values():
+            f.close()
+
+    try:
+        total_length = sum(reader.total_length for reader in readers)
+        meta = dict(meta, fields=fields, paths=paths, total_length=total_length)
+        sections: Dict[str, Any] = dict(spills)
+        sections["meta"] = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+        _assemble(path, sections)
+    finally:
+        for spill in spills.values():
+            spill.unlink(missing_ok=True)
+
+
+class MappedIndex(RankedIndex):
+    """
+    Read-only view of an index file through mmap.
+    Only the pages touched by a query (term dictionary probes, the postings
+    of the query terms and the returned entries) are ever read from disk.
+    """
+    def __init__(self, path: Path):
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        magic, version, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or _SECTION_COUNTS.get(version) != count:
+            self.close()
+            raise ValueError(f"Unsupported index file: {path}")
+        st = os.fstat(self._file.fileno())
+        # Tells this write of the file apart from any later one at the same path
+        self.file_id: Tuple[int, int, int] = (st.st_dev, st.st_ino, st.st_mtime_ns)
+
+        buf = memoryview(self._mm)
+        self._sections = {}
+        for i, name in enumerate(_SECTIONS[:count]):
+            offset, length = _SECTION.unpack_from(self._mm, _HEADER.size + i * _SECTION.size)
+            self._sections[name] = buf[offset:offset + length]
+
+        self.meta: Dict[str, Any] = json.loads(bytes(self._sections["meta"]))
+        self._fields: List[str] = self.meta["fields"]
+        self._paths: List[str] = self.meta["paths"]
+        self._terms = self._sections["terms"]
+        self._term_offsets = _view(self._sections["term_offsets"], "Q")
+        self._postings_offsets = _view(self._sections["postings_offsets"], "I")
+        self._postings = _view(self._sections["postings"], "I")
+        self._name_offsets = _view(self._sections["name_offsets"], "I")
+        self._name_postings = _view(self._sections["name_postings"], "I")
+        self._doc_lengths = _view(self._sections["doc_lengths"], "I")
+        self._entry_offsets = _view(self._sections["entry_offsets"], "Q")
+        self._entries = self._sections["entries"]
+        # Version 1 files have no symbol table
+        self.has_symbols = "symbols" in self._sections
+        self._symbols = self._sections.get("symbols", b"")
+        self._symbol_offsets = _view(self._sections["symbol_offsets"], "Q") if self.has_symbols else [0]
+        self._symbol_docs = _view(self._sections["symbol_docs"], "I") if self.has_symbols else []
+
+    @property
+    def num_docs(self) -> int:
+        return len(self._doc_lengths)
+
+    @property
+    def total_length(self) -> int:
+        return self.meta["total_length"]
+
+    @property
+    def num_terms(self) -> int:
+        return len(self._term_offsets) - 1
+
+    def term(self, term_id: int) -> str:
+        return bytes(self._terms[self._term_offsets[term_id]:self._term_offsets[term_id + 1]]).decode("utf-8")
+
+    def term_id(self, term: str) -> Optional[int]:
+        """Binary search in the sorted term dictionary."""
+        key = term.encode("utf-8")
+        lo, hi = 0, self.num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probe = bytes(self._terms[self._term_offsets[mid]:self._term_offsets[mid + 1]])
+            if probe == key:
+                return mid
+            if probe < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    @property
+    def num_symbols(self) -> int:
+        return len(self._symbol_offsets) - 1
+
+    def _symbol_bytes(self, symbol_id: int) -> bytes:
+        return bytes(self._symbols[self._symbol_offsets[symbol_id]:self._symbol_offsets[symbol_id + 1]])
+
+    def _symbol_lower_bound(self, key: bytes) -> int:
+        lo, hi = 0, self.num_symbols
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._symbol_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find_symbols(self, name: str, prefix: bool = False, limit: int = 20) -> List[int]:
+        """Doc ids of definitions whose qualified name equals (or starts with) `name`."""
+        key = name.encode("utf-8")
+        doc_ids = []
+        symbol_id = self._symbol_lower_bound(key)
+        while symbol_id < self.num_symbols and len(doc_ids) < limit:
+            raw = self._symbol_bytes(symbol_id)
+            if raw != key and not (prefix and raw.startswith(key)):
+                break
+            doc_ids.append(self._symbol_docs[symbol_id])
+            symbol_id += 1
+        return doc_ids
+
+    def _term_postings_by_id(self, term_id: int) -> List[Tuple[int, int]]:
+        start, end = self._postings_offsets[term_id], self._postings_offsets[term_id + 1]
+        flat = self._postings[start * 2:end * 2].tolist()
+        return list(zip(flat[0::2], flat[1::2]))
+
+    def _name_docs_by_id(self, term_id: int) -> Sequence[int]:
+        return self._name_postings[self._name_offsets[term_id]:self._name_offsets[term_id + 1]].tolist()
+
+    def term_postings(self, term: str) -> Sequence[Tuple[int, int]]:
+        term_id = self.term_id(term)
+        return () if term_id is None else self._term_postings_by_id(term_id)
+
+    def name_docs(self, term: str) -> Sequence[int]:
+        term_id = self.term_id(term)
+        return () if term_id is None else self._name_docs_by_id(term_id)
+
+    def doc_length(self, doc_id: int) -> int:
+        return self._doc_lengths[doc_id]
+
+    def entry(self, doc_id: int) -> Dict[str, Any]:
+        raw = self._entries[self._entry_offsets[doc_id]:self._entry_offsets[doc_id + 1]]
+        item = dict(zip(self._fields, json.loads(bytes(raw))))
+        if "path" in item:
+            item["path"] = self._paths[item["path"]]
+        return item
+
+    def entries(self) -> List[Dict[str, Any]]:
+        return [self.entry(i) for i in range(self.num_docs)]
+
+    def to_inverted(self) -> InvertedIndex:
+        """Materialize a mutable in-memory copy (used before re-indexing)."""
+        index = InvertedIndex()
+        for term_id in range(self.num_terms):
+            term = self.term(term_id)
+            plist = self._term_postings_by_id(term_id)
+            if plist:
+                index.postings[term] = [[d, tf] for d, tf in plist]
+            names = self._name_docs_by_id(term_id)
+            if names:
+                index.name_postings[term] = names
+        index.doc_lengths = list(self._doc_lengths)
+        index._total_length = self.total_length
+        return index
+
+    def close(self):
+        # Views must be released before the map can be closed
+        for name in ("_term_offsets", "_postings_offsets", "_postings", "_name_offsets",
+                     "_name_postings", "_doc_lengths", "_entry_offsets", "_symbol_offsets", "_symbol_docs"):
+            view = getattr(self, name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        for view in getattr(self, "_sections", {}).values():
+            view.release()
+        self._sections = {}
+        try:
+            self._mm.close()
+        except Exception:
+            pass
+        self._file.close()
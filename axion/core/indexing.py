@@ -1,94 +1,1345 @@
 import os
 import json
+import shutil
+import hashlib
+import heapq
 import re
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from axion.core.ast_utils import ASTParser
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+from axion.core.ast_utils import ASTParser, LineHunk, byte_edits, source_cache
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process writer lock
+    fcntl = None
+from axion.core.search import InvertedIndex, CorpusStats, tokenize, name_terms
+from axion.core.index_format import MappedIndex, merge_indexes, write_index
+from axion.core.embeddings import VectorStore, embed, merge_vector_files, vectors_available
+from axion.core.xref import XRefGraph
+from axion.core.files import git_ignored, list_files
+from axion.core.languages import supported_suffixes
+from axion.core.trigram import MappedTrigrams, file_trigrams, merge_trigrams, query_plan, write_trigrams
+
+INDEX_VERSION = 6
+# Weight of the (max-normalized) BM25 score in hybrid ranking; the rest is cosine similarity
+HYBRID_ALPHA = 0.5
+SEARCH_MODES = ("keyword", "vector", "hybrid")
+# Shard holding the files that sit directly in the project root
+ROOT_SHARD = "_root"
+# Number of search results kept by the process-wide query cache
+QUERY_CACHE_SIZE = 256
+# Published snapshots kept per shard: the current one and its predecessor,
+# which readers that opened it before the last rebuild may still be using
+SNAPSHOTS_KEPT = 2
+SNAPSHOT_PREFIX = "gen-"
+SNAPSHOT_FILES = ("index.bin", "vectors.npy", "xref.json", "trigrams.bin")
+# Estimated bytes of parsed data held in memory before a rebuild spills a segment
+DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024
+
+
+def _fsync_dir(directory: Path):
+    """Persist a rename inside `directory` (not supported everywhere)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def file_digest(file_path: Path) -> str:
+    """Content hash used to confirm a file really changed when its stat differs."""
+    h = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def content_hash(content: bytes) -> str:
+    """Short hash stored with each entry, to check a file is unchanged before slicing it."""
+    return hashlib.sha1(content).hexdigest()[:16]
+
+
+# Parser reused by every file handled in the same (worker) process
+_process_parser: Optional[ASTParser] = None
+
+def extract_file_entries(file_path: str, rel_path: str, parser: Optional[ASTParser] = None) -> Tuple[List[Tuple[Dict[str, Any], Dict[str, int], Any]], Optional[Dict[str, Any]], List[int]]:
+    """
+    Parse one file into (entry, term_counts, embedding) triples, its
+    cross-reference record and its content trigrams. The embedding is None
+    when NumPy is not installed.
+    Module-level so it can run inside a process pool worker.
+    """
+    global _process_parser
+    if parser is None:
+        if _process_parser is None:
+            _process_parser = ASTParser()
+        parser = _process_parser
+
+    results = []
+    references = None
+    trigrams: List[int] = []
+    try:
+        content = ASTParser._read_bytes(file_path)
+        if content is None:
+            return results, references, trigrams
+        trigrams = file_trigrams(content)
+        extracted = parser.extract_file(file_path, content)
+        references = extracted["references"]
+        results = definition_entries(extracted["definitions"], rel_path, content_hash(content))
+    except Exception:
+        pass
+    return results, references, trigrams
+
+def definition_entries(definitions: List[Dict[str, Any]], rel_path: str, digest: str) -> List[Tuple[Dict[str, Any], Dict[str, int], Any]]:
+    """(entry, term_counts, embedding) triples of extracted definitions."""
+    results = []
+    for d in definitions:
+        vector = embed(d["keywords"], name_terms(d["name"])) if vectors_available() else None
+        entry = {
+            "path": rel_path,
+            "name": d["name"],
+            "qualname": d["qualname"],
+            "type": d["type"],
+            "start_line": d["start_line"],
+            "end_line": d["end_line"],
+            # Exact span, fetched lazily at query time (see CodeIndexer.fetch_spans)
+            "start_byte": d["start_byte"],
+            "end_byte": d["end_byte"],
+            "file_hash": digest,
+            "content": d["source"][:500] # Store snippet preview
+        }
+        if "part" in d:
+            entry["part"] = d["part"]
+        results.append((entry, d["keywords"], vector))
+    return results
+
+class QueryCache:
+    """
+    Thread-safe LRU of search results. Keys carry the snapshot of every shard read, so
+    entries of an older index are never served and simply age out.
+    """
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Tuple, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            results = self._items.get(key)
+            if results is None:
+                return None
+            self._items.move_to_end(key)
+        # Callers may modify what they get back
+        return [dict(item) for item in results]
+
+    def put(self, key: Tuple, results: List[Dict[str, Any]]):
+        with self._lock:
+            self._items[key] = [dict(item) for item in results]
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(self, project: str):
+        """Drop every cached query of one project."""
+        with self._lock:
+            for key in [k for k in self._items if k[0] == project]:
+                del self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+# Shared by every CodeIndexer of the process: ContextBuilder creates a new
+# indexer per command, but plan -> solve -> auto iterations repeat queries.
+query_cache = QueryCache()
+
+
+class IndexShard:
+    """
+    One independently stored and rebuilt slice of the index: entries, their
+    inverted index, file fingerprints and (optionally) embeddings.
+    Doc ids are local to the shard.
+
+    Each save writes a complete snapshot into a new `gen-NNNNNN/` directory
+    and then publishes it by atomically replacing the `CURRENT` pointer.
+    Readers resolve the pointer once and keep using that snapshot, so a
+    rebuild in flight (or a crashed one) is never visible to them.
+    """
+    def __init__(self, directory: Path, legacy_index_file: Optional[Path] = None):
+        self.directory = directory
+        self.current_file = directory / "CURRENT"
+        # Snapshot the readers below are bound to (resolved on first use)
+        self._snapshot: Optional[Path] = None
+        # Pre-binary JSON index, still read when no binary index exists yet
+        self.legacy_index_file = legacy_index_file
+        self.data: List[Dict[str, Any]] = []
+        self.inverted = InvertedIndex()
+        # rel_path -> {"mtime": ns, "size": bytes, "hash": sha1}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        # Row i embeds self.data[i]; None when NumPy is unavailable
+        self.vectors: Optional[VectorStore] = None
+        # rel_path -> imports / calls / attribute references of that file
+        self.xref: Optional[Dict[str, Dict[str, Any]]] = None
+        # rel_path -> sorted content trigrams (see axion.core.trigram)
+        self.trigrams: Optional[Dict[str, List[int]]] = None
+        self._trigram_reader: Optional[MappedTrigrams] = None
+        # Nothing is read from disk here: searches memory-map the index on
+        # first use, re-indexing loads it fully through load().
+        self._reader: Optional[MappedIndex] = None
+        self._mapped_vectors: Optional[VectorStore] = None
+        self.loaded = False
+        # Snapshot the in-memory state was loaded from
+        self.loaded_snapshot: Optional[str] = None
+
+    def published_snapshot(self) -> Optional[str]:
+        """Name of the snapshot `CURRENT` points to (None before the first save)."""
+        try:
+            name = self.current_file.read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+        return name or None
+
+    def snapshot_dir(self) -> Path:
+        if self._snapshot is None:
+            name = self.published_snapshot()
+            # Shards saved before snapshots existed keep their files in place
+            self._snapshot = self.directory / name if name else self.directory
+        return self._snapshot
+
+    @property
+    def index_file(self) -> Path:
+        return self.snapshot_dir() / "index.bin"
+
+    @property
+    def vectors_file(self) -> Path:
+        return self.snapshot_dir() / "vectors.npy"
+
+    @property
+    def xref_file(self) -> Path:
+        return self.snapshot_dir() / "xref.json"
+
+    @property
+    def trigrams_file(self) -> Path:
+        return self.snapshot_dir() / "trigrams.bin"
+
+    def get_reader(self) -> Optional[MappedIndex]:
+        if self._reader is None and self.index_file.exists():
+            self._reader = MappedIndex(self.index_file)
+        return self._reader
+
+    def _get_mapped_vectors(self, reader: MappedIndex) -> Optional[VectorStore]:
+        if self._mapped_vectors is None and vectors_available() and self.vectors_file.exists():
+            try:
+                store = VectorStore.load(self.vectors_file, mmap=True)
+            except Exception:
+                return None
+            # Ignore vectors that do not belong to this index (e.g. mid-update)
+            if len(store) == reader.num_docs:
+                self._mapped_vectors = store
+        return self._mapped_vectors
+
+    def get_trigram_reader(self) -> Optional[MappedTrigrams]:
+        if self._trigram_reader is None and self.trigrams_file.exists():
+            try:
+                self._trigram_reader = MappedTrigrams(self.trigrams_file)
+            except Exception:
+                return None
+        return self._trigram_reader
+
+    def generation(self) -> int:
+        """Number of times this shard was written (0 before the first save)."""
+        try:
+            reader = self.get_reader()
+        except Exception:
+            return 0
+        return reader.meta.get("generation", 0) if reader else 0
+
+    def bound_version(self) -> Tuple[Optional[str], int, Optional[Tuple[int, int, int]]]:
+        """Snapshot name, generation and index file identity that search_sources() serves queries from."""
+        name = self.loaded_snapshot if self.loaded else self.snapshot_dir().name
+        try:
+            reader = self.get_reader()
+        except Exception:
+            reader = None
+        return name, self.generation(), reader.file_id if reader else None
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._trigram_reader is not None:
+            self._trigram_reader.close()
+            self._trigram_reader = None
+        self._mapped_vectors = None
+        self._snapshot = None
+
+    def reset(self):
+        """Start from an empty in-memory shard (full rebuild)."""
+        # Drop readers bound to an older snapshot than the one being replaced
+        self.close()
+        self.loaded = True
+        self.loaded_snapshot = self.published_snapshot()
+        self.data = []
+        self.inverted = InvertedIndex()
+        self.files = {}
+        self.vectors = VectorStore() if vectors_available() else None
+        self.xref = {}
+        self.trigrams = {}
+
+    def get_xref(self) -> Dict[str, Dict[str, Any]]:
+        """Cross-reference records, read from disk on first use."""
+        if self.xref is None:
+            self.xref = {}
+            if self.xref_file.exists():
+                try:
+                    with open(self.xref_file, "r", encoding="utf-8") as f:
+                        self.xref = json.load(f)
+                except Exception:
+                    self.xref = {}
+        return self.xref
+
+    def get_trigrams(self) -> Dict[str, List[int]]:
+        """Forward trigram map, rebuilt from disk on first use."""
+        if self.trigrams is None:
+            reader = self.get_trigram_reader()
+            self.trigrams = reader.to_files() if reader else {}
+        return self.trigrams
+
+    def load(self):
+        """Load the whole shard into memory (required before re-indexing)."""
+        self.close()
+        self.reset()
+        self.loaded_snapshot = self.published_snapshot()
+        try:
+            reader = self.get_reader()
+            if reader:
+                self.data = reader.entries()
+                self.inverted = reader.to_inverted()
+                self.files = reader.meta.get("files", {})
+                if not reader.has_symbols or reader.meta.get("version", 0) < INDEX_VERSION:
+                    # Written by an older extractor (no qualified names, byte spans...): re-parse everything
+                    for fingerprint in self.files.values():
+                        fingerprint.update(mtime=-1, hash="", blob=None)
+            elif self.legacy_index_file and self.legacy_index_file.exists():
+                self._load_json(self.legacy_index_file)
+        except Exception:
+            self.data = []
+            self.inverted = InvertedIndex()
+            self.files = {}
+        self._load_vectors()
+        self.xref = None
+        self.trigrams = None
+        # Indexes written before cross-references / trigrams existed: re-parse those files
+        xref, trigrams = self.get_xref(), self.get_trigrams()
+        for rel_path, fingerprint in self.files.items():
+            if rel_path not in xref or rel_path not in trigrams:
+                fingerprint.update(mtime=-1, hash="")
+
+    def _load_vectors(self):
+        self.vectors = None
+        if not vectors_available():
+            return
+        if self.vectors_file.exists():
+            try:
+                store = VectorStore.load(self.vectors_file)
+                if len(store) == len(self.data):
+                    self.vectors = store
+                    return
+            except Exception:
+                pass
+        # Missing or stale: re-embed from the postings, no re-parse needed
+        doc_terms: List[Dict[str, int]] = [{} for _ in self.data]
+        for term, plist in self.inverted.postings.items():
+            for doc_id, tf in plist:
+                doc_terms[doc_id][term] = tf
+        self.vectors = VectorStore()
+        for item, term_counts in zip(self.data, doc_terms):
+            self.vectors.add(embed(term_counts, name_terms(item["name"])))
+
+    def _load_json(self, path: Path):
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        if isinstance(raw, list):
+            # Legacy format: flat list of entries with keyword lists
+            self.data = raw
+            self.inverted = InvertedIndex()
+            for item in self.data:
+                counts = {k: 1 for k in item.pop("keywords", [])}
+                self.inverted.add_document(counts, name_terms(item["name"]))
+        else:
+            self.data = raw.get("entries", [])
+            self.inverted = InvertedIndex.from_dict(raw.get("index", {}))
+            self.files = raw.get("files", {})
+
+    def _new_snapshot(self) -> Tuple[Path, int]:
+        """
+        Empty, unpublished snapshot directory for the next generation (called
+        under the write lock). The number follows every snapshot on disk, not
+        the one a reader of this shard may still be bound to, so the
+        directory CURRENT names is never reused.
+        """
+        generation = self._latest_generation() + 1
+        snapshot = self.directory / f"{SNAPSHOT_PREFIX}{generation:06d}"
+        # Left over by a crashed writer: it was never published
+        shutil.rmtree(snapshot, ignore_errors=True)
+        snapshot.mkdir(parents=True)
+        return snapshot, generation
+
+    def _latest_generation(self) -> int:
+        """Highest generation on disk: snapshot directories, or index.bin of the layout without them."""
+        numbers = [int(p.name[len(SNAPSHOT_PREFIX):]) for p in self.directory.glob(SNAPSHOT_PREFIX + "*")
+                   if p.name[len(SNAPSHOT_PREFIX):].isdigit()]
+        if numbers or self.published_snapshot() is not None:
+            return max(numbers, default=0)
+        legacy = self.directory / "index.bin"
+        if not legacy.exists():
+            return 0
+        try:
+            reader = MappedIndex(legacy)
+        except Exception:
+            return 0
+        try:
+            return reader.meta.get("generation", 0)
+        finally:
+            reader.close()
+
+    def _publish(self, snapshot: Path):
+        """Make `snapshot` durable, point CURRENT at it and drop old snapshots."""
+        for path in snapshot.iterdir():
+            with open(path, "rb") as f:
+                os.fsync(f.fileno())
+        _fsync_dir(snapshot)
+        self.close()
+        tmp_file = self.directory / f"CURRENT.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(snapshot.name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.current_file)
+        _fsync_dir(self.directory)
+        self.loaded_snapshot = snapshot.name
+
+        snapshots = sorted(p for p in self.directory.glob(SNAPSHOT_PREFIX + "*") if p.is_dir() and p != snapshot)
+        for old in snapshots[:len(snapshots) - (SNAPSHOTS_KEPT - 1)]:
+            shutil.rmtree(old, ignore_errors=True)
+        # Files of the layout without snapshots
+        for name in SNAPSHOT_FILES:
+            (self.directory / name).unlink(missing_ok=True)
+
+    def save(self):
+        snapshot, generation = self._new_snapshot()
+        meta = {"version": INDEX_VERSION, "generation": generation, "files": self.files}
+        write_index(snapshot / "index.bin", self.data, self.inverted, meta)
+        if self.vectors is not None:
+            self.vectors.save(snapshot / "vectors.npy")
+        if self.xref is not None:
+            with open(snapshot / "xref.json", "w", encoding="utf-8") as f:
+                json.dump(self.xref, f, separators=(",", ":"))
+        if self.trigrams is not None:
+            write_trigrams(snapshot / "trigrams.bin", self.trigrams)
+        self._publish(snapshot)
+
+    def delete(self):
+        """Remove the shard's files (its directory became empty)."""
+        self.close()
+        shutil.rmtree(self.directory / "segments", ignore_errors=True)
+        for snapshot in self.directory.glob(SNAPSHOT_PREFIX + "*"):
+            shutil.rmtree(snapshot, ignore_errors=True)
+        for name in SNAPSHOT_FILES + ("CURRENT",):
+            (self.directory / name).unlink(missing_ok=True)
+        try:
+            self.directory.rmdir()
+        except OSError:
+            pass
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": INDEX_VERSION,
+            "entries": self.data,
+            "index": self.inverted.to_dict(),
+            "files": self.files,
+        }
+
+    def indexed_paths(self) -> set:
+        return set(self.files) | {item["path"] for item in self.data}
+
+    def remove_paths(self, paths):
+        """Drop every entry belonging to the given relative paths."""
+        if not paths:
+            return
+        if self.xref is not None:
+            for path in paths:
+                self.xref.pop(path, None)
+        if self.trigrams is not None:
+            for path in paths:
+                self.trigrams.pop(path, None)
+        self.remove_entries([i for i, item in enumerate(self.data) if item["path"] in paths])
+
+    def remove_entries(self, doomed: List[int]):
+        """Drop entries by position (with their postings and vectors)."""
+        if not doomed:
+            return
+        self.inverted.remove_documents(doomed)
+        if self.vectors is not None:
+            self.vectors.remove(doomed)
+        doomed_set = set(doomed)
+        self.data = [item for i, item in enumerate(self.data) if i not in doomed_set]
+
+    def set_file_facts(self, rel_path: str, references: Optional[Dict[str, Any]], trigrams: List[int]):
+        # Unparseable files get an empty record so they are not retried on load
+        self.get_xref()[rel_path] = references or {}
+        self.get_trigrams()[rel_path] = trigrams
+
+    def add_entry(self, entry: Dict[str, Any], term_counts: Dict[str, int], vector: Any = None):
+        names = name_terms(entry["name"])
+        self.inverted.add_document(term_counts, names)
+        if self.vectors is not None:
+            self.vectors.add(vector if vector is not None else embed(term_counts, names))
+        self.data.append(entry)
+
+    def find_symbols(self, name: str, prefix: bool = False, limit: int = 20) -> List[Dict[str, Any]]:
+        """Definitions whose qualified name equals (or starts with) `name`."""
+        if not self.loaded:
+            reader = self.get_reader()
+            if reader is None:
+                return []
+            if reader.has_symbols:
+                return [reader.entry(doc_id) for doc_id in reader.find_symbols(name, prefix=prefix, limit=limit)]
+            entries = reader.entries()
+        else:
+            entries = self.data
+        entries = [e for e in entries if e.get("type") != "chunk"]
+        matches = [e for e in entries if (e.get("qualname") or e["name"]) == name
+                   or (prefix and (e.get("qualname") or e["name"]).startswith(name))]
+        return sorted(matches, key=lambda e: e.get("qualname") or e["name"])[:limit]
+
+    def search_sources(self):
+        """(ranked index, entry lookup, vector store) to serve queries from."""
+        if not self.loaded:
+            reader = self.get_reader()
+            if reader:
+                return reader, reader.entry, self._get_mapped_vectors(reader)
+            if self.legacy_index_file and self.legacy_index_file.exists():
+                self.load()
+        return self.inverted, self.data.__getitem__, self.vectors
+
+
+class SegmentWriter:
+    """
+    Memory-bounded rebuild of one shard. Parsed files accumulate in the
+    shard as usual; when the indexer's memory ceiling is reached, the batch
+    is written out as a segment (a complete shard under `segments/`) and
+    dropped from memory. finish() merges the segments into the shard files.
+    Segments left by an interrupted build are reused if their files did not change.
+    """
+    def __init__(self, shard: IndexShard):
+        self.shard = shard
+        self.directory = shard.directory / "segments"
+        self.segments: List[IndexShard] = []
+        # Rough estimate of the bytes held by the current batch
+        self.size = 0
+        self._next = 0
+
+    def resume(self, to_parse: Dict[str, Path]) -> int:
+        """Keep usable segments of an interrupted build; their files leave `to_parse`."""
+        if not self.directory.is_dir():
+            return 0
+        reused = 0
+        for seg_dir in sorted(self.directory.iterdir()):
+            segment = IndexShard(seg_dir)
+            try:
+                reader = segment.get_reader()
+            except Exception:
+                reader = None
+            files = reader.meta.get("files", {}) if reader else {}
+            if files and all(p in to_parse and self.shard.files.get(p) == fp for p, fp in files.items()):
+                self.segments.append(segment)
+                for p in files:
+                    to_parse.pop(p)
+                reused += len(files)
+                self._next = int(seg_dir.name) + 1
+            else:
+                segment.close()
+                shutil.rmtree(seg_dir, ignore_errors=True)
+        return reused
+
+    def add(self, rel_path: str, results, references: Optional[Dict[str, Any]], trigrams: List[int]):
+        for entry, term_counts, vector in results:
+            self.shard.add_entry(entry, term_counts, vector)
+            # Entry dict + content, postings and term dict slots, embedding
+            self.size += 600 + len(entry["content"]) + 200 * len(term_counts)
+            if vector is not None:
+                self.size += 4 * len(vector)
+        self.shard.set_file_facts(rel_path, references, trigrams)
+        self.size += 256 + 40 * len(trigrams)
+
+    def flush(self):
+        """Write the current batch as a segment and release it."""
+        shard = self.shard
+        if not shard.xref:
+            return
+        segment = IndexShard(self.directory / f"{self._next:05d}")
+        self._next += 1
+        segment.data, segment.inverted, segment.vectors = shard.data, shard.inverted, shard.vectors
+        segment.xref, segment.trigrams = shard.xref, shard.trigrams
+        segment.files = {p: shard.files[p] for p in shard.xref if p in shard.files}
+        segment.save()
+        self.segments.append(IndexShard(segment.directory))
+
+        shard.data = []
+        shard.inverted = InvertedIndex()
+        shard.vectors = VectorStore() if vectors_available() else None
+        shard.xref = {}
+        shard.trigrams = {}
+        self.size = 0
+
+    def finish(self) -> bool:
+        """
+        Merge the segments into the shard's files. Returns False when nothing
+        was spilled: the shard is still in memory and is saved as usual.
+        """
+        if not self.segments:
+            return False
+        self.flush()
+        shard = self.shard
+        snapshot, generation = shard._new_snapshot()
+        meta = {"version": INDEX_VERSION, "generation": generation, "files": shard.files}
+
+        merge_indexes(snapshot / "index.bin", [segment.get_reader() for segment in self.segments], meta)
+        merge_trigrams(snapshot / "trigrams.bin", [segment.get_trigram_reader() for segment in self.segments])
+        with open(snapshot / "xref.json", "w", encoding="utf-8") as f:
+            f.write("{")
+            first = True
+            for segment in self.segments:
+                for rel_path, record in segment.get_xref().items():
+                    f.write(("" if first else ",") + json.dumps(rel_path) + ":" + json.dumps(record, separators=(",", ":")))
+                    first = False
+                segment.xref = None
+            f.write("}")
+        if vectors_available() and all(segment.vectors_file.exists() for segment in self.segments):
+            merge_vector_files(snapshot / "vectors.npy", [segment.vectors_file for segment in self.segments])
+        shard._publish(snapshot)
+
+        for segment in self.segments:
+            segment.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        # Searches map the merged files; re-indexing loads them again
+        shard.data, shard.inverted, shard.vectors = [], InvertedIndex(), None
+        shard.xref, shard.trigrams = None, None
+        shard.loaded = False
+        return True
+
 
 class CodeIndexer:
     """
     A lightweight, zero-dependency semantic-keyword indexer.
-    Uses basic TF-IDF principles and AST-aware keyword weighting.
+    Keeps an inverted index (term -> postings) built at index time and
+    ranks definitions with BM25, boosting matches on the definition name.
+    When NumPy is installed it also keeps offline hashed embeddings for
+    vector and hybrid search.
+    With `sharded=True` the index is split by top-level directory: each
+    shard is stored and rebuilt on its own and queries fan out in parallel.
+    Rebuilds keep at most ~`memory_limit` bytes of parsed data in memory
+    (0 = no limit), spilling the rest to on-disk segments (see SegmentWriter).
     Works perfectly even in restricted environments like Python 3.14.
     """
-    def __init__(self, project_path: str):
+    def __init__(self, project_path: str, jobs: int = 1, sharded: Optional[bool] = None, use_git: bool = True,
+                 memory_limit: int = DEFAULT_MEMORY_LIMIT):
         self.project_path = Path(project_path)
-        self.index_file = self.project_path / ".axion" / "index.json"
-        self.ast_parser = ASTParser()
-        self.data: List[Dict[str, Any]] = []
-        self.load_index()
+        self.memory_limit = memory_limit
+        # List files from the git index when the project is a work tree
+        self.use_git = use_git
+        # Worker processes used to parse files (0 = one per CPU)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.index_dir = self.project_path / ".axion"
+        self.shards_dir = self.index_dir / "shards"
+        self.manifest_file = self.shards_dir / "manifest.json"
+        # Files changed on disk whose index update was deferred (see mark_stale)
+        self.stale_file = self.index_dir / "stale"
+        # Default to whatever layout is already on disk
+        self.sharded = self.manifest_file.exists() if sharded is None else sharded
+        self.shards: Dict[str, IndexShard] = {}
+        self._writers: Dict[str, SegmentWriter] = {}
+        self._xref_graph: Optional[XRefGraph] = None
+        # Identifies this project in the shared query cache
+        self._cache_id = str(self.project_path.resolve())
 
-    def load_index(self):
-        if self.index_file.exists():
+    @property
+    def data(self) -> List[Dict[str, Any]]:
+        """All loaded entries, shard by shard."""
+        return [item for key in sorted(self.shards) for item in self.shards[key].data]
+
+    def shard_key(self, rel_path: str) -> str:
+        if not self.sharded:
+            return ""
+        parts = Path(rel_path).parts
+        return parts[0] if len(parts) > 1 else ROOT_SHARD
+
+    def _shard(self, key: str) -> IndexShard:
+        if key not in self.shards:
+            if key == "":
+                self.shards[key] = IndexShard(self.index_dir, legacy_index_file=self.index_dir / "index.json")
+            else:
+                self.shards[key] = IndexShard(self.shards_dir / key)
+        return self.shards[key]
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        if self.manifest_file.exists():
             try:
-                with open(self.index_file, "r", encoding="utf-8") as f:
-                    self.data = json.load(f)
+                with open(self.manifest_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
             except Exception:
-                self.data = []
+                pass
+        return {}
 
-    def save_index(self):
-        self.index_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.index_file, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, indent=2)
+    def _shard_keys(self) -> List[str]:
+        if not self.sharded:
+            return [""]
+        return sorted(set(self.shards) | set(self._read_manifest().get("shards", [])))
 
-    def index_project(self):
-        """Index all Python files in the project."""
-        self.data = []
-        for root, _, files in os.walk(self.project_path):
-            if ".axion" in root or ".git" in root or "__pycache__" in root:
+    @property
+    def generation(self) -> int:
+        """
+        Index generation, bumped by every rebuild that writes the index
+        (kept in the manifest when sharded, in index.bin otherwise).
+        """
+        if self.sharded:
+            return self._read_manifest().get("generation", 0)
+        return self._shard("").generation()
+
+    @staticmethod
+    def _normalize_scope(scope: Optional[str]) -> Optional[str]:
+        if scope is None:
+            return None
+        scope = Path(scope).as_posix().strip("/")
+        return None if scope in ("", ".") else scope
+
+    def _shard_keys_for(self, scope: Optional[str]) -> List[str]:
+        """Only the shards that can hold files under `scope`."""
+        keys = self._shard_keys()
+        if not scope or not self.sharded:
+            return keys
+        parts = Path(scope).parts
+        if len(parts) == 1 and (self.project_path / scope).is_file():
+            return [k for k in keys if k == ROOT_SHARD] or [ROOT_SHARD]
+        return [k for k in keys if k == parts[0]] or [parts[0]]
+
+    @staticmethod
+    def _in_scope(rel_path: str, scope: Optional[str]) -> bool:
+        if not scope:
+            return True
+        rel_path = Path(rel_path).as_posix()
+        return rel_path == scope or rel_path.startswith(scope + "/")
+
+    def _save_manifest(self):
+        keys = [k for k, shard in self.shards.items() if shard.data or shard.files]
+        manifest = self._read_manifest()
+        keys = sorted(set(keys) | {k for k in manifest.get("shards", []) if k not in self.shards})
+        self.shards_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.manifest_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "generation": manifest.get("generation", 0) + 1, "shards": keys}, f)
+        os.replace(tmp_file, self.manifest_file)
+
+    def _drop_other_layout(self):
+        """Switching between flat and sharded layouts: remove the stale one."""
+        if self.sharded:
+            IndexShard(self.index_dir).delete()
+        elif self.manifest_file.exists():
+            shutil.rmtree(self.shards_dir, ignore_errors=True)
+
+    def close(self):
+        for shard in self.shards.values():
+            shard.close()
+
+    def load_index(self):
+        """Load every shard into memory (required before re-indexing)."""
+        for key in self._shard_keys():
+            self._shard(key).load()
+
+    def export_json(self, path: str):
+        """Export the index as JSON (for inspection or external tools)."""
+        for key in self._shard_keys():
+            if not self._shard(key).loaded:
+                self._shard(key).load()
+        if self.sharded:
+            payload = {"version": INDEX_VERSION, "shards": {k: self.shards[k].to_dict() for k in self._shard_keys()}}
+        else:
+            payload = self._shard("").to_dict()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+
+    @contextmanager
+    def _write_lock(self):
+        """Serialize index writers across processes; readers never wait for it."""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.index_dir / "index.lock", "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _load_for_update(shard: IndexShard):
+        """(Re)load a shard unless it already holds the latest published snapshot."""
+        if not shard.loaded or shard.loaded_snapshot != shard.published_snapshot():
+            shard.load()
+
+    def index_project(self, full: bool = False, scope: Optional[str] = None) -> Dict[str, int]:
+        """
+        Index all Python files in the project (or only under `scope`).
+        Files are listed from the git index when possible (see
+        axion.core.files). Only files whose fingerprint (git blob, or mtime,
+        size and content hash) changed are re-parsed; entries of deleted
+        files are dropped. `full` forces a rebuild.
+        Shards without changes are neither rewritten nor re-read.
+        """
+        with self._write_lock():
+            self._drop_other_layout()
+            scope = self._normalize_scope(scope)
+            listing = self._list_files()
+            current = {p: f for p, f in listing.files.items() if self._in_scope(p, scope)}
+            by_shard: Dict[str, Dict[str, Path]] = {}
+            for rel_path, full_path in current.items():
+                by_shard.setdefault(self.shard_key(rel_path), {})[rel_path] = full_path
+
+            changes = {}
+            for key in sorted(set(by_shard) | set(self._shard_keys_for(scope))):
+                shard = self._shard(key)
+                if full and scope is None:
+                    shard.reset()
+                else:
+                    self._load_for_update(shard)
+                files = by_shard.get(key, {})
+                indexed = {p for p in shard.indexed_paths() if self._in_scope(p, scope)}
+                if full:
+                    shard.remove_paths(indexed)
+                    for p in indexed:
+                        shard.files.pop(p, None)
+                changes[key] = (files, indexed - set(files))
+            # A full rebuild rewrites every touched shard, even if it ended up empty
+            stats = self._apply_changes(changes, force_save=changes.keys() if full else (), blobs=listing.blobs)
+            self._clear_stale(lambda path: self._in_scope(path, scope))
+            return stats
+
+    def refresh_paths(self, rel_paths) -> Dict[str, int]:
+        """
+        Re-index only the given relative paths (e.g. files reported by the
+        watcher). Paths that no longer exist or that .gitignore excludes are
+        dropped from the index.
+        """
+        rel_paths = set(rel_paths)
+        # Same files as a full listing: .gitignored ones are not indexed
+        ignored = git_ignored(self.project_path, rel_paths) if self.use_git else set()
+        with self._write_lock():
+            changes: Dict[str, Tuple[Dict[str, Path], set]] = {}
+            for rel_path in sorted(rel_paths):
+                key = self.shard_key(rel_path)
+                shard = self._shard(key)
+                self._load_for_update(shard)
+                current, deleted = changes.setdefault(key, ({}, set()))
+                full_path = self.project_path / rel_path
+                if rel_path not in ignored and self._is_indexable(rel_path) and full_path.is_file():
+                    current[rel_path] = full_path
+                elif rel_path in shard.indexed_paths():
+                    deleted.add(rel_path)
+            stats = self._apply_changes(changes)
+            self._clear_stale(lambda path: path in rel_paths)
+            return stats
+
+    def apply_edits(self, changes: Dict[str, Tuple[bytes, bytes, List[LineHunk]]]) -> Dict[str, int]:
+        """
+        Update the index after files went from `old` to `new` (already on
+        disk) through the given line hunks, e.g. those of an applied diff:
+        {rel_path: (old, new, hunks)}. Each file is re-parsed incrementally
+        from its previous tree, and only the definitions touching a changed
+        region are re-extracted; the other entries of the file are shifted in
+        place. Files the index does not hold as `old` (e.g. created ones,
+        `old` = b"") are indexed whole, and files no longer on disk are
+        dropped. All files are published together: one lock, one save per shard.
+        """
+        parser = ASTParser()
+        stats = {"added": 0, "modified": 0, "deleted": 0, "unchanged": 0}
+        prepared = {}
+        for rel_path, (old, new, hunks) in sorted(changes.items()):
+            if not self._is_indexable(rel_path):
+                continue
+            edits = byte_edits(old, new, hunks)
+            changed = parser.reparse(old, new, edits, parser.language_for(rel_path))[1] if edits is not None else None
+            prepared[rel_path] = (old, new, hunks, edits, changed)
+        if not prepared:
+            return stats
+
+        ignored = git_ignored(self.project_path, prepared) if self.use_git else set()
+        with self._write_lock():
+            fallback: Dict[str, Tuple[Dict[str, Path], set]] = {}
+            updated = set()
+            for rel_path, (old, new, hunks, edits, changed) in prepared.items():
+                key = self.shard_key(rel_path)
+                shard = self._shard(key)
+                self._load_for_update(shard)
+                full_path = self.project_path / rel_path
+                known = shard.files.get(rel_path)
+                own = [i for i, item in enumerate(shard.data) if item["path"] == rel_path]
+                if (changed is None or not known or not full_path.is_file() or known["hash"] != hashlib.sha1(old).hexdigest()
+                        or any(shard.data[i].get("start_byte") is None for i in own)):
+                    current, deleted = fallback.setdefault(key, ({}, set()))
+                    if rel_path not in ignored and full_path.is_file():
+                        current[rel_path] = full_path
+                    elif rel_path in shard.indexed_paths():
+                        deleted.add(rel_path)
+                    continue
+                self._shift_entries(shard, rel_path, own, parser.extract_file(str(full_path), new, ranges=changed),
+                                    new, hunks, edits, changed)
+                updated.add(key)
+                stats["modified"] += 1
+
+            published = self._apply_changes(fallback, force_save=updated)
+            self._clear_stale(lambda path: path in prepared)
+        for name, count in published.items():
+            stats[name] += count
+        return stats
+
+    def _shift_entries(self, shard: "IndexShard", rel_path: str, own: List[int], extracted: Dict[str, Any],
+                       new: bytes, hunks: List[LineHunk], edits, changed: List[Tuple[int, int]]):
+        """Replace the re-extracted definitions of a file and shift the others past the edits."""
+        refreshed = {d["qualname"] for d in extracted["definitions"]}
+        digest = content_hash(new)
+
+        def shift(pos: int) -> int:
+            return pos + sum((e.new_end - e.new_start) - (e.old_end - e.old_start) for e in edits if e.old_end <= pos)
+
+        def shift_line(line: int) -> int:
+            return line + sum(added - removed for start, removed, added in hunks if start + removed <= line - 1)
+
+        doomed = []
+        for i in own:
+            item = shard.data[i]
+            # Text inserted right at the end of a span follows it, hence the end - 1
+            start, end = shift(item["start_byte"]), shift(item["end_byte"] - 1) + 1
+            # Re-extracted, or overlapping a changed region without surviving it
+            if (item.get("qualname") in refreshed
+                    or any(item["start_byte"] < e.old_end and item["end_byte"] > e.old_start for e in edits)
+                    or any(start < range_end and end > range_start for range_start, range_end in changed)):
+                doomed.append(i)
                 continue
-                
-            for file in files:
-                if file.endswith(".py"):
-                    full_path = Path(root) / file
-                    rel_path = full_path.relative_to(self.project_path)
-                    self._index_file(full_path, str(rel_path))
-        self.save_index()
+            item.update(start_byte=start, end_byte=end,
+                        start_line=shift_line(item["start_line"]), end_line=shift_line(item["end_line"]),
+                        file_hash=digest)
+        shard.remove_entries(doomed)
+        for entry, term_counts, vector in definition_entries(extracted["definitions"], rel_path, digest):
+            shard.add_entry(entry, term_counts, vector)
+        shard.set_file_facts(rel_path, extracted["references"], file_trigrams(new))
+        st = (self.project_path / rel_path).stat()
+        shard.files[rel_path] = {"mtime": st.st_mtime_ns, "size": st.st_size, "hash": hashlib.sha1(new).hexdigest(), "blob": None}
+
+    def mark_stale(self, rel_paths: Iterable[str]):
+        """
+        Record files changed on disk (e.g. by an applied diff) without
+        rewriting the index now: the next index_project, refresh_paths or
+        refresh_stale publishes them. Appends to .axion/stale, no lock taken.
+        """
+        lines = "".join(f"{rel_path}\n" for rel_path in rel_paths)
+        if lines:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.stale_file, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+    def stale_paths(self) -> List[str]:
+        """Files marked stale and not yet published."""
+        try:
+            with open(self.stale_file, "r", encoding="utf-8") as f:
+                return sorted({line.rstrip("\n") for line in f if line.strip()})
+        except OSError:
+            return []
+
+    def refresh_stale(self) -> Dict[str, int]:
+        """Publish the files marked stale, in one update."""
+        stale = self.stale_paths()
+        if not stale:
+            return {"added": 0, "modified": 0, "deleted": 0, "unchanged": 0}
+        return self.refresh_paths(stale)
+
+    def _clear_stale(self, published):
+        """Forget the stale marks of published paths (under the write lock)."""
+        stale = self.stale_paths()
+        if not stale:
+            return
+        remaining = [rel_path for rel_path in stale if not published(rel_path)]
+        if remaining:
+            tmp_file = self.stale_file.with_name(f"stale.{os.getpid()}.tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write("".join(f"{rel_path}\n" for rel_path in remaining))
+            os.replace(tmp_file, self.stale_file)
+        else:
+            self.stale_file.unlink(missing_ok=True)
+
+    def _apply_changes(self, changes: Dict[str, Tuple[Dict[str, Path], Iterable[str]]], force_save: Iterable[str] = (),
+                       blobs: Optional[Dict[str, str]] = None) -> Dict[str, int]:
+        """
+        For each shard: fingerprint its `current` files, re-parse the changed
+        ones and drop `deleted`. Only modified shards are saved.
+        `blobs` (git blob SHAs of clean tracked files) settle most files
+        without a stat or a read.
+        """
+        blobs = blobs or {}
+        stats = {"added": 0, "modified": 0, "deleted": 0, "unchanged": 0}
+        to_parse: Dict[str, Path] = {}
+        dirty = set(force_save)
+
+        for key, (current, deleted) in changes.items():
+            shard = self._shard(key)
+            for rel_path, full_path in current.items():
+                known = shard.files.get(rel_path)
+                blob = blobs.get(rel_path)
+                if known and blob and known.get("blob") == blob:
+                    stats["unchanged"] += 1
+                    continue
+
+                st = full_path.stat()
+                same_stat = known and known["mtime"] == st.st_mtime_ns and known["size"] == st.st_size
+                if same_stat and not (blob and known.get("blob")):
+                    if known.get("blob") != blob:
+                        # Remember the blob for the next run
+                        known["blob"] = blob
+                        dirty.add(key)
+                    stats["unchanged"] += 1
+                    continue
+
+                digest = file_digest(full_path)
+                dirty.add(key)
+                if known and known["hash"] == digest:
+                    # Touched but identical: refresh the stat part of the fingerprint
+                    known.update(mtime=st.st_mtime_ns, size=st.st_size, blob=blob)
+                    stats["unchanged"] += 1
+                    continue
+
+                stats["modified" if known else "added"] += 1
+                shard.files[rel_path] = {"mtime": st.st_mtime_ns, "size": st.st_size, "hash": digest, "blob": blob}
+                to_parse[rel_path] = full_path
+
+            for rel_path in deleted:
+                shard.files.pop(rel_path, None)
+                dirty.add(key)
+            stats["deleted"] += len(deleted)
+            shard.remove_paths(set(deleted) | {p for p in current if p in to_parse})
+            if not shard.index_file.exists():
+                dirty.add(key)
+
+        self._xref_graph = None
+        # Shards rebuilt from scratch stream into segments under the memory ceiling
+        self._writers: Dict[str, SegmentWriter] = {}
+        for key in changes:
+            shard = self._shard(key)
+            if self.memory_limit and shard.files and all(p in to_parse for p in shard.files):
+                self._writers[key] = SegmentWriter(shard)
+                self._writers[key].resume(to_parse)
+            else:
+                shutil.rmtree(shard.directory / "segments", ignore_errors=True)
+
+        items = sorted(to_parse.items())
+        if self.jobs > 1 and len(items) > 1:
+            self._index_files_parallel([(full_path, rel_path) for rel_path, full_path in items])
+        else:
+            for rel_path, full_path in items:
+                self._index_file(full_path, rel_path)
+
+        writers, self._writers = self._writers, {}
+        for key in sorted(dirty):
+            shard = self._shard(key)
+            if key in writers and writers[key].finish():
+                continue
+            if key and not shard.data and not shard.files:
+                shard.delete()
+            else:
+                shard.save()
+        if self.sharded and dirty:
+            self._save_manifest()
+        if dirty:
+            query_cache.invalidate(self._cache_id)
+        return stats
+
+    @staticmethod
+    def _is_indexable(rel_path: str) -> bool:
+        parts = Path(rel_path).parts
+        if any(p in (".axion", ".git", "__pycache__") for p in parts[:-1]):
+            return False
+        return Path(rel_path).suffix.lower() in supported_suffixes()
+
+    def _list_files(self):
+        return list_files(self.project_path, suffixes=supported_suffixes(), exclude_dirs=("__pycache__",), use_git=self.use_git)
+
+    def _collect_files(self) -> Dict[str, Path]:
+        """Map relative path -> absolute path for every indexable file."""
+        return self._list_files().files
 
     def _index_file(self, file_path: Path, rel_path: str):
+        self._store(rel_path, *extract_file_entries(str(file_path), rel_path))
+
+    def _store(self, rel_path: str, results, references: Optional[Dict[str, Any]], trigrams: List[int]):
+        key = self.shard_key(rel_path)
+        writer = self._writers.get(key)
+        if writer is None:
+            shard = self._shard(key)
+            for entry, term_counts, vector in results:
+                shard.add_entry(entry, term_counts, vector)
+            shard.set_file_facts(rel_path, references, trigrams)
+            return
+        writer.add(rel_path, results, references, trigrams)
+        if sum(w.size for w in self._writers.values()) >= self.memory_limit:
+            for w in self._writers.values():
+                w.flush()
+
+    def _index_files_parallel(self, files: List[Tuple[Path, str]]):
+        """Fan parsing out to a process pool; results are merged in input order."""
+        paths = [str(full_path) for full_path, _ in files]
+        rel_paths = [rel_path for _, rel_path in files]
+        chunksize = max(1, len(files) // (self.jobs * 4))
+        with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+            for rel_path, extracted in zip(rel_paths, pool.map(extract_file_entries, paths, rel_paths, chunksize=chunksize)):
+                self._store(rel_path, *extracted)
+
+    def xref(self) -> XRefGraph:
+        """Cross-reference graph over every shard (built once, reset on re-index)."""
+        if self._xref_graph is None:
+            records: Dict[str, Dict[str, Any]] = {}
+            for key in self._shard_keys():
+                records.update(self._shard(key).get_xref())
+            self._xref_graph = XRefGraph(records)
+        return self._xref_graph
+
+    def callers_of(self, name: str) -> List[Dict[str, Any]]:
+        return self.xref().callers_of(name)
+
+    def callees_of(self, qualname: str) -> List[Dict[str, Any]]:
+        return self.xref().callees_of(qualname)
+
+    def importers_of(self, module: str) -> List[str]:
+        return self.xref().importers_of(module)
+
+    def grep(self, pattern: str, regex: bool = False, ignore_case: bool = False,
+             scope: Optional[str] = None, max_results: int = 100) -> List[Dict[str, Any]]:
+        """
+        Substring (or regex) search over indexed file contents.
+        The trigram index narrows the files to scan; each candidate is then
+        read and verified line by line. Files changed since the last index
+        run are only found through their indexed content.
+        Returns {"path", "line", "column", "text"} per matching line.
+        """
+        matcher = re.compile(pattern if regex else re.escape(pattern), re.IGNORECASE if ignore_case else 0)
+        plan = query_plan(pattern, regex=regex, ignore_case=ignore_case)
+        scope = self._normalize_scope(scope)
+
+        candidates: List[str] = []
+        for key in self._shard_keys_for(scope):
+            reader = self._shard(key).get_trigram_reader()
+            if reader is None:
+                # No trigram index yet: scan every indexable file
+                candidates = list(self._collect_files())
+                break
+            candidates.extend(reader.candidates(plan))
+
+        matches = []
+        for rel_path in sorted(candidates):
+            if not self._in_scope(rel_path, scope):
+                continue
+            try:
+                with open(self.project_path / rel_path, "r", encoding="utf-8", errors="replace") as f:
+                    text = f.read()
+            except OSError:
+                continue
+            if not matcher.search(text):
+                continue
+            for line_no, line in enumerate(text.splitlines(), 1):
+                match = matcher.search(line)
+                if match:
+                    matches.append({"path": rel_path, "line": line_no, "column": match.start() + 1, "text": line})
+                    if len(matches) >= max_results:
+                        return matches
+        return matches
+
+    def has_index(self) -> bool:
+        """Whether an index was ever built for this project."""
+        for key in self._shard_keys():
+            shard = self._shard(key)
+            if shard.index_file.exists() or (shard.legacy_index_file and shard.legacy_index_file.exists()):
+                return True
+        return False
+
+    def find_symbol(self, name: str, prefix: bool = False, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Look definitions up by qualified name ("ReasoningEngine.run_solve")
+        through each shard's sorted symbol table: a binary search, no ranking.
+        `prefix=True` lists every symbol starting with `name`. A bare name
+        that is not a top-level symbol falls back to the name postings.
+        """
+        matches = []
+        for key in self._shard_keys():
+            matches.extend(self._shard(key).find_symbols(name, prefix=prefix, limit=limit))
+        if not matches and not prefix and "." not in name:
+            for key in self._shard_keys():
+                index, get_entry, _ = self._shard(key).search_sources()
+                for doc_id in index.name_docs(name.lower()):
+                    entry = get_entry(doc_id)
+                    if entry["name"] == name and entry.get("type") != "chunk":
+                        matches.append(entry)
+        matches.sort(key=lambda e: (e.get("qualname") or e["name"], e["path"], e["start_line"]))
+        return matches[:limit]
+
+    def is_current(self, entry: Dict[str, Any]) -> bool:
+        """Whether the file of an indexed entry is unchanged in the working tree since it was indexed."""
         try:
-            definitions = self.ast_parser.get_definitions(str(file_path))
-            for d in definitions:
-                source = self.ast_parser.get_source_segment(
-                    str(file_path), d["start_line"], d["end_line"]
-                )
-                
-                # Create a searchable representation (keyword rich)
-                # We normalize case and extract meaningful words
-                search_blob = f"{d['name']} {d['type']} {d['docstring'] or ''} {source}"
-                keywords = set(re.findall(r'\w+', search_blob.lower()))
-                
-                self.data.append({
-                    "path": rel_path,
-                    "name": d["name"],
-                    "type": d["type"],
-                    "start_line": d["start_line"],
-                    "end_line": d["end_line"],
-                    "keywords": list(keywords),
-                    "content": source[:500] # Store snippet preview
-                })
-        except Exception:
-            pass
+            source = source_cache.get(str(self.project_path / entry["path"]))
+        except OSError:
+            return False
+        # file_hash is content_hash(), a prefix of the full SHA-1
+        return source is not None and entry.get("file_hash") == source.digest[:16]
+
+    def definition_source(self, entry: Dict[str, Any]) -> str:
+        """
+        Full source of an indexed definition, read from the working tree.
+        Raises ValueError when the file changed since it was indexed: its
+        stored line range would point at other code (see refresh_paths).
+        """
+        source = source_cache.get(str(self.project_path / entry["path"]))
+        if source is None:
+            raise FileNotFoundError(entry["path"])
+        if entry.get("file_hash") != source.digest[:16]:
+            raise ValueError(f"{entry['path']} changed since it was indexed")
+        starts = source.line_starts
+        start = starts[min(entry["start_line"] - 1, len(starts) - 1)]
+        end = starts[min(entry["end_line"], len(starts) - 1)]
+        return source.content[start:end].decode("utf-8", errors="replace").replace("\r\n", "\n")
+
+    def fetch_spans(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Copies of search results whose `content` preview is replaced by the
+        exact indexed span, read from the working tree (see SourceCache).
+        Entries of files that changed since indexing keep their preview.
+        """
+        fetched = []
+        for entry in entries:
+            entry = dict(entry)
+            try:
+                source = source_cache.get(str(self.project_path / entry["path"]))
+            except Exception:
+                source = None
+            # file_hash is content_hash(), a prefix of the full SHA-1
+            if source is not None and entry.get("end_byte") is not None and entry.get("file_hash") == source.digest[:16]:
+                entry["content"] = source.content[entry["start_byte"]:entry["end_byte"]].decode("utf-8", errors="replace")
+            fetched.append(entry)
+        return fetched
 
-    def search(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
-        """Search using Jaccard Similarity on keywords (Lite Contextual Search)."""
-        query_keywords = set(re.findall(r'\w+', query.lower()))
-        if not query_keywords:
+    def search(self, query: str, n_results: int = 5, mode: str = "keyword", scope: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Rank definitions for a query.
+        - keyword: BM25, touching only the postings of the query terms.
+        - vector: cosine similarity of the offline embeddings (needs NumPy).
+        - hybrid: blend of both; falls back to keyword without NumPy.
+        `scope` limits results to a subtree; only its shards are opened.
+        Results are cached per snapshot of the shards read (see QueryCache).
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        query_terms = tokenize(query)
+        if not query_terms:
             return []
+        scope = self._normalize_scope(scope)
+
+        # Shard readers stay bound to the snapshot they opened first, which may
+        # be older than the manifest: key on what is actually read.
+        sources, versions = [], []
+        for key in self._shard_keys_for(scope):
+            shard = self._shard(key)
+            index, get_entry, vectors = shard.search_sources()
+            versions.append((key,) + shard.bound_version())
+            if index.num_docs:
+                sources.append((key, index, get_entry, vectors))
+
+        cache_key = (self._cache_id, self.sharded, tuple(versions), mode, scope, n_results, " ".join(query_terms))
+        results = query_cache.get(cache_key)
+        if results is None:
+            results = self._search(sources, query_terms, n_results, mode, scope)
+            query_cache.put(cache_key, results)
+        return results
+
+    def _search(self, sources: List[Tuple], query_terms: List[str], n_results: int, mode: str,
+                scope: Optional[str]) -> List[Dict[str, Any]]:
+        if not sources:
+            return []
+        if any(vectors is None for _, _, _, vectors in sources):
+            mode = "keyword"
+
+        pool = n_results if mode != "hybrid" else max(n_results * 4, 20)
+        if scope:
+            # Scoped queries may discard hits from the rest of the shard
+            pool *= 4
+
+        corpus = None
+        if len(sources) > 1 and mode != "vector":
+            corpus = CorpusStats(
+                num_docs=sum(index.num_docs for _, index, _, _ in sources),
+                total_length=sum(index.total_length for _, index, _, _ in sources),
+                doc_freqs={t: sum(index.doc_frequency(t) for _, index, _, _ in sources) for t in set(query_terms)},
+            )
+        query_vector = embed(Counter(query_terms)) if mode != "keyword" else None
+
+        def search_shard(source):
+            key, index, _, vectors = source
+            keyword_hits = [] if mode == "vector" else [
+                (score, key, doc_id) for score, doc_id in index.search(query_terms, n_results=pool, corpus=corpus)
+            ]
+            vector_hits = [] if mode == "keyword" else [
+                (score, key, doc_id) for score, doc_id in vectors.search(query_vector, n_results=pool)
+            ]
+            return keyword_hits, vector_hits
+
+        if len(sources) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(sources), os.cpu_count() or 1)) as executor:
+                per_shard = list(executor.map(search_shard, sources))
+        else:
+            per_shard = [search_shard(sources[0])]
+
+        keyword_hits = [hit for kw, _ in per_shard for hit in kw]
+        vector_hits = [hit for _, vec in per_shard for hit in vec]
+        if mode == "keyword":
+            ranked = keyword_hits
+        elif mode == "vector":
+            ranked = vector_hits
+        else:
+            ranked = self._blend(keyword_hits, vector_hits)
+        ranked = heapq.nsmallest(pool, ranked, key=lambda h: (-h[0], h[1], h[2]))
+
+        lookups = {key: get_entry for key, _, get_entry, _ in sources}
+        results = []
+        for _, key, doc_id in ranked:
+            entry = lookups[key](doc_id)
+            if self._in_scope(entry["path"], scope):
+                results.append(entry)
+                if len(results) == n_results:
+                    break
+        return results
 
-        scores = []
-        for item in self.data:
-            item_keywords = set(item["keywords"])
-            intersection = query_keywords.intersection(item_keywords)
-            # Simple intersection count as score, weighted by name match
-            score = len(intersection)
-            if any(qk in item["name"].lower() for qk in query_keywords):
-                score += 5 # Boost explicit name matches
-                
-            if score > 0:
-                scores.append((score, item))
-
-        # Sort by score descending
-        scores.sort(key=lambda x: x[0], reverse=True)
-        
-        return [s[1] for s in scores[:n_results]]
+    @staticmethod
+    def _blend(keyword_hits, vector_hits) -> List[Tuple[float, str, int]]:
+        """Hybrid score: max-normalized BM25 blended with cosine similarity."""
+        scores: Dict[Tuple[str, int], float] = {}
+        top_keyword = max((h[0] for h in keyword_hits), default=1.0) or 1.0
+        for score, key, doc_id in keyword_hits:
+            scores[(key, doc_id)] = HYBRID_ALPHA * score / top_keyword
+        for score, key, doc_id in vector_hits:
+            scores[(key, doc_id)] = scores.get((key, doc_id), 0.0) + (1 - HYBRID_ALPHA) * score
+        return [(score, key, doc_id) for (key, doc_id), score in scores.items()]
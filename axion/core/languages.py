@@ -0,0 +1,107 @@
+"""
+Registry of the tree-sitter grammars ASTParser can use besides Python.
+Grammars are optional packages (`pip install axionflow[languages]`) and are
+imported the first time a file of their language is parsed, never at startup.
+"""
+import importlib
+import importlib.util
+import threading
+from pathlib import PurePath
+from typing import Dict, FrozenSet, NamedTuple, Optional, Set, Tuple
+
+from tree_sitter import Language
+
+PYTHON = "python"
+
+
+class LanguageSpec(NamedTuple):
+    name: str
+    # Grammar package and the function of it returning the language
+    module: str
+    factory: str
+    suffixes: Tuple[str, ...]
+    # Node types reported as "class" / "function" definitions
+    classes: FrozenSet[str]
+    functions: FrozenSet[str]
+    # Node types that only qualify the names nested in them (namespaces)
+    scopes: FrozenSet[str] = frozenset()
+    # Parents that carry a definition's leading comment (export, declarations)
+    wrappers: FrozenSet[str] = frozenset()
+    # Declarations reported as functions when their value is one (`const f = () => ...`)
+    bindings: FrozenSet[str] = frozenset()
+
+
+_JS_CLASSES = frozenset({"class_declaration"})
+_JS_FUNCTIONS = frozenset({"function_declaration", "generator_function_declaration", "method_definition"})
+_JS_WRAPPERS = frozenset({"export_statement", "lexical_declaration", "variable_declaration"})
+_JS_BINDINGS = frozenset({"variable_declarator", "field_definition", "public_field_definition"})
+_TS_CLASSES = _JS_CLASSES | {"abstract_class_declaration", "interface_declaration", "enum_declaration"}
+_TS_FUNCTIONS = _JS_FUNCTIONS | {"function_signature"}
+
+GRAMMARS: Dict[str, LanguageSpec] = {
+    "javascript": LanguageSpec("javascript", "tree_sitter_javascript", "language",
+                               (".js", ".jsx", ".mjs", ".cjs"), _JS_CLASSES, _JS_FUNCTIONS,
+                               wrappers=_JS_WRAPPERS, bindings=_JS_BINDINGS),
+    "typescript": LanguageSpec("typescript", "tree_sitter_typescript", "language_typescript",
+                               (".ts", ".mts", ".cts"), _TS_CLASSES, _TS_FUNCTIONS, frozenset({"internal_module"}),
+                               _JS_WRAPPERS | {"ambient_declaration"}, _JS_BINDINGS),
+    "tsx": LanguageSpec("tsx", "tree_sitter_typescript", "language_tsx",
+                        (".tsx",), _TS_CLASSES, _TS_FUNCTIONS, frozenset({"internal_module"}),
+                        _JS_WRAPPERS | {"ambient_declaration"}, _JS_BINDINGS),
+    # Headers are parsed as C++, which accepts C declarations too
+    "cpp": LanguageSpec("cpp", "tree_sitter_cpp", "language",
+                        (".cpp", ".cc", ".cxx", ".hpp", ".hh", ".hxx", ".h"),
+                        frozenset({"class_specifier", "struct_specifier", "union_specifier", "enum_specifier"}),
+                        frozenset({"function_definition"}), frozenset({"namespace_definition"}),
+                        frozenset({"template_declaration"})),
+}
+
+_BY_SUFFIX: Dict[str, str] = {suffix: spec.name for spec in GRAMMARS.values() for suffix in spec.suffixes}
+_BY_SUFFIX[".py"] = PYTHON
+
+_loaded: Dict[str, Optional[Language]] = {}
+_lock = threading.Lock()
+_available: Optional[Set[str]] = None
+
+
+def language_of(path: str) -> Optional[str]:
+    """Language name for a file path, from its suffix (None if unknown)."""
+    return _BY_SUFFIX.get(PurePath(path).suffix.lower())
+
+
+def grammar_available(name: str) -> bool:
+    """Whether the grammar package is installed (checked without importing it)."""
+    if name == PYTHON:
+        return True
+    spec = GRAMMARS.get(name)
+    if spec is None:
+        return False
+    try:
+        return importlib.util.find_spec(spec.module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def load_language(name: str) -> Optional[Language]:
+    """The grammar of a registered language, imported on first use (None if not installed)."""
+    with _lock:
+        if name in _loaded:
+            return _loaded[name]
+        spec = GRAMMARS.get(name)
+        language = None
+        if spec is not None:
+            try:
+                module = importlib.import_module(spec.module)
+                language = Language(getattr(module, spec.factory)())
+            except Exception:
+                language = None
+        _loaded[name] = language
+        return language
+
+
+def supported_suffixes() -> Set[str]:
+    """Suffixes of Python and of every registered language whose grammar is installed."""
+    global _available
+    if _available is None:
+        _available = {name for name in GRAMMARS if grammar_available(name)}
+    return {".py"} | {suffix for name in _available for suffix in GRAMMARS[name].suffixes}
@@ -0,0 +1,91 @@
+"""
+Relevance ranking of project files, computed before any of them is read.
+
+Signals, all cheap: index hits for the query, query terms in the path,
+recent git changes, and import proximity to the files holding index hits.
+"""
+from pathlib import PurePath
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from axion.core.search import name_terms, tokenize
+from axion.core.xref import XRefGraph, module_name
+
+HIT_WEIGHT = 3.0
+PATH_WEIGHT = 2.0
+RECENT_WEIGHT = 1.0
+IMPORT_WEIGHT = 1.0
+
+# Query words that say nothing about where the code lives
+STOPWORDS = frozenset({
+    "the", "and", "for", "with", "from", "into", "that", "this", "when", "then", "than", "are",
+    "was", "not", "but", "all", "add", "fix", "make", "use", "should", "please", "code", "file",
+})
+
+
+def query_terms(query: str) -> List[Set[str]]:
+    """Significant words of a query, each as its terms (identifiers split like definition names)."""
+    words = []
+    for word in dict.fromkeys(tokenize(query)):
+        terms = {t for t in name_terms(word) if len(t) > 2 and t not in STOPWORDS}
+        if terms:
+            words.append(terms)
+    return words
+
+
+def path_score(rel_path: str, words: List[Set[str]]) -> float:
+    """Share of the query words found in the path; the file name counts double the directories."""
+    if not words:
+        return 0.0
+    path = PurePath(rel_path)
+    stem = name_terms(path.stem)
+    dirs: Set[str] = set()
+    for part in path.parent.parts:
+        dirs |= name_terms(part)
+    score = sum(1.0 if terms & stem else 0.5 if terms & dirs else 0.0 for terms in words)
+    return score / len(words)
+
+
+def hit_scores(hits: Iterable[Dict]) -> Dict[str, float]:
+    """Per file, the reciprocal ranks of its search hits (summed, capped at 1.5)."""
+    scores: Dict[str, float] = {}
+    for rank, hit in enumerate(hits):
+        scores[hit["path"]] = scores.get(hit["path"], 0.0) + 1.0 / (rank + 1)
+    return {path: min(score, 1.5) for path, score in scores.items()}
+
+
+def recency_scores(recent: Sequence[str], modified: Iterable[str] = ()) -> Dict[str, float]:
+    """1.0 for uncommitted changes, then from 0.9 down with the position in the git log."""
+    scores = {path: 0.9 - 0.5 * i / len(recent) for i, path in enumerate(recent)}
+    scores.update((path, 1.0) for path in modified)
+    return scores
+
+
+def import_scores(hits: Dict[str, float], paths: Iterable[str], xref: XRefGraph) -> Dict[str, float]:
+    """Files importing a hit file or imported by one, scored like that hit."""
+    by_module = {module_name(path): path for path in paths}
+    scores: Dict[str, float] = {}
+    for hit_path, score in hits.items():
+        neighbours = set(xref.importers_of(module_name(hit_path)))
+        neighbours.update(by_module[m] for m in xref.imports_of(hit_path) if m in by_module)
+        for path in neighbours - {hit_path}:
+            scores[path] = max(scores.get(path, 0.0), score)
+    return scores
+
+
+def rank_files(paths: Sequence[str], query: Optional[str] = None, hits: Iterable[Dict] = (),
+               recent: Optional[Dict[str, float]] = None, xref: Optional[XRefGraph] = None) -> List[str]:
+    """
+    `paths` ordered by relevance, best first. Ties (and files with no signal
+    at all) keep their original order.
+    """
+    words = query_terms(query) if query else []
+    direct = hit_scores(hits)
+    nearby = import_scores(direct, paths, xref) if xref is not None and direct else {}
+    recent = recent or {}
+
+    def score(path: str) -> float:
+        return (HIT_WEIGHT * direct.get(path, 0.0) + PATH_WEIGHT * path_score(path, words)
+                + RECENT_WEIGHT * recent.get(path, 0.0) + IMPORT_WEIGHT * nearby.get(path, 0.0))
+
+    scores = {path: score(path) for path in paths}
+    return sorted(paths, key=lambda path: -scores[path])
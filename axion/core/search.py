@@ -0,0 +1,194 @@
+import abc
+import heapq
+import math
+import re
+from typing import List, Dict, Any, Set, Tuple, Iterable, Sequence, NamedTuple, Optional
+
+# BM25 tuning constants (standard Okapi defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Extra weight given to query terms that appear in a definition's name
+NAME_BOOST = 2.0
+
+_WORD_RE = re.compile(r'\w+')
+_CAMEL_RE = re.compile(r'[A-Z]+(?=[A-Z][a-z]|\d|\b)|[A-Z]?[a-z]+|[A-Z]+|\d+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, the same tokens used for keywords at index time."""
+    return _WORD_RE.findall(text.lower())
+
+
+def name_terms(name: str) -> Set[str]:
+    """
+    Terms for the name field: the full identifier plus its snake_case and
+    CamelCase parts, so `engine` matches `ReasoningEngine`.
+    """
+    terms = {name.lower()}
+    for part in name.split("_"):
+        if not part:
+            continue
+        terms.add(part.lower())
+        terms.update(p.lower() for p in _CAMEL_RE.findall(part))
+    return terms
+
+
+class CorpusStats(NamedTuple):
+    """Collection-wide BM25 statistics, so separately stored shards score alike."""
+    num_docs: int
+    total_length: int
+    doc_freqs: Dict[str, int]
+
+
+class RankedIndex(abc.ABC):
+    """
+    BM25 scoring shared by the in-memory index and the memory-mapped reader.
+    Subclasses only expose postings and document statistics.
+    """
+    @property
+    @abc.abstractmethod
+    def num_docs(self) -> int:
+        pass
+
+    @property
+    @abc.abstractmethod
+    def total_length(self) -> int:
+        pass
+
+    @abc.abstractmethod
+    def term_postings(self, term: str) -> Sequence[Tuple[int, int]]:
+        """(doc_id, term_frequency) pairs for a body term."""
+        pass
+
+    @abc.abstractmethod
+    def name_docs(self, term: str) -> Sequence[int]:
+        """Doc ids whose definition name contains the term."""
+        pass
+
+    @abc.abstractmethod
+    def doc_length(self, doc_id: int) -> int:
+        pass
+
+    def doc_frequency(self, term: str) -> int:
+        return max(len(self.term_postings(term)), len(self.name_docs(term)))
+
+    def idf(self, term: str, corpus: Optional[CorpusStats] = None) -> float:
+        if corpus:
+            df, n = corpus.doc_freqs.get(term, 0), corpus.num_docs
+        else:
+            df, n = self.doc_frequency(term), self.num_docs
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, terms: Iterable[str], n_results: int = 5, corpus: Optional[CorpusStats] = None) -> List[Tuple[float, int]]:
+        """
+        Score only the documents found in the postings of the query terms.
+        `corpus` overrides the local statistics when this index is one shard.
+        """
+        if not self.num_docs:
+            return []
+
+        if corpus:
+            avgdl = corpus.total_length / corpus.num_docs if corpus.num_docs else 1.0
+        else:
+            avgdl = self.total_length / self.num_docs
+        avgdl = avgdl or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(terms):
+            idf = self.idf(term, corpus)
+            for doc_id, tf in self.term_postings(term):
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_length(doc_id) / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+            for doc_id in self.name_docs(term):
+                scores[doc_id] = scores.get(doc_id, 0.0) + NAME_BOOST * idf
+
+        ranked = heapq.nsmallest(n_results, scores.items(), key=lambda x: (-x[1], x[0]))
+        return [(score, doc_id) for doc_id, score in ranked]
+
+
+class InvertedIndex(RankedIndex):
+    """
+    In-memory term -> postings index, used while (re)building.
+    Documents are identified by their position in the indexer's entry list.
+    """
+    def __init__(self):
+        # term -> [[doc_id, term_frequency], ...] sorted by doc_id
+        self.postings: Dict[str, List[List[int]]] = {}
+        # term -> [doc_id, ...] for terms found in the definition name
+        self.name_postings: Dict[str, List[int]] = {}
+        self.doc_lengths: List[int] = []
+        self._total_length = 0
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_lengths)
+
+    @property
+    def total_length(self) -> int:
+        return self._total_length
+
+    def term_postings(self, term: str) -> Sequence[Tuple[int, int]]:
+        return self.postings.get(term, ())
+
+    def name_docs(self, term: str) -> Sequence[int]:
+        return self.name_postings.get(term, ())
+
+    def doc_length(self, doc_id: int) -> int:
+        return self.doc_lengths[doc_id]
+
+    def add_document(self, term_counts: Dict[str, int], names: Iterable[str] = ()) -> int:
+        """Add a document and return its id."""
+        doc_id = len(self.doc_lengths)
+        length = 0
+        for term, tf in term_counts.items():
+            self.postings.setdefault(term, []).append([doc_id, tf])
+            length += tf
+        for term in names:
+            self.name_postings.setdefault(term, []).append(doc_id)
+        self.doc_lengths.append(length)
+        self._total_length += length
+        return doc_id
+
+    def remove_documents(self, doc_ids: Iterable[int]):
+        """
+        Drop documents and renumber the survivors so ids stay dense and
+        aligned with the indexer's entry list (order is preserved).
+        """
+        removed = set(doc_ids)
+        if not removed:
+            return
+        remap: Dict[int, int] = {}
+        for old_id in range(self.num_docs):
+            if old_id not in removed:
+                remap[old_id] = len(remap)
+
+        postings: Dict[str, List[List[int]]] = {}
+        for term, plist in self.postings.items():
+            kept = [[remap[d], tf] for d, tf in plist if d in remap]
+            if kept:
+                postings[term] = kept
+        name_postings: Dict[str, List[int]] = {}
+        for term, plist in self.name_postings.items():
+            kept_ids = [remap[d] for d in plist if d in remap]
+            if kept_ids:
+                name_postings[term] = kept_ids
+
+        self.postings = postings
+        self.name_postings = name_postings
+        self.doc_lengths = [l for i, l in enumerate(self.doc_lengths) if i in remap]
+        self._total_length = sum(self.doc_lengths)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "postings": self.postings,
+            "name_postings": self.name_postings,
+            "doc_lengths": self.doc_lengths,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "InvertedIndex":
+        index = cls()
+        index.postings = data.get("postings", {})
+        index.name_postings = data.get("name_postings", {})
+        index.doc_lengths = data.get("doc_lengths", [])
+        index._total_length = sum(index.doc_lengths)
+        return index
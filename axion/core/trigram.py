@@ -0,0 +1,274 @@
+"""
+Trigram index over file contents (`trigrams.bin` of an index snapshot),
+used to answer substring and regex searches without reading every file.
+
+    magic "AXTG" | u32 format version | u32 path count | u32 trigram count
+    u32 length of the path table + the path table (JSON list)
+    u32[T] sorted trigram keys | u32[T+1] offsets | u32 file ids
+
+A trigram is three consecutive bytes of the ASCII-lowercased file, packed
+into one integer. A query is turned into a boolean plan of trigrams that
+every match must contain; only the files satisfying it are then scanned.
+"""
+import heapq
+import itertools
+import json
+import mmap
+import re
+import shutil
+import struct
+from bisect import bisect_left
+from pathlib import Path
+from typing import List, Dict, Optional, Set, Union
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from axion.core.index_format import _pack, _view
+
+MAGIC = b"AXTG"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sIII")
+_LENGTH = struct.Struct("<I")
+
+# Plan nodes: an int trigram, ("and", [nodes]), ("or", [nodes]); None matches every file
+Plan = Union[int, tuple, None]
+
+
+def file_trigrams(content: bytes) -> List[int]:
+    """Sorted distinct trigrams of a file."""
+    data = content.lower()
+    grams = {data[i:i + 3] for i in range(len(data) - 2)}
+    return sorted(int.from_bytes(g, "big") for g in grams)
+
+
+def literal_trigrams(literal: str) -> List[int]:
+    return file_trigrams(literal.encode("utf-8"))
+
+
+def _and(nodes: List[Plan]) -> Plan:
+    nodes = [n for n in nodes if n is not None]
+    if not nodes:
+        return None
+    return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+
+def _literal_plan(chars: List[str]) -> Plan:
+    if len(chars) < 3:
+        return None
+    return _and(literal_trigrams("".join(chars)))
+
+
+def _sequence_plan(items, ignore_case: bool) -> Plan:
+    """Trigrams required by a parsed (sub)pattern."""
+    nodes: List[Plan] = []
+    run: List[str] = []
+    for op, av in items:
+        name = str(op)
+        if name == "LITERAL" and not (ignore_case and av > 127):
+            run.append(chr(av))
+            continue
+        if name == "AT":
+            # Zero-width anchors do not break a literal run
+            continue
+        nodes.append(_literal_plan(run))
+        run = []
+        if name == "SUBPATTERN":
+            nodes.append(_sequence_plan(av[-1], ignore_case))
+        elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+            low, _, item = av
+            if low >= 1:
+                nodes.append(_sequence_plan(item, ignore_case))
+        elif name == "BRANCH":
+            branches = [_sequence_plan(b, ignore_case) for b in av[1]]
+            if all(b is not None for b in branches):
+                nodes.append(("or", branches))
+    nodes.append(_literal_plan(run))
+    return _and(nodes)
+
+
+def query_plan(pattern: str, regex: bool = False, ignore_case: bool = False) -> Plan:
+    """Boolean trigram plan for a substring or regex query (None = no filtering)."""
+    if not regex:
+        if ignore_case:
+            # Only ASCII is case-folded in the index: runs break at other characters
+            return _and([_literal_plan(list(run)) for run in re.split(r"[^\x00-\x7f]", pattern)])
+        return _and(literal_trigrams(pattern)) if len(pattern.encode("utf-8")) >= 3 else None
+    flags = re.IGNORECASE if ignore_case else 0
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return None
+    ignore_case = ignore_case or bool(parsed.state.flags & re.IGNORECASE)
+    return _sequence_plan(parsed, ignore_case)
+
+
+def _write_file(path: Path, paths: List[str], num_keys: int, parts):
+    table = json.dumps(paths, separators=(",", ":")).encode("utf-8")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(paths), num_keys))
+        f.write(_LENGTH.pack(len(table)))
+        f.write(table)
+        for part in parts:
+            if isinstance(part, bytes):
+                f.write(part)
+            else:
+                with open(part, "rb") as src:
+                    shutil.copyfileobj(src, f, 1 << 20)
+
+
+def write_trigrams(path: Path, files: Dict[str, List[int]]):
+    """Invert `path -> trigrams` and serialize it."""
+    paths = sorted(files)
+    postings: Dict[int, List[int]] = {}
+    for file_id, rel_path in enumerate(paths):
+        for gram in files[rel_path]:
+            postings.setdefault(gram, []).append(file_id)
+
+    keys = sorted(postings)
+    offsets = [0]
+    flat: List[int] = []
+    for key in keys:
+        flat.extend(postings[key])
+        offsets.append(len(flat))
+
+    _write_file(path, paths, len(keys), [_pack("I", keys), _pack("I", offsets), _pack("I", flat)])
+
+
+def merge_trigrams(path: Path, readers: List["MappedTrigrams"]):
+    """Concatenate trigram segments, merging their sorted keys."""
+    paths: List[str] = []
+    id_base = []
+    for reader in readers:
+        id_base.append(len(paths))
+        paths.extend(reader.paths)
+
+    spills = [path.with_name(f"{path.name}.{name}.spill") for name in ("keys", "offsets", "postings")]
+    keys_file, offsets_file, postings_file = (open(spill, "wb") for spill in spills)
+    num_keys = count = 0
+    try:
+        def keys(r: int):
+            reader = readers[r]
+            for i in range(len(reader._keys)):
+                yield reader._keys[i], r, i
+
+        streams = [keys(r) for r in range(len(readers))]
+        offsets_file.write(_pack("I", [0]))
+        for key, group in itertools.groupby(heapq.merge(*streams), key=lambda item: item[0]):
+            ids: List[int] = []
+            for _, r, i in group:
+                reader = readers[r]
+                ids.extend(id_base[r] + file_id for file_id in reader._postings[reader._offsets[i]:reader._offsets[i + 1]].tolist())
+            keys_file.write(_pack("I", [key]))
+            postings_file.write(_pack("I", ids))
+            count += len(ids)
+            offsets_file.write(_pack("I", [count]))
+            num_keys += 1
+    finally:
+        for f in (keys_file, offsets_file, postings_file):
+            f.close()
+    try:
+        _write_file(path, paths, num_keys, spills)
+    finally:
+        for spill in spills:
+            spill.unlink(missing_ok=True)
+
+
+class MappedTrigrams:
+    """Read-only, memory-mapped trigram index."""
+    def __init__(self, path: Path):
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        magic, version, num_paths, num_keys = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Unsupported trigram file: {path}")
+        offset = _HEADER.size
+        (table_length,) = _LENGTH.unpack_from(self._mm, offset)
+        offset += _LENGTH.size
+        self.paths: List[str] = json.loads(self._mm[offset:offset + table_length])
+        offset += table_length
+
+        buf = memoryview(self._mm)
+        self._buf = buf
+        self._keys = _view(buf[offset:offset + 4 * num_keys], "I")
+        offset += 4 * num_keys
+        self._offsets = _view(buf[offset:offset + 4 * (num_keys + 1)], "I")
+        offset += 4 * (num_keys + 1)
+        self._postings = _view(buf[offset:offset + 4 * self._offsets[num_keys]], "I")
+
+    def file_ids(self, gram: int) -> Set[int]:
+        i = bisect_left(self._keys, gram)
+        if i == len(self._keys) or self._keys[i] != gram:
+            return set()
+        return set(self._postings[self._offsets[i]:self._offsets[i + 1]].tolist())
+
+    def _evaluate(self, plan: Plan) -> Optional[Set[int]]:
+        if plan is None:
+            return None
+        if isinstance(plan, int):
+            return self.file_ids(plan)
+        op, nodes = plan
+        if op == "or":
+            result: Set[int] = set()
+            for node in nodes:
+                ids = self._evaluate(node)
+                if ids is None:
+                    return None
+                result |= ids
+            return result
+        # Intersect the rarest trigrams first, stop as soon as nothing is left
+        leaves = sorted((self.file_ids(n) for n in nodes if isinstance(n, int)), key=len)
+        result = None
+        for ids in leaves:
+            result = ids if result is None else result & ids
+            if not result:
+                return result
+        for node in nodes:
+            if isinstance(node, int):
+                continue
+            ids = self._evaluate(node)
+            if ids is None:
+                continue
+            result = ids if result is None else result & ids
+            if not result:
+                break
+        return result
+
+    def candidates(self, plan: Plan) -> List[str]:
+        """Files that may match the plan, in path order."""
+        ids = self._evaluate(plan)
+        if ids is None:
+            return list(self.paths)
+        return [self.paths[i] for i in sorted(ids)]
+
+    def to_files(self) -> Dict[str, List[int]]:
+        """Forward map path -> trigrams (used before re-indexing)."""
+        files: Dict[str, List[int]] = {p: [] for p in self.paths}
+        for i in range(len(self._keys)):
+            gram = self._keys[i]
+            for file_id in self._postings[self._offsets[i]:self._offsets[i + 1]].tolist():
+                files[self.paths[file_id]].append(gram)
+        return files
+
+    def close(self):
+        for name in ("_keys", "_offsets", "_postings"):
+            view = getattr(self, name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        if getattr(self, "_buf", None) is not None:
+            self._buf.release()
+            self._buf = None
+        try:
+            self._mm.close()
+        except Exception:
+            pass
+        self._file.close()
@@ -0,0 +1,201 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple
+from axion.core.files import git_ignored_dirs
+from axion.core.indexing import CodeIndexer
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+_SKIP_DIRS = {".axion", ".git", "__pycache__"}
+
+# Sentinel returned by a backend when events were lost and a full rescan is needed
+RESCAN = None
+
+
+class PollingBackend:
+    """Portable fallback: compares (mtime, size) of indexable files every interval."""
+    def __init__(self, indexer: CodeIndexer, interval: float = 0.5):
+        self.indexer = indexer
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for rel_path, full_path in self.indexer._collect_files().items():
+            try:
+                st = full_path.stat()
+            except OSError:
+                continue
+            snapshot[rel_path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def read_changes(self, timeout: float) -> Optional[Set[str]]:
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = {p for p, sig in snapshot.items() if self._snapshot.get(p) != sig}
+        changed |= set(self._snapshot) - set(snapshot)
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyBackend:
+    """
+    Linux inotify watches on every project directory (no third-party deps).
+    With `use_git`, directories .gitignore excludes (.venv, node_modules,
+    build output) are not watched.
+    """
+    def __init__(self, root: Path, use_git: bool = True):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or not libc_name:
+            raise OSError("inotify is not available on this platform")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.root = root
+        self.use_git = use_git
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, Path] = {}
+        self._add_tree(root)
+
+    def _add_watch(self, directory: Path) -> bool:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), _WATCH_MASK)
+        if wd < 0:
+            return False
+        self._dirs[wd] = directory
+        return True
+
+    def _add_tree(self, top: Path) -> Set[str]:
+        """Watch `top` and its subdirectories; return files already inside them."""
+        found = set()
+        rel_top = "" if top == self.root else self._rel(top)
+        ignored = git_ignored_dirs(self.root, rel_top) if self.use_git else set()
+        if rel_top in ignored:
+            return found
+        for root, dirs, files in os.walk(top):
+            dirs[:] = [d for d in dirs if d not in _SKIP_DIRS and self._rel(Path(root) / d) not in ignored]
+            if not self._add_watch(Path(root)):
+                continue
+            for file in files:
+                found.add(self._rel(Path(root) / file))
+        return found
+
+    def _rel(self, path: Path) -> str:
+        return str(path.relative_to(self.root))
+
+    def read_changes(self, timeout: float) -> Optional[Set[str]]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed: Set[str] = set()
+        offset = 0
+        while offset < len(buf):
+            wd, mask, _, name_len = _EVENT.unpack_from(buf, offset)
+            name = buf[offset + _EVENT.size:offset + _EVENT.size + name_len].rstrip(b"\0")
+            offset += _EVENT.size + name_len
+
+            if mask & IN_Q_OVERFLOW:
+                return RESCAN
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if path.name in _SKIP_DIRS:
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files may land in a new directory before its watch exists
+                    changed |= self._add_tree(path)
+                elif mask & IN_MOVED_FROM:
+                    # A whole subtree left the project: let the caller rescan
+                    return RESCAN
+                continue
+            changed.add(self._rel(path))
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class IndexWatcher:
+    """
+    Keeps a CodeIndexer fresh by re-indexing only the files touched on disk.
+    Bursts of saves are batched: changes are flushed once no new event
+    arrived for `debounce` seconds. Each flush publishes a new index snapshot
+    atomically (see IndexShard.save and IndexShard._publish), so readers never
+    see a partial one.
+    """
+    def __init__(self, indexer: CodeIndexer, debounce: float = 0.05, use_inotify: bool = True, poll_interval: float = 0.5):
+        self.indexer = indexer
+        self.debounce = debounce
+        self.backend = None
+        if use_inotify:
+            try:
+                self.backend = InotifyBackend(indexer.project_path, use_git=indexer.use_git)
+            except Exception:
+                self.backend = None
+        if self.backend is None:
+            self.backend = PollingBackend(indexer, interval=poll_interval)
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if isinstance(self.backend, InotifyBackend) else "polling"
+
+    def step(self, timeout: float = 1.0) -> Optional[Dict[str, int]]:
+        """
+        Wait up to `timeout` for changes, collect the whole burst and
+        re-index it. Returns the re-index stats, or None if nothing changed.
+        """
+        changes = self.backend.read_changes(timeout)
+        if changes is not None and not changes:
+            return None
+
+        pending: Optional[Set[str]] = changes
+        while pending is not None:
+            more = self.backend.read_changes(self.debounce)
+            if more is None:
+                pending = None
+            elif not more:
+                break
+            else:
+                pending |= more
+
+        if pending is None:
+            return self.indexer.index_project()
+        return self.indexer.refresh_paths(pending)
+
+    def run(self, on_update: Optional[Callable[[Dict[str, int]], None]] = None, should_stop: Callable[[], bool] = lambda: False):
+        """Watch until interrupted (or `should_stop` returns True)."""
+        try:
+            while not should_stop():
+                stats = self.step()
+                if stats and on_update and (stats["added"] or stats["modified"] or stats["deleted"]):
+                    on_update(stats)
+        finally:
+            self.backend.close()
@@ -0,0 +1,85 @@
+from pathlib import PurePath
+from typing import List, Dict, Any, Set
+
+
+def module_name(rel_path: str) -> str:
+    """'axion/core/indexing.py' -> 'axion.core.indexing' (packages drop '__init__')."""
+    parts = list(PurePath(rel_path).with_suffix("").parts)
+    if parts and parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+def resolve_module(module: str, rel_path: str) -> str:
+    """Resolve a relative import ('.search', '..tools') against the importing file."""
+    if not module.startswith("."):
+        return module
+    level = len(module) - len(module.lstrip("."))
+    package = module_name(rel_path).split(".")
+    if not PurePath(rel_path).name == "__init__.py":
+        package = package[:-1]
+    base = package[:len(package) - (level - 1)] if level > 1 else package
+    rest = module[level:]
+    return ".".join(base + ([rest] if rest else []))
+
+
+class XRefGraph:
+    """
+    Cross-reference lookups over the per-file records stored next to the
+    definitions (see ASTParser.extract_references). Reverse maps are built
+    once, so every lookup is a dict access: importers are also filed under
+    each parent package of the imported module.
+
+    Calls are matched by name: `callers_of("ReasoningEngine.run_solve")`
+    returns every call to a `run_solve`, whatever the receiver's type.
+    """
+    def __init__(self, records: Dict[str, Dict[str, Any]]):
+        self._callers: Dict[str, List[Dict[str, Any]]] = {}
+        self._callees: Dict[str, List[Dict[str, Any]]] = {}
+        # module or package -> files importing it or one of its submodules
+        self._importers: Dict[str, Set[str]] = {}
+        self._attribute_refs: Dict[str, List[Dict[str, Any]]] = {}
+        self._imports: Dict[str, List[str]] = {}
+
+        for path in sorted(records):
+            record = records[path]
+            for scope, callee, line in record.get("calls", []):
+                self._callers.setdefault(callee, []).append({"path": path, "caller": scope, "line": line})
+                self._callees.setdefault(scope, []).append({"path": path, "callee": callee, "line": line})
+            for scope, attr, line in record.get("attributes", []):
+                self._attribute_refs.setdefault(attr, []).append({"path": path, "scope": scope, "line": line})
+            for imp in record.get("imports", []):
+                module = resolve_module(imp["module"], path)
+                self._imports.setdefault(path, []).append(module)
+                self._add_importer(module, path)
+                # `from pkg import mod` also imports the submodule pkg.mod
+                for name in imp.get("names", []):
+                    if name != "*":
+                        submodule = f"{module}.{name}" if module else name
+                        self._add_importer(submodule, path)
+                        self._imports[path].append(submodule)
+
+    def _add_importer(self, module: str, path: str):
+        parts = module.split(".")
+        for i in range(1, len(parts) + 1):
+            self._importers.setdefault(".".join(parts[:i]), set()).add(path)
+
+    def callers_of(self, name: str) -> List[Dict[str, Any]]:
+        """Call sites of a function or method (`name` may be qualified)."""
+        return list(self._callers.get(name.split(".")[-1], []))
+
+    def callees_of(self, qualname: str) -> List[Dict[str, Any]]:
+        """Calls made inside a definition, e.g. 'ReasoningEngine.run_solve' ('' = module level)."""
+        return list(self._callees.get(qualname, []))
+
+    def importers_of(self, module: str) -> List[str]:
+        """Files importing `module` or one of its submodules."""
+        return sorted(self._importers.get(module, ()))
+
+    def imports_of(self, path: str) -> List[str]:
+        """Modules imported by a file (relative imports resolved; `from pkg import x` lists pkg.x too)."""
+        return sorted(set(self._imports.get(path, [])))
+
+    def attribute_references(self, attr: str) -> List[Dict[str, Any]]:
+        """Non-call accesses of an attribute name (`obj.attr`)."""
+        return list(self._attribute_refs.get(attr, []))
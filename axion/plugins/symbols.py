@@ -0,0 +1,56 @@
+import os
+from axion.core.plugins import AxionPlugin
+from axion.core.indexing import CodeIndexer
+from typing import List, Dict, Any
+
+# Definitions returned in full by one lookup; further matches are only listed
+MAX_SOURCES = 3
+
+def find_symbol(name: str) -> str:
+    """Return the source of the definition(s) named `name` in the current project."""
+    indexer = CodeIndexer(os.getcwd())
+    matches = indexer.find_symbol(name)
+    if not matches and not indexer.has_index():
+        # No index yet: build it once
+        indexer.index_project()
+        matches = indexer.find_symbol(name)
+    changed = sorted({e["path"] for e in matches if not indexer.is_current(e)})
+    if changed:
+        # Stored line ranges of edited files point at other code: re-index those first
+        indexer.refresh_paths(changed)
+        matches = indexer.find_symbol(name)
+    if not matches:
+        close = indexer.find_symbol(name, prefix=True, limit=10)
+        hint = ", ".join(e.get("qualname") or e["name"] for e in close)
+        return f"Symbol '{name}' not found." + (f" Did you mean: {hint}?" if hint else "")
+
+    parts = []
+    for entry in matches[:MAX_SOURCES]:
+        header = f"# {entry['path']}:{entry['start_line']}-{entry['end_line']} ({entry.get('qualname') or entry['name']})"
+        try:
+            parts.append(header + "\n" + indexer.definition_source(entry))
+        except (OSError, ValueError) as e:
+            parts.append(f"{header}\n<unreadable: {e}>")
+    others = matches[MAX_SOURCES:]
+    if others:
+        parts.append("Also defined at: " + ", ".join(f"{e['path']}:{e['start_line']}" for e in others))
+    return "\n\n".join(parts)
+
+class SymbolsPlugin(AxionPlugin):
+    @property
+    def name(self) -> str:
+        return "symbols"
+
+    @property
+    def description(self) -> str:
+        return "Jump to definitions by name using the project index."
+
+    def get_tools(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": "find_symbol",
+                "description": "Return only the source of a class or function, e.g. 'ReasoningEngine.run_solve'. Cheaper than reading whole files.",
+                "parameters": {"name": "string"},
+                "func": find_symbol
+            }
+        ]
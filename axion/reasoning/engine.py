@@ -3,6 +3,7 @@ from axion.models.base import AIModel, get_model
 from axion.tools.base import ShellTools
 from axion.core.plugins import PluginManager
 from axion.tools.context import ContextBuilder
+from axion.core.tokens import context_budget
 from axion.schemas.review import ReviewResult
 from axion.core.trace import ReasoningTrace, set_current_trace
 from axion.reasoning.session import ConversationSession
@@ -22,13 +23,19 @@ class ReasoningEngine:
         set_current_trace(self.trace)
         self.session: Optional[ConversationSession] = None
 
+    def _context_builder(self, path: str, command: str) -> ContextBuilder:
+        """Context sized by the token budget of the command for this model, not a file count."""
+        budget = context_budget(command, getattr(self.model, "model_name", None))
+        self.trace.add_step("Context", f"Token budget for {command}: {budget}")
+        return ContextBuilder(path, max_files=None, token_budget=budget)
+
     def run_review(self, path: str) -> ReviewResult:
         """
         Executes a real code review for the given path.
         """
         self.trace.add_step("Context", f"Building context for path: {path}")
         console.print(f"[bold]Building context for path:[/] [yellow]{path}[/]")
-        builder = ContextBuilder(path)
+        builder = self._context_builder(path, "review")
         snapshot = builder.build()
         
         if not snapshot.files:
@@ -36,10 +43,10 @@ class ReasoningEngine:
             raise ValueError(f"No relevant files found in {path}")
 
         self.trace.add_step("Analysis", f"Analyzing {len(snapshot.files)} files")
-        console.print(f"[dim]Analyzing {len(snapshot.files)} files...[/]")
+        console.print(f"[dim]Analyzing {len(snapshot.files)} files (~{snapshot.token_count} tokens)...[/]")
         
         # Build prompt
-        files_str = "\n---\n".join([f"FILE: {f.path}\nCONTENT:\n{f.content}" for f in snapshot.files])
+        files_str = snapshot.render_files()
         
         system_prompt = (
             "You are a Senior Software Engineer acting as a Code Revisor. "
@@ -91,13 +98,16 @@ class ReasoningEngine:
         """
         self.trace.add_step("Context", "Building context for planning")
         console.print(f"[bold]Building context for planning...[/]")
-        builder = ContextBuilder(path)
-        snapshot = builder.build()
+        builder = self._context_builder(path, "plan")
+        # The goal ranks the files and brings in matching definitions
+        snapshot = builder.build(query=goal)
         
-        self.trace.add_step("Analysis", f"Context built with {len(snapshot.files)} files")
-        files_str = "\n---\n".join([f"FILE: {f.path}\nCONTENT:\n{f.content}" for f in snapshot.files[:20]]) # Limit for plan
+        self.trace.add_step("Analysis", f"Context built with {len(snapshot.files)} files (~{snapshot.token_count} tokens)")
+        files_str = snapshot.render_files()
         
         system_prompt = "You are an Expert Technical Architect. Design a clear, step-by-step implementation plan for the requested goal."
+        if snapshot.rag_snippets:
+            files_str += "\n\nRelevant Snippets:\n" + snapshot.render_snippets()
         user_prompt = f"Goal: {goal}\n\nProject Structure:\n{snapshot.project_structure}\n\nRelevant Files:\n{files_str}\n\nProvide a technical plan in Markdown."
         
         console.print("[bold yellow]Generating plan...[/]")
@@ -117,16 +127,14 @@ class ReasoningEngine:
         
         if not session:
             self.trace.add_step("Context", f"Building context for {path}")
-            builder = ContextBuilder(path)
+            builder = self._context_builder(path, "solve")
             snapshot = builder.build(query=query)
             
-            files_str = "\n---\n".join([f"FILE: {f.path}\nCONTENT:\n{f.content}" for f in snapshot.files[:10]])
+            files_str = snapshot.render_files()
             
             rag_str = ""
             if snapshot.rag_snippets:
-                rag_str = "\n\nRELEVANT SNIPPETS (RAG):\n" + "\n".join([
-                    f"- {s['path']} ({s['name']}):\n{s['content']}" for s in snapshot.rag_snippets
-                ])
+                rag_str = "\n\nRELEVANT SNIPPETS (RAG):\n" + snapshot.render_snippets()
 
             tools_info = "\n".join([f"- {t['name']}: {t['description']}" for t in self.plugin_manager.get_all_tools()])
             
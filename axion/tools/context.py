@@ -1,18 +1,164 @@
+import hashlib
+import json
 import os
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import Any, List, Dict, Optional
+from typing import Any, List, Dict, Iterable, Iterator, Optional, Tuple
 from pydantic import BaseModel
+from axion.core.ast_utils import RACY_MTIME_NS
+from axion.core.files import FileListing, list_files, recent_git_files
+from axion.core.languages import supported_suffixes
+from axion.core.ranking import rank_files, recency_scores
+from axion.core.tokens import estimate_tokens
+
+# Below this many tokens left, no further file is worth reading
+MIN_PACK_TOKENS = 32
+# Packing stops after this many files in a row that do not fit, even as summaries:
+# what is left of the budget is too small for typical files of the project
+MAX_PACK_MISSES = 8
+# Reads and summaries in flight at once; loading is I/O-latency bound, not CPU bound
+LOAD_WORKERS = 8
+# Bump when FileContext or the summaries change shape
+SNAPSHOT_CACHE_VERSION = 2
+# Snapshot caches of other builder options unused for this long are removed
+SNAPSHOT_CACHE_MAX_AGE = 7 * 24 * 3600
+# Tokens of the separator between two files in the prompt
+SEPARATOR_TOKENS = 5
 
 class FileContext(BaseModel):
     path: str
     content: str
     extension: str
     summary: Optional[str] = None # New field for semantic summary
+    summarized: bool = False # Only the summary fit in the token budget
+
+    def render(self) -> str:
+        """The file as it is shown to the model."""
+        if self.summarized:
+            return f"FILE: {self.path}\nSUMMARY (content omitted):\n{self.summary}"
+        return f"FILE: {self.path}\nCONTENT:\n{self.content}"
 
 class ContextSnapshot(BaseModel):
     files: List[FileContext]
     project_structure: List[str]
     rag_snippets: Optional[List[Dict[str, Any]]] = None
+    token_count: int = 0 # Estimated tokens of the rendered files and snippets
+
+    def render_files(self) -> str:
+        return "\n---\n".join(f.render() for f in self.files)
+
+    def render_snippets(self) -> str:
+        return "\n".join(render_snippet(s) for s in self.rag_snippets or [])
+
+def render_snippet(snippet: Dict[str, Any]) -> str:
+    return f"- {snippet['path']} ({snippet['name']}):\n{snippet['content']}"
+
+# A file as loaded: its context and the token costs of showing it in full / as its summary
+LoadedFile = Tuple[FileContext, List[int]]
+
+class SnapshotCache:
+    """
+    Files loaded by past builds (content, summary and token costs, or None
+    when excluded), persisted in `.axion/context/` so later commands reuse them.
+    Each file has its own entry, named after the hash of its path, so a build
+    only reads the entries of the files it packs. An entry is valid while the
+    file's (mtime, size) fingerprint is unchanged; files modified within
+    RACY_MTIME_NS of loading are not cached, as a same-size edit in the same
+    mtime tick would go unnoticed.
+    """
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.dirty = False
+
+    @staticmethod
+    def _fingerprint(st: os.stat_result) -> List[int]:
+        return [st.st_mtime_ns, st.st_size]
+
+    @staticmethod
+    def _entry_name(rel_path: str) -> str:
+        return hashlib.sha1(rel_path.encode("utf-8", "surrogateescape")).hexdigest() + ".json"
+
+    def get(self, rel_path: str, st: os.stat_result) -> Tuple[bool, Optional[LoadedFile]]:
+        """(found, loaded file) for a file in the state described by `st`."""
+        try:
+            with open(self.directory / self._entry_name(rel_path), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except Exception:
+            return False, None
+        if (entry.get("version") != SNAPSHOT_CACHE_VERSION or entry.get("path") != rel_path
+                or entry.get("fingerprint") != self._fingerprint(st)):
+            return False, None
+        if entry["context"] is None:
+            return True, None
+        return True, (FileContext(**entry["context"]), entry["tokens"])
+
+    def put(self, rel_path: str, st: os.stat_result, loaded: Optional[LoadedFile]):
+        self.dirty = True
+        entry_file = self.directory / self._entry_name(rel_path)
+        try:
+            if time.time_ns() - st.st_mtime_ns <= RACY_MTIME_NS:
+                entry_file.unlink(missing_ok=True)
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_file = entry_file.with_name(f"{entry_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": SNAPSHOT_CACHE_VERSION,
+                    "path": rel_path,
+                    "fingerprint": self._fingerprint(st),
+                    "context": loaded[0].model_dump() if loaded is not None else None,
+                    "tokens": loaded[1] if loaded is not None else None,
+                }, f)
+            os.replace(tmp_file, entry_file)
+        except OSError:
+            pass
+
+    def save(self, listed: Iterable[str]):
+        """After a build that read files, drop the entries of files that are no longer listed."""
+        if not self.dirty:
+            return
+        self.dirty = False
+        self._prune_other_caches()
+        keep = {self._entry_name(rel_path) for rel_path in listed}
+        try:
+            with os.scandir(self.directory) as scan:
+                stale = [entry.path for entry in scan if entry.name.endswith(".json") and entry.name not in keep]
+        except OSError:
+            return
+        for path in stale:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def touch(self):
+        """Mark this cache as in use (see _prune_other_caches)."""
+        try:
+            os.utime(self.directory)
+        except OSError:
+            pass
+
+    def _prune_other_caches(self):
+        """Remove caches of other builder options left unused, and files of older cache formats."""
+        cutoff = time.time() - SNAPSHOT_CACHE_MAX_AGE
+        try:
+            with os.scandir(self.directory.parent) as scan:
+                others = [entry for entry in scan if entry.path != str(self.directory)]
+        except OSError:
+            return
+        for entry in others:
+            try:
+                if not entry.is_dir():
+                    os.unlink(entry.path)
+                elif entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except OSError:
+                pass
 
 class ContextBuilder:
     def __init__(
@@ -21,21 +167,38 @@ class ContextBuilder:
         extensions: Optional[List[str]] = None,
         exclude_dirs: Optional[List[str]] = None,
         max_file_size_kb: int = 50,
-        max_files: int = 50,
-        use_semantical_context: bool = True
+        max_files: Optional[int] = 50,
+        use_semantical_context: bool = True,
+        token_budget: Optional[int] = None,
+        workers: int = LOAD_WORKERS,
+        use_cache: bool = True
     ):
         self.base_path = Path(base_path)
         self.extensions = extensions or [".py", ".js", ".ts", ".cpp", ".h", ".toml", ".md", ".json"]
         self.exclude_dirs = exclude_dirs or [".git", ".venv", "node_modules", "__pycache__", "dist", "build"]
         self.max_file_size_kb = max_file_size_kb
         self.max_files = max_files
+        self.token_budget = token_budget
+        self.workers = max(1, workers)
+        self.use_cache = use_cache
         self.use_semantical_context = use_semantical_context
+        self._local = threading.local()
+        # ASTParsers of the loader threads
+        self._thread_parsers: List[Any] = []
+        self._definitions_dir: Optional[str] = None
+        self.ast_parser = None
+        self.indexer = None
+        # Caches on disk only in projects that already have .axion/ (e.g. indexed ones)
+        axion_dir = self.base_path / ".axion"
+        self._cache_root: Optional[Path] = axion_dir if axion_dir.is_dir() else None
         
         if self.use_semantical_context:
             try:
                 from axion.core.ast_utils import ASTParser
                 from axion.core.indexing import CodeIndexer
-                self.ast_parser = ASTParser()
+                # Summaries of an indexed project are kept next to its index
+                self._definitions_dir = str(self._cache_root / "definitions") if self._cache_root else None
+                self.ast_parser = ASTParser(self._definitions_dir)
                 self.indexer = CodeIndexer(str(self.base_path))
             except ImportError:
                 self.ast_parser = None
@@ -45,86 +208,254 @@ class ContextBuilder:
         """
         Scan the path and build a context snapshot.
         If a query is provided and indexer is available, it includes RAG snippets.
+        Files are read in order of relevance to the query (see _rank_files),
+        so the limits below drop the least relevant ones. With a token budget,
+        the snippets (best first, up to half of it) and then the files are
+        packed until it is spent; a file too large for what is left is reduced
+        to its summary.
         """
         files_context = []
         project_structure = []
         rag_snippets = None
+        hits: List[Dict[str, Any]] = []
+        remaining = self.token_budget
+        used = 0
         
         if query and self.indexer:
             try:
+                # Files an applied diff could not publish right away (see CodeIndexer.mark_stale)
+                self.indexer.refresh_stale()
                 # Ensure index exists (lazy indexing for now)
                 # In production, we'd have a separate command or check timestamps
-                rag_snippets = self.indexer.search(query, n_results=10)
+                rag_snippets = self.indexer.search(query, n_results=10, mode="hybrid")
+                # Full bodies of the hits only, read now rather than stored in the index
+                rag_snippets = self.indexer.fetch_spans(rag_snippets)
+                hits = list(rag_snippets)
             except Exception:
                 pass
+        if rag_snippets and remaining is not None:
+            packed, share = [], remaining // 2
+            for snippet in rag_snippets:
+                cost = estimate_tokens(render_snippet(snippet)) + 1
+                if cost <= share:
+                    packed.append(snippet)
+                    share -= cost
+                    remaining -= cost
+                    used += cost
+            rag_snippets = packed
+        elif rag_snippets:
+            used += estimate_tokens("\n".join(render_snippet(s) for s in rag_snippets))
 
         if self.base_path.is_file():
             if self._should_include_file(self.base_path):
-                files_context.append(self._read_file(self.base_path))
-                project_structure.append(str(self.base_path.name))
+                context = self._fit(self._with_costs(self._read_file(self.base_path)), remaining)
+                if context:
+                    files_context.append(context[0])
+                    project_structure.append(str(self.base_path.name))
+                    used += context[1]
         else:
-            for root, dirs, files in os.walk(self.base_path):
-                dirs[:] = [d for d in dirs if d not in self.exclude_dirs]
-                
-                rel_root = os.path.relpath(root, self.base_path)
-                if rel_root == ".":
-                    rel_root = ""
-
-                for file in files:
-                    file_path = Path(root) / file
-                    if self._should_include_file(file_path):
-                        if len(files_context) < self.max_files:
-                            context = self._read_file(file_path)
-                            if context:
-                                files_context.append(context)
-                                project_structure.append(os.path.join(rel_root, file))
-        
+            # Tracked and unignored files from git, or a directory walk outside a repository
+            listing = list_files(self.base_path, suffixes=self.extensions, exclude_dirs=self.exclude_dirs, with_stats=True)
+            cache = SnapshotCache(self._cache_dir()) if self.use_cache and self._cache_root else None
+            if cache is not None:
+                cache.touch()
+            misses = 0
+            for rel_path, loaded in self._load_files(listing, self._rank_files(listing, query, hits), cache):
+                if self.max_files is not None and len(files_context) >= self.max_files:
+                    break
+                if remaining is not None and remaining < MIN_PACK_TOKENS:
+                    break
+                context = self._fit(loaded, remaining)
+                if loaded is not None and context is None:
+                    misses += 1
+                    if misses >= MAX_PACK_MISSES:
+                        break
+                elif context:
+                    misses = 0
+                    files_context.append(context[0])
+                    project_structure.append(rel_path)
+                    used += context[1]
+                    if remaining is not None:
+                        remaining -= context[1]
+            if cache is not None:
+                cache.save(listing.files)
+        self._prune_definitions()
+
         return ContextSnapshot(
             files=files_context, 
             project_structure=project_structure,
-            rag_snippets=rag_snippets
+            rag_snippets=rag_snippets,
+            token_count=used
         )
 
-    def _should_include_file(self, path: Path) -> bool:
+    def _cache_dir(self) -> Path:
+        """Snapshot cache of this path and of the options that shape a loaded file."""
+        # Installing a grammar changes which files get summaries
+        options = [str(self.base_path.resolve()), sorted(self.extensions), self.max_file_size_kb,
+                   self.use_semantical_context, sorted(supported_suffixes())]
+        key = hashlib.sha1(json.dumps(options).encode("utf-8")).hexdigest()[:16]
+        return self._cache_root / "context" / key
+
+    def _load_files(self, listing: FileListing, ranked: List[str],
+                    cache: Optional[SnapshotCache] = None) -> Iterator[Tuple[str, Optional[LoadedFile]]]:
+        """
+        The files of `ranked`, in that order, read and summarized by a bounded
+        thread pool. Reads run only a small window ahead of the consumer, so
+        once the limits are reached the rest of the project is never opened.
+        Files unchanged since `cache` saw them are not read at all.
+        """
+        stats = listing.stats or {}
+        paths = iter(ranked)
+        pending: deque = deque()
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            def submit(count: int):
+                for rel_path in islice(paths, count):
+                    pending.append((rel_path, executor.submit(self._load_file, listing.files[rel_path], stats.get(rel_path), rel_path, cache)))
+
+            submit(self.workers * 2)
+            while pending:
+                rel_path, future = pending.popleft()
+                submit(1)
+                yield rel_path, future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _load_file(self, path: Path, st: Optional[os.stat_result] = None, rel_path: Optional[str] = None,
+                   cache: Optional[SnapshotCache] = None) -> Optional[LoadedFile]:
+        if cache is not None:
+            if st is None:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    return None
+            found, loaded = cache.get(rel_path, st)
+            if found:
+                return loaded
+        loaded = self._with_costs(self._read_file(path)) if self._should_include_file(path, st) else None
+        if cache is not None:
+            cache.put(rel_path, st, loaded)
+        return loaded
+
+    def _parser(self):
+        """ASTParser of the calling thread (a tree-sitter parser must not be shared across threads)."""
+        if threading.current_thread() is threading.main_thread():
+            return self.ast_parser
+        parser = getattr(self._local, "parser", None)
+        if parser is None:
+            from axion.core.ast_utils import ASTParser
+            parser = self._local.parser = ASTParser(self._definitions_dir)
+            self._thread_parsers.append(parser)
+        return parser
+
+    def _prune_definitions(self):
+        """Keep the on-disk definitions cache bounded once this builder added to it."""
+        if not self._definitions_dir:
+            return
+        parsers = [self.ast_parser, *self._thread_parsers]
+        if any(p.definitions_written for p in parsers):
+            from axion.core.ast_utils import prune_definitions_cache
+            prune_definitions_cache(Path(self._definitions_dir))
+            for parser in parsers:
+                parser.definitions_written = 0
+
+    def _rank_files(self, listing: FileListing, query: Optional[str], hits: List[Dict[str, Any]]) -> List[str]:
+        """Listed files by relevance: index hits, path matches, recent git changes, imports of hit files."""
+        recent = None
+        if listing.source == "git":
+            # Modified and untracked files have no blob: they are the most recent of all
+            modified = [path for path in listing.files if path not in listing.blobs]
+            recent = recency_scores(recent_git_files(self.base_path) or [], modified)
+        xref = None
+        if hits and self.indexer:
+            try:
+                xref = self.indexer.xref()
+            except Exception:
+                pass
+        return rank_files(list(listing.files), query, hits, recent, xref)
+
+    @staticmethod
+    def _with_costs(context: Optional[FileContext]) -> Optional[LoadedFile]:
+        """The file with the tokens it costs in full and as its summary alone (0 without one)."""
+        if context is None:
+            return None
+        costs = [estimate_tokens(context.render()) + SEPARATOR_TOKENS, 0]
+        if context.summary:
+            summarized = context.model_copy(update={"content": "", "summarized": True})
+            costs[1] = estimate_tokens(summarized.render()) + SEPARATOR_TOKENS
+        return context, costs
+
+    @staticmethod
+    def _fit(loaded: Optional[LoadedFile], remaining: Optional[int]) -> Optional[Tuple[FileContext, int]]:
+        """The file, or its summary alone, with its token cost, if it fits in `remaining`."""
+        if loaded is None:
+            return None
+        context, (full, summary) = loaded
+        if remaining is None or full <= remaining:
+            return context, full
+        if summary and summary <= remaining:
+            return context.model_copy(update={"content": "", "summarized": True}), summary
+        return None
+
+    def search_code(self, pattern: str, regex: bool = False, ignore_case: bool = False, max_results: int = 50) -> List[Dict[str, Any]]:
+        """
+        Find exact substrings (or regex matches) in the indexed code.
+        Returns {"path", "line", "column", "text"} per matching line.
+        """
+        if not self.indexer:
+            return []
+        try:
+            return self.indexer.grep(pattern, regex=regex, ignore_case=ignore_case, max_results=max_results)
+        except Exception:
+            return []
+
+    def _should_include_file(self, path: Path, st: Optional[os.stat_result] = None) -> bool:
         if path.name == ".env" or path.suffix == ".env":
             return False
             
         if path.suffix not in self.extensions:
             return False
         
-        if not path.exists():
-            return False
+        # One stat, unless the directory scan already made it
+        if st is None:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return False
             
         # Check size (we can be more lenient if using semantic summaries)
         size_limit = self.max_file_size_kb * 1024
         if self.use_semantical_context:
             size_limit *= 2 # Allow larger files if we can summarize them
             
-        if path.stat().st_size > size_limit:
+        if st.st_size > size_limit:
             return False
             
         return True
 
     def _read_file(self, path: Path) -> Optional[FileContext]:
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-                summary = None
-                if self.use_semantical_context and self.ast_parser and path.suffix == ".py":
-                    try:
-                        defs = self.ast_parser.get_definitions(str(path))
-                        if defs:
-                            summary_lines = [f"{d['type'].upper()} {d['name']} (L{d['start_line']}-L{d['end_line']})" for d in defs]
-                            summary = "\n".join(summary_lines)
-                    except Exception:
-                        pass
-
-                return FileContext(
-                    path=str(path.relative_to(self.base_path) if self.base_path.is_dir() else path.name),
-                    content=content,
-                    extension=path.suffix,
-                    summary=summary
-                )
+            # Read once: the same bytes feed the summary (parse trees are shared with the indexer)
+            with open(path, 'rb') as f:
+                raw = f.read()
+            # Same newline handling as text mode
+            content = raw.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+            summary = None
+            if self.use_semantical_context and self.ast_parser and self._parser().supports(str(path)):
+                try:
+                    defs = self._parser().get_definitions(str(path), raw)
+                    if defs:
+                        summary_lines = [f"{d['type'].upper()} {d['name']} (L{d['start_line']}-L{d['end_line']})" for d in defs]
+                        summary = "\n".join(summary_lines)
+                except Exception:
+                    pass
+
+            return FileContext(
+                path=str(path.relative_to(self.base_path) if self.base_path.is_dir() else path.name),
+                content=content,
+                extension=path.suffix,
+                summary=summary
+            )
         except Exception:
             return None
@@ -3,9 +3,36 @@ import shutil
 import pathlib
 from pathlib import Path
 import whatthepatch
-from typing import List, Tuple, Optional, Any
+from typing import Dict, List, Tuple, Optional, Any
 
 class DiffApplier:
+    @staticmethod
+    def patch_hunks(patch: Any) -> List[Tuple[int, int, int]]:
+        """
+        Changed regions of a parsed patch as (first line, removed lines,
+        added lines), 0-based in the old file. An added line is placed from
+        its new line number and the lines added minus removed before it, so
+        hunks without context lines (diff -U0) are located too.
+        """
+        hunks: List[List[int]] = []
+        current = None
+        shift = 0  # lines added minus lines removed so far
+        for change in patch.changes or []:
+            if change.old is not None and change.new is not None:
+                current = None
+                continue
+            start = change.old - 1 if change.new is None else change.new - 1 - shift
+            if current is None or current[0] + current[1] != start:
+                current = [start, 0, 0]
+                hunks.append(current)
+            if change.new is None:
+                current[1] += 1
+                shift -= 1
+            else:
+                current[2] += 1
+                shift += 1
+        return [tuple(h) for h in hunks]
+
     @staticmethod
     def validate_diff_context(patch: Any, file_content: str) -> bool:
         """
@@ -47,6 +74,9 @@ class DiffApplier:
         # --- PHASE 1: PRE-FLIGHT VALIDATION (DRY RUN) ---
         print("🛡️  Running Structural Guard (Dry Run)...")
         pending_changes: List[Tuple[Path, List[str]]] = []
+        # Touched files: previous bytes (b"" when created) and changed regions
+        # (None for whole files), to update the parse trees and the index
+        edits: Dict[Path, Tuple[bytes, Optional[List[Tuple[int, int, int]]]]] = {}
         
         for patch in patches:
             if not patch.header:
@@ -80,10 +110,12 @@ class DiffApplier:
                 
             # Read content
             content = ""
+            raw = b""
             if target_file.exists():
                 try:
-                    with open(target_file, "r", encoding="utf-8") as f:
-                        content = f.read()
+                    with open(target_file, "rb") as f:
+                        raw = f.read()
+                    content = raw.decode("utf-8")
                 except UnicodeDecodeError:
                      print(f"❌ ERROR: Could not verify context for binary/non-utf8 file: {rel_path}")
                      return False
@@ -102,7 +134,12 @@ class DiffApplier:
                     print("   The code the AI 'saw' does not match the file on disk.")
                     print("   Action aborted to prevent corruption.")
                     return False
-                pending_changes.append((target_file, new_lines))
+                if is_delete:
+                    pending_changes.append((target_file, None))
+                    edits[target_file] = (raw, None)
+                else:
+                    pending_changes.append((target_file, new_lines))
+                    edits[target_file] = (raw, DiffApplier.patch_hunks(patch))
             elif is_new:
                  # valid new file
                  # reconstruct from patch changes for new file
@@ -111,9 +148,7 @@ class DiffApplier:
                      if change.line is not None: 
                         new_lines.append(change.line)
                  pending_changes.append((target_file, new_lines))
-            elif is_delete:
-                 # We mark for deletion by setting new_lines to None
-                 pending_changes.append((target_file, None))
+                 edits[target_file] = (b"", None)
 
         print("✅ Structural Guard Passed. Applying changes...")
 
@@ -151,7 +186,8 @@ class DiffApplier:
                     raise Exception("Post-flight validation failed. Tests are broken.")
                 else:
                     print("✅ Post-flight validation passed!")
-            
+
+            DiffApplier._refresh_parsed(base, edits)
             return True
 
         except Exception as e:
@@ -163,6 +199,44 @@ class DiffApplier:
                     target.unlink()
             return False
 
+    @staticmethod
+    def _refresh_parsed(base: Path, edits: Dict[Path, Tuple[bytes, Optional[List[Tuple[int, int, int]]]]]):
+        """
+        Bring parse trees and the project index up to date with an applied
+        diff. Edited files are re-parsed incrementally from their previous
+        trees (any language with an installed grammar, see
+        axion.core.languages), and an indexed project is updated in one
+        CodeIndexer.apply_edits call: only the definitions touching changed
+        regions are re-extracted, created files are indexed, deleted ones
+        dropped. Best effort: a failure here never fails the applied diff;
+        the files are then marked stale for the next index update.
+        """
+        try:
+            from axion.core.ast_utils import ASTParser, byte_edits, line_offsets
+            from axion.core.indexing import CodeIndexer
+            changes = {}
+            for target_file, (old, hunks) in edits.items():
+                new = target_file.read_bytes() if target_file.exists() else b""
+                if hunks is None:
+                    hunks = [(0, len(line_offsets(old)) - 1, len(line_offsets(new)) - 1)]
+                changes[str(target_file.relative_to(base.resolve()))] = (old, new, hunks)
+            indexer = CodeIndexer(str(base))
+            if indexer.has_index():
+                try:
+                    # Re-parses incrementally as part of the update
+                    indexer.apply_edits(changes)
+                except Exception:
+                    indexer.mark_stale(changes)
+                return
+            parser = ASTParser()
+            for rel_path, (old, new, hunks) in changes.items():
+                if old and new and parser.supports(rel_path):
+                    ranges = byte_edits(old, new, hunks)
+                    if ranges is not None:
+                        parser.reparse(old, new, ranges, parser.language_for(rel_path))
+        except Exception:
+            pass
+
     @staticmethod
     def apply_whole_file(file_path: str, content: str):
         """Safely overwrite or create a file."""
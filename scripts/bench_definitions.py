@@ -0,0 +1,112 @@
+"""
+Benchmark ASTParser.get_definitions against the previous recursive walk.
+
+    python scripts/bench_definitions.py [--functions 5000] [--depth 500] [--repeat 5]
+
+Both run on the same parse tree, so only the extraction is timed: a large
+generated module, and a deeply nested one that the recursive walk cannot handle.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from axion.core.ast_utils import ASTParser
+
+
+def recursive_definitions(tree, content: bytes):
+    """The extraction get_definitions used before (recursive closure over every node)."""
+    definitions = []
+
+    def explore(node):
+        if node.type in ["class_definition", "function_definition", "decorated_definition"]:
+            name_node = node.child_by_field_name("name")
+            if not name_node and node.type == "decorated_definition":
+                inner = node.child_by_field_name("definition")
+                if inner:
+                    name_node = inner.child_by_field_name("name")
+            name = content[name_node.start_byte:name_node.end_byte].decode("utf-8") if name_node else "anonymous"
+            docstring = None
+            body = node.child_by_field_name("body")
+            if body and body.children:
+                for stmt in body.children:
+                    if stmt.type == "expression_statement":
+                        child = stmt.children[0]
+                        if child.type == "string":
+                            docstring = content[child.start_byte:child.end_byte].decode("utf-8").strip('"\' \n')
+                    break
+            definitions.append({
+                "name": name,
+                "type": "class" if "class" in node.type else "function",
+                "start_line": node.start_point[0] + 1,
+                "end_line": node.end_point[0] + 1,
+                "docstring": docstring
+            })
+        for child in node.children:
+            explore(child)
+
+    explore(tree.root_node)
+    return definitions
+
+
+def generated_module(functions: int) -> bytes:
+    parts = []
+    for i in range(functions):
+        if i % 10 == 0:
+            parts.append("@cached\n")
+        parts.append(
+            f"def handler_{i}(request, retries=3):\n"
+            f"    \"\"\"Handle request {i}.\"\"\"\n"
+            f"    payload = {{'id': {i}, 'items': [x * 2 for x in range(retries) if x % 2], 'name': request.name}}\n"
+            f"    return send(payload, timeout=request.timeout + {i} * 0.5) or fallback(lambda r: r.value, payload)\n\n"
+        )
+    return "".join(parts).encode("utf-8")
+
+
+def nested_module(depth: int) -> bytes:
+    lines = []
+    for level in range(depth):
+        lines.append("    " * level + ("def level_%d():" % level if level % 2 == 0 else "if ready:"))
+    lines.append("    " * depth + "pass")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def best_of(repeat: int, func, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare(label: str, content: bytes, repeat: int):
+    parser = ASTParser()
+    tree = parser.parse(content)
+    current = best_of(repeat, parser._collect_definitions, tree, content)
+    found = len(parser._collect_definitions(tree, content))
+    try:
+        previous = best_of(repeat, recursive_definitions, tree, content)
+        previous_str = f"{previous * 1000:8.1f} ms ({len(recursive_definitions(tree, content))} definitions)"
+        speedup = f"{previous / current:5.1f}x"
+    except RecursionError:
+        previous_str = "  RecursionError"
+        speedup = "    -"
+    print(f"{label:<28} recursive: {previous_str} | cursor: {current * 1000:8.1f} ms ({found} definitions) | {speedup}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--functions", type=int, default=5000)
+    parser.add_argument("--depth", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    compare(f"{args.functions} functions", generated_module(args.functions), args.repeat)
+    compare(f"nesting depth {args.depth}", nested_module(args.depth), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
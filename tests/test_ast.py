@@ -48,3 +48,184 @@ def test_context_builder_semantic_summary(tmp_path):
     # Find hello.py context
     hello_ctx = next(f for f in snapshot.files if f.path == "hello.py")
     assert "FUNCTION hello" in hello_ctx.summary
+
+def test_extract_definitions_single_read(tmp_path, mocker):
+    code = "class Box:\n    \"\"\"A box.\"\"\"\n    def open_lid(self):\n        return 'open'\n"
+    file_path = tmp_path / "box.py"
+    file_path.write_text(code)
+
+    parser = ASTParser()
+    spy = mocker.spy(ASTParser, "_read_bytes")
+    defs = parser.extract_definitions(str(file_path))
+    assert spy.call_count == 1
+
+    box = next(d for d in defs if d["name"] == "Box")
+    assert box["source"] == code
+    assert box["docstring"] == "A box."
+    method = next(d for d in defs if d["name"] == "open_lid")
+    assert method["source"] == "    def open_lid(self):\n        return 'open'\n"
+    assert method["keywords"]["open_lid"] == 2  # counted in the name and in the source
+
+    # The indexer's extraction goes through the same path
+    extract = mocker.spy(ASTParser, "extract_definitions")
+    assert parser.extract_file(str(file_path))["definitions"] == defs
+    assert extract.call_count == 1
+
+def test_parse_cache_shared_across_parsers(tmp_path, mocker):
+    from axion.core.ast_utils import parse_cache
+    from axion.core.indexing import CodeIndexer
+    parse_cache.clear()
+    (tmp_path / "shared.py").write_text("def shared_helper():\n    return 42\n")
+    (tmp_path / ".axion").mkdir()
+
+    first, second = ASTParser(), ASTParser()
+    assert first.language is second.language
+    misses = parse_cache.misses
+    CodeIndexer(str(tmp_path)).index_project()
+    assert parse_cache.misses == misses + 1
+
+    # ContextBuilder reuses the indexer's tree, then its summaries come from disk
+    from axion.core import ast_utils
+    prune = mocker.spy(ast_utils, "prune_definitions_cache")
+    builder = ContextBuilder(str(tmp_path))
+    builder.build()
+    assert parse_cache.misses == misses + 1
+    assert list((tmp_path / ".axion" / "definitions").rglob("*.json"))
+    spy = mocker.spy(ASTParser, "_collect_definitions")
+    snapshot = ContextBuilder(str(tmp_path)).build()
+    assert spy.call_count == 0
+    assert "FUNCTION shared_helper" in snapshot.files[0].summary
+    # Only the build that wrote summaries bounds the cache
+    assert prune.call_count == 1
+
+def test_parse_cache_bounded_by_bytes():
+    from axion.core.ast_utils import ParseCache
+    cache = ParseCache(max_bytes=64)
+    parser = ASTParser().parser
+    for i in range(10):
+        cache.parse(parser, f"value_{i} = {i}\n".encode() * 2)
+    assert cache.size <= 64
+    cache.parse(parser, b"value_9 = 9\n" * 2)
+    assert cache.hits == 1
+
+def test_definitions_decorated_once_and_nested(tmp_path):
+    code = (
+        "@dataclass\n"
+        "class Config:\n"
+        "    @property\n"
+        "    def name(self):\n"
+        "        return 'x'\n"
+        "\n"
+        "try:\n"
+        "    def fast(): pass\n"
+        "except ImportError:\n"
+        "    def fast(): return 1\n"
+        "match mode:\n"
+        "    case 'a':\n"
+        "        def handle_a(): pass\n"
+    )
+    parser = ASTParser()
+    defs = parser.get_definitions(str(tmp_path / "x.py"), code.encode())
+    assert [(d["qualname"], d["type"], d["start_line"], d["end_line"]) for d in defs] == [
+        ("Config", "class", 1, 5), ("Config.name", "function", 3, 5),
+        ("fast", "function", 8, 8), ("fast", "function", 10, 10), ("handle_a", "function", 13, 13)]
+
+    # Nesting far beyond the recursion limit
+    deep = "".join("    " * i + ("def f%d():\n" % i if i % 2 == 0 else "if ok:\n") for i in range(500)) + "    " * 500 + "pass\n"
+    assert len(parser.get_definitions(str(tmp_path / "deep.py"), deep.encode())) == 250
+
+def test_source_segment_uses_cached_line_table(tmp_path):
+    import os
+    from axion.core.ast_utils import source_cache
+    file_path = tmp_path / "seg.py"
+    file_path.write_text("a = 1\nb = 2\nc = 3\n")
+    os.utime(file_path, ns=(10**18, 10**18))
+    parser = ASTParser()
+
+    assert parser.get_source_segment(str(file_path), 2, 3) == "b = 2\nc = 3\n"
+    first = source_cache.get(str(file_path))
+    assert source_cache.get(str(file_path)) is first
+
+    # Touched but identical: the table is kept; edited: it is rebuilt
+    os.utime(file_path, ns=(10**18 + 1, 10**18 + 1))
+    assert source_cache.get(str(file_path)).line_starts is first.line_starts
+    file_path.write_text("a = 1\nb = 22\n")
+    assert parser.get_source_segment(str(file_path), 2, 5) == "b = 22\n"
+
+def test_other_languages_loaded_lazily(tmp_path):
+    import sys
+    pytest.importorskip("tree_sitter_javascript", reason="needs tree-sitter-javascript")
+    from axion.core import languages
+    languages._loaded.pop("javascript", None)
+    sys.modules.pop("tree_sitter_javascript", None)
+
+    parser = ASTParser()
+    assert "tree_sitter_javascript" not in sys.modules
+    (tmp_path / "shapes.js").write_text(
+        "// Geometry helpers\n"
+        "import x from 'y';\n"
+        "\n"
+        "/** A circle. */\n"
+        "export class Circle {\n"
+        "  area() { return 3.14 * this.r * this.r; }\n"
+        "  scale = (k) => { this.r *= k; };\n"
+        "}\n"
+        "export const helper = async () => 1;\n"
+    )
+    defs = parser.get_definitions(str(tmp_path / "shapes.js"))
+    assert "tree_sitter_javascript" in sys.modules
+    assert [(d["qualname"], d["type"], d["start_line"], d["end_line"]) for d in defs] == [
+        ("Circle", "class", 5, 8), ("Circle.area", "function", 6, 6),
+        ("Circle.scale", "function", 7, 7), ("helper", "function", 9, 9)]
+    assert defs[0]["docstring"] == "A circle."
+
+    # Summaries through the context builder; unknown grammars are skipped
+    (tmp_path / "notes.rs").write_text("fn main() {}\n")
+    snapshot = ContextBuilder(str(tmp_path), extensions=[".js", ".rs"]).build()
+    files = {f.path: f for f in snapshot.files}
+    assert "CLASS Circle (L5-L8)" in files["shapes.js"].summary
+    assert files.get("notes.rs") is None or files["notes.rs"].summary is None
+
+def test_cpp_definitions_qualified(tmp_path):
+    pytest.importorskip("tree_sitter_cpp", reason="needs tree-sitter-cpp")
+    code = (
+        "namespace geo {\n"
+        "// Base shape\n"
+        "struct Shape { virtual double area() const = 0; };\n"
+        "class Square : public Shape {\n"
+        " public:\n"
+        "  double area() const override { return s * s; }\n"
+        "};\n"
+        "double Circle::area() { return 0; }\n"
+        "template <typename T> T maxv(T a, T b) { return a > b ? a : b; }\n"
+        "}\n"
+        "class Forward;\n"
+    )
+    defs = ASTParser().get_definitions(str(tmp_path / "shapes.hpp"), code.encode())
+    assert [(d["qualname"], d["name"], d["type"]) for d in defs] == [
+        ("geo.Shape", "Shape", "class"), ("geo.Square", "Square", "class"),
+        ("geo.Square.area", "area", "function"), ("geo.Circle.area", "area", "function"),
+        ("geo.maxv", "maxv", "function")]
+    assert defs[0]["docstring"] == "Base shape"
+
+def test_definitions_cache_evicts_least_recently_used(tmp_path):
+    import hashlib
+    import os
+    from axion.core.ast_utils import prune_definitions_cache
+    cache_dir = tmp_path / "definitions"
+    parser = ASTParser(str(cache_dir))
+    sources = [f"def f{i}():\n    return {i}\n".encode() for i in range(6)]
+    for i, code in enumerate(sources):
+        parser.get_definitions(str(tmp_path / "m.py"), code)
+        entry = next(cache_dir.rglob(hashlib.sha1(code).hexdigest() + "-*.json"))
+        os.utime(entry, ns=(i * 10**9, i * 10**9))
+    assert parser.definitions_written == 6
+    # Results of an older format are dropped whatever the size
+    (entry.parent / ("0" * 40 + "-python-1.json")).write_text("[]")
+
+    # A hit makes the oldest entry the most recently used one
+    parser.get_definitions(str(tmp_path / "m.py"), sources[0])
+    size = entry.stat().st_size
+    assert prune_definitions_cache(cache_dir, max_bytes=size * 5) == 1 + 3
+    kept = {p.name.split("-")[0] for p in cache_dir.rglob("*.json")}
+    assert kept == {hashlib.sha1(sources[i]).hexdigest() for i in (0, 4, 5)}
@@ -0,0 +1,153 @@
+from pathlib import Path
+from axion.core import tokens
+from axion.core.tokens import context_budget, estimate_tokens
+from axion.tools.context import ContextBuilder
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hello world") == 2
+    # Long identifiers cost more than one token, indentation runs count once
+    assert estimate_tokens("def parse_retry_after_header(value):\n        return value\n") >= 10
+    assert 0.8 < estimate_tokens("word " * 1000) / 1000 <= 1.0
+
+
+def test_context_budget_per_command_and_model(monkeypatch):
+    monkeypatch.setattr(tokens, "get_config_value", lambda section, key, default=None: default)
+    monkeypatch.setattr(tokens, "_windows", {"small": 8000, "huge": 1_000_000})
+    assert context_budget("solve", "small") == 3200
+    assert context_budget("review", "small") == 4800
+    assert context_budget("plan", "huge") == tokens.MAX_CONTEXT_TOKENS
+    assert context_budget("solve", None) == int(tokens.DEFAULT_CONTEXT_WINDOW * 0.4)
+
+    overrides = {"budgets": {"solve": 1234}, "max_tokens": 1000}
+    monkeypatch.setattr(tokens, "get_config_value", lambda section, key, default=None: overrides.get(key, default))
+    assert context_budget("solve", "huge") == 1234
+    assert context_budget("plan", "huge") == 1000
+
+
+def test_context_packed_within_budget(tmp_path):
+    for i in range(20):
+        body = "".join(f"    value_{j} = compute({j}, {i})\n" for j in range(40))
+        (tmp_path / f"mod_{i:02d}.py").write_text(f"def handler_{i}():\n{body}    return value_0\n")
+
+    unbounded = ContextBuilder(str(tmp_path), max_files=None).build()
+    assert len(unbounded.files) == 20 and unbounded.token_count > 5000
+
+    snapshot = ContextBuilder(str(tmp_path), max_files=None, token_budget=3000).build()
+    assert snapshot.token_count <= 3000
+    assert estimate_tokens(snapshot.render_files()) <= 3000
+    full = [f for f in snapshot.files if not f.summarized]
+    summarized = [f for f in snapshot.files if f.summarized]
+    # Files that no longer fit are reduced to their summaries
+    assert full and summarized and snapshot.files[:len(full)] == full
+    assert snapshot.project_structure == [f.path for f in snapshot.files]
+    assert "value_3 = compute" not in summarized[0].render()
+
+    assert ContextBuilder(str(tmp_path), max_files=None, token_budget=20).build().files == []
+
+
+def test_packing_stops_when_nothing_fits(tmp_path, mocker):
+    from axion.tools.context import MAX_PACK_MISSES
+    # Module-level code only: no summary to fall back on
+    for i in range(200):
+        (tmp_path / f"cfg_{i:03d}.py").write_text("".join(f"VALUE_{j} = compute({j}, {i})\n" for j in range(40)))
+
+    spy = mocker.spy(ContextBuilder, "_read_file")
+    snapshot = ContextBuilder(str(tmp_path), max_files=None, token_budget=600, workers=2, use_cache=False).build()
+    assert len(snapshot.files) == 1
+    assert spy.call_count <= 1 + MAX_PACK_MISSES + 2 * 2
+
+
+def test_files_ranked_for_query(tmp_path):
+    from axion.core.indexing import CodeIndexer
+    from axion.core.ranking import rank_files, recency_scores
+
+    for i in range(30):
+        (tmp_path / f"a{i:02d}_filler.py").write_text(f"def filler_{i}():\n    return {i}\n")
+    (tmp_path / "net").mkdir()
+    (tmp_path / "net" / "__init__.py").write_text("")
+    (tmp_path / "net" / "transport.py").write_text(
+        "def compute_backoff_delay(attempt):\n    return 2 ** attempt\n")
+    (tmp_path / "net" / "session.py").write_text(
+        "from net.transport import compute_backoff_delay\n\ndef send(request):\n    return compute_backoff_delay(1)\n")
+    (tmp_path / "zz_retry_policy.py").write_text("LIMIT = 3\n")
+    CodeIndexer(str(tmp_path)).index_project()
+
+    snapshot = ContextBuilder(str(tmp_path), max_files=3).build(query="compute_backoff_delay retry policy")
+    # Index hits (the importer of the best one first), then the path match, not the first files listed
+    assert [f.path for f in snapshot.files] == [
+        str(Path("net/transport.py")), str(Path("net/session.py")), str(Path("zz_retry_policy.py"))]
+
+    # Without a query, uncommitted and recently committed files come first
+    recent = recency_scores(["b.py", "c.py"], modified=["d.py"])
+    assert rank_files(["a.py", "b.py", "c.py", "d.py"], recent=recent) == ["d.py", "b.py", "c.py", "a.py"]
+
+
+def test_parallel_loading_is_ordered_and_stats_once(tmp_path, mocker):
+    for i in range(40):
+        (tmp_path / f"m{i:02d}.py").write_text(f"def f{i}():\n    return {i}\n")
+
+    serial = ContextBuilder(str(tmp_path), max_files=None, workers=1).build()
+    # Walk listings carry the stats of the directory scan: files are not stat'ed again
+    checks = mocker.spy(ContextBuilder, "_should_include_file")
+    parallel = ContextBuilder(str(tmp_path), max_files=None, workers=8).build()
+    assert checks.call_count == 40 and all(call.args[2] is not None for call in checks.call_args_list)
+    assert parallel == serial and len(parallel.files) == 40
+    assert parallel.files[7].summary == "FUNCTION f7 (L1-L2)"
+
+    # Reads stop a small window past the limit
+    spy = mocker.spy(ContextBuilder, "_read_file")
+    assert len(ContextBuilder(str(tmp_path), max_files=3, workers=2).build().files) == 3
+    assert spy.call_count <= 3 + 2 * 2
+
+
+def test_snapshot_cache_reuses_unchanged_files(tmp_path, mocker):
+    import os
+    for i in range(5):
+        (tmp_path / f"m{i}.py").write_text(f"def f{i}():\n    return {i}\n")
+        os.utime(tmp_path / f"m{i}.py", ns=(10**18, 10**18))
+    (tmp_path / "fresh.py").write_text("def fresh():\n    pass\n")
+
+    # Nothing is written into projects without .axion/
+    ContextBuilder(str(tmp_path)).build()
+    assert not (tmp_path / ".axion").exists()
+
+    (tmp_path / ".axion" / "context" / "unused-options").mkdir(parents=True)
+    os.utime(tmp_path / ".axion" / "context" / "unused-options", (0, 0))
+    first = ContextBuilder(str(tmp_path)).build()
+    # Caches of other options left unused are pruned
+    assert not (tmp_path / ".axion" / "context" / "unused-options").exists()
+    assert len(list((tmp_path / ".axion" / "context").glob("*/*.json"))) == 5
+
+    # Only the file modified too recently to trust its mtime is read again
+    spy = mocker.spy(ContextBuilder, "_read_file")
+    assert ContextBuilder(str(tmp_path)).build() == first
+    assert [call.args[1].name for call in spy.call_args_list] == ["fresh.py"]
+
+    spy.reset_mock()
+    (tmp_path / "m3.py").write_text("def f3():\n    return 'changed'\n")
+    os.utime(tmp_path / "m3.py", ns=(10**18 + 1, 10**18 + 1))
+    (tmp_path / "m4.py").unlink()
+    second = ContextBuilder(str(tmp_path)).build()
+    assert sorted(call.args[1].name for call in spy.call_args_list) == ["fresh.py", "m3.py"]
+    assert "changed" in next(f.content for f in second.files if f.path == "m3.py")
+    assert "m4.py" not in second.project_structure
+    assert len(list((tmp_path / ".axion" / "context").glob("*/*.json"))) == 4
+
+    # Entries are per file: a small build reads only those of the files it packs
+    from axion.tools.context import SnapshotCache
+    entries = mocker.spy(SnapshotCache, "get")
+    assert len(ContextBuilder(str(tmp_path), max_files=1, workers=1).build().files) == 1
+    assert entries.call_count <= 1 + 2
+
+    # Different options use their own cache
+    spy.reset_mock()
+    ContextBuilder(str(tmp_path), max_file_size_kb=1).build()
+    assert spy.call_count == 5
+
+def test_search_code_without_semantic_context(tmp_path):
+    (tmp_path / "m.py").write_text("def f():\n    return 1\n")
+    builder = ContextBuilder(str(tmp_path), use_semantical_context=False)
+    assert builder.search_code("return") == []
+    assert [f.summary for f in builder.build().files] == [None]
@@ -66,3 +66,28 @@ def test_apply_new_file(tmp_path):
     new_file = tmp_path / "new_file.py"
     assert new_file.exists()
     assert new_file.read_text() == "print('new file')\n"
+
+def test_patch_hunks_locate_insertions_without_context():
+    import difflib
+    import random
+    import whatthepatch
+    from axion.core.ast_utils import byte_edits
+
+    # Pure insertions right after another hunk, and hunks with no context lines at all
+    rng = random.Random(7)
+    for _ in range(300):
+        old = [f"line {rng.randrange(6)}\n" for _ in range(rng.randrange(12))]
+        new = list(old)
+        for _ in range(rng.randrange(1, 4)):
+            new.insert(rng.randrange(len(new) + 1), f"added {rng.randrange(99)}\n")
+            if new and rng.random() < 0.5:
+                del new[rng.randrange(len(new))]
+        if new == old:
+            continue
+        for context in (0, 1, 3):
+            diff = "".join(difflib.unified_diff(old, new, "a/f.py", "b/f.py", n=context))
+            hunks = DiffApplier.patch_hunks(next(whatthepatch.parse_patch(diff)))
+            assert byte_edits("".join(old).encode(), "".join(new).encode(), hunks) is not None, diff
+
+    patch = next(whatthepatch.parse_patch("--- a/f.py\n+++ b/f.py\n@@ -2,0 +3 @@\n+x = 1\n@@ -8,0 +10 @@\n+y = 2\n"))
+    assert DiffApplier.patch_hunks(patch) == [(2, 0, 1), (8, 0, 1)]
@@ -0,0 +1,55 @@
+import shutil
+import subprocess
+import pytest
+from axion.core.files import list_files
+from axion.core.indexing import CodeIndexer
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+def _git(repo, *args):
+    subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True)
+
+def _make_repo(tmp_path):
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "core.py").write_text("def tracked():\n    pass\n")
+    (tmp_path / "app" / "gone.py").write_text("def gone():\n    pass\n")
+    (tmp_path / ".gitignore").write_text("build/\n")
+    _git(tmp_path, "init", "-q")
+    _git(tmp_path, "add", "-A")
+    _git(tmp_path, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init")
+    (tmp_path / "app" / "gone.py").unlink()
+    (tmp_path / "app" / "new.py").write_text("def untracked():\n    pass\n")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "generated.py").write_text("def ignored():\n    pass\n")
+    return tmp_path
+
+def test_git_listing(tmp_path):
+    repo = _make_repo(tmp_path)
+    listing = list_files(repo, suffixes=[".py"])
+    assert listing.source == "git"
+    assert list(listing.files) == ["app/core.py", "app/new.py"]
+    assert set(listing.blobs) == {"app/core.py"}
+
+    (repo / "app" / "core.py").write_text("def tracked():\n    return 1\n")
+    assert list_files(repo, suffixes=[".py"]).blobs == {}
+
+    walked = list_files(repo, suffixes=[".py"], use_git=False)
+    assert walked.source == "walk"
+    assert list(walked.files) == ["app/core.py", "app/new.py", "build/generated.py"]
+
+def test_indexer_uses_blob_hashes(tmp_path, mocker):
+    repo = _make_repo(tmp_path)
+    indexer = CodeIndexer(str(repo))
+    assert indexer.index_project()["added"] == 2
+    assert indexer.search("ignored") == []
+
+    # Clean tracked files are settled by their blob, without reading them
+    mocker.patch("axion.core.indexing.file_digest", side_effect=AssertionError)
+    stats = CodeIndexer(str(repo)).index_project()
+    assert stats["unchanged"] == 2
+    mocker.stopall()
+
+    (repo / "app" / "core.py").write_text("def tracked_again():\n    pass\n")
+    reindexed = CodeIndexer(str(repo))
+    assert reindexed.index_project()["modified"] == 1
+    assert reindexed.search("tracked_again")[0]["path"] == "app/core.py"
@@ -0,0 +1,537 @@
+import json
+from pathlib import Path
+import pytest
+from axion.core.indexing import CodeIndexer
+from axion.core.search import InvertedIndex, name_terms
+from axion.core.trigram import query_plan
+
+SAMPLE = '''
+class ReasoningEngine:
+    """Coordinates the model calls."""
+    def run_solve(self, query):
+        return self.model.chat(query)
+
+def parse_retry_after(header):
+    """Parse the retry-after header."""
+    return int(header)
+'''
+
+def _make_project(tmp_path):
+    (tmp_path / "engine.py").write_text(SAMPLE)
+    (tmp_path / "util.py").write_text("def helper():\n    return 'nothing relevant'\n")
+    return tmp_path
+
+def test_name_terms_split_identifiers():
+    assert {"reasoningengine", "reasoning", "engine"} <= name_terms("ReasoningEngine")
+    assert {"run_solve", "run", "solve"} <= name_terms("run_solve")
+
+def test_bm25_ranks_name_matches_first():
+    index = InvertedIndex()
+    index.add_document({"engine": 1, "other": 10}, names=["helper"])
+    index.add_document({"engine": 1}, names=["engine"])
+    hits = index.search(["engine"], n_results=2)
+    assert [doc_id for _, doc_id in hits] == [1, 0]
+
+def test_index_and_search(tmp_path):
+    project = _make_project(tmp_path)
+    indexer = CodeIndexer(str(project))
+    indexer.index_project()
+
+    results = indexer.search("retry after header")
+    assert results[0]["name"] == "parse_retry_after"
+    assert indexer.search("engine")[0]["name"] == "ReasoningEngine"
+    assert indexer.search("") == []
+
+    # The index is persisted and reloaded without re-parsing
+    reloaded = CodeIndexer(str(project))
+    assert reloaded.search("retry")[0]["name"] == "parse_retry_after"
+
+def test_legacy_index_is_upgraded(tmp_path):
+    index_file = tmp_path / ".axion" / "index.json"
+    index_file.parent.mkdir()
+    index_file.write_text(json.dumps([{
+        "path": "a.py", "name": "legacy_func", "type": "function",
+        "start_line": 1, "end_line": 2, "keywords": ["legacy_func", "cache"],
+        "content": "def legacy_func(): ..."
+    }]))
+    indexer = CodeIndexer(str(tmp_path))
+    assert indexer.search("cache")[0]["name"] == "legacy_func"
+
+def test_incremental_reindex(tmp_path, mocker):
+    project = _make_project(tmp_path)
+    indexer = CodeIndexer(str(project))
+    stats = indexer.index_project()
+    assert stats["added"] == 2
+
+    # Nothing changed: no file is parsed again
+    spy = mocker.spy(indexer, "_index_file")
+    stats = indexer.index_project()
+    assert stats == {"added": 0, "modified": 0, "deleted": 0, "unchanged": 2}
+    assert spy.call_count == 0
+
+    # Modify one file, delete another
+    (project / "engine.py").write_text("def brand_new_function():\n    pass\n")
+    (project / "util.py").unlink()
+    stats = indexer.index_project()
+    assert stats["modified"] == 1 and stats["deleted"] == 1
+    assert spy.call_count == 1
+
+    names = {item["name"] for item in indexer.data}
+    assert names == {"brand_new_function"}
+    assert indexer.search("engine") == []
+    assert indexer.search("brand")[0]["name"] == "brand_new_function"
+
+def test_parallel_index_matches_serial(tmp_path):
+    project = _make_project(tmp_path)
+    for i in range(4):
+        (project / f"mod_{i}.py").write_text(f"def func_{i}():\n    return {i}\n")
+
+    serial = CodeIndexer(str(project))
+    serial.index_project(full=True)
+    serial_data = serial.data
+
+    parallel = CodeIndexer(str(project), jobs=2)
+    parallel.index_project(full=True)
+    assert parallel.data == serial_data
+    assert parallel.shards[""].inverted.to_dict() == serial.shards[""].inverted.to_dict()
+
+def test_binary_index_is_mapped_lazily(tmp_path):
+    project = _make_project(tmp_path)
+    CodeIndexer(str(project)).index_project()
+    assert (project / ".axion" / "gen-000001" / "index.bin").exists()
+
+    indexer = CodeIndexer(str(project))
+    assert indexer.shards == {}  # nothing read at construction
+
+    results = indexer.search("retry after header")
+    assert results[0]["name"] == "parse_retry_after"
+    assert results[0]["path"] == "engine.py"
+    # Served from the memory map, without materializing the entries
+    shard = indexer.shards[""]
+    assert shard.get_reader() is not None and not shard.loaded and indexer.data == []
+
+    # The mapped reader and the in-memory index rank identically
+    loaded = CodeIndexer(str(project))
+    loaded.load_index()
+    assert loaded.search("engine model") == indexer.search("engine model")
+    indexer.close()
+
+def test_export_json(tmp_path):
+    project = _make_project(tmp_path)
+    indexer = CodeIndexer(str(project))
+    indexer.index_project()
+    out = tmp_path / "export.json"
+    indexer.export_json(str(out))
+    exported = json.loads(out.read_text())
+    assert {e["name"] for e in exported["entries"]} == {"ReasoningEngine", "run_solve", "parse_retry_after", "helper"}
+    assert "retry" in exported["index"]["postings"]
+
+def test_vector_and_hybrid_search(tmp_path):
+    pytest.importorskip("numpy")
+    project = _make_project(tmp_path)
+    indexer = CodeIndexer(str(project))
+    indexer.index_project()
+    assert len(indexer.shards[""].vectors) == len(indexer.data)
+
+    # "retry_after" is not a whole token of the code, only a run of subwords
+    assert indexer.search("retry_after", mode="keyword") == []
+    assert indexer.search("retry_after", mode="vector")[0]["name"] == "parse_retry_after"
+    assert indexer.search("retry_after header", mode="hybrid")[0]["name"] == "parse_retry_after"
+
+    # Served from the memory-mapped matrix in a fresh process view
+    reader = CodeIndexer(str(project))
+    assert reader.search("retry_after", mode="vector")[0]["name"] == "parse_retry_after"
+    reader.close()
+
+    # Vectors follow incremental updates
+    (project / "util.py").unlink()
+    indexer.index_project()
+    assert len(indexer.shards[""].vectors) == len(indexer.data)
+
+def _make_monorepo(tmp_path):
+    for package, func in (("billing", "charge_card"), ("shipping", "track_parcel"), ("search", "rank_results")):
+        (tmp_path / package).mkdir()
+        (tmp_path / package / "api.py").write_text(f"def {func}(order):\n    \"\"\"Handle the {package} order.\"\"\"\n    return order\n")
+    (tmp_path / "setup.py").write_text("def setup_order():\n    pass\n")
+    return tmp_path
+
+def test_sharded_index(tmp_path, mocker):
+    project = _make_monorepo(tmp_path)
+    indexer = CodeIndexer(str(project), sharded=True)
+    indexer.index_project()
+    shards_dir = project / ".axion" / "shards"
+    assert sorted(p.name for p in shards_dir.iterdir() if p.is_dir()) == ["_root", "billing", "search", "shipping"]
+
+    # Layout is detected from disk; queries fan out and merge across shards
+    reader = CodeIndexer(str(project))
+    assert reader.sharded
+    assert {r["name"] for r in reader.search("order", n_results=10)} == {"charge_card", "track_parcel", "rank_results", "setup_order"}
+    assert reader.search("parcel")[0]["name"] == "track_parcel"
+
+    # A scoped query only opens the shard covering the subtree
+    scoped = CodeIndexer(str(project))
+    results = scoped.search("order", n_results=10, scope="billing")
+    assert [r["name"] for r in results] == ["charge_card"]
+    assert list(scoped.shards) == ["billing"]
+
+    # Changing one package rewrites only its shard
+    (project / "billing" / "api.py").write_text("def refund_card():\n    pass\n")
+    stats = CodeIndexer(str(project)).index_project()
+    assert stats["modified"] == 1
+    assert (shards_dir / "shipping" / "CURRENT").read_text() == "gen-000001"
+    assert (shards_dir / "billing" / "CURRENT").read_text() == "gen-000002"
+    assert CodeIndexer(str(project)).search("refund")[0]["path"] == str(Path("billing") / "api.py")
+
+    # Removing a whole package drops its shard
+    (project / "search" / "api.py").unlink()
+    CodeIndexer(str(project)).index_project()
+    assert not (shards_dir / "search").exists()
+    assert CodeIndexer(str(project)).search("rank_results") == []
+
+def test_switching_layout_removes_stale_index(tmp_path):
+    project = _make_monorepo(tmp_path)
+    CodeIndexer(str(project)).index_project()
+    CodeIndexer(str(project), sharded=True).index_project()
+    assert not (project / ".axion" / "CURRENT").exists()
+    CodeIndexer(str(project), sharded=False).index_project()
+    assert not (project / ".axion" / "shards").exists()
+    assert CodeIndexer(str(project)).search("parcel")[0]["name"] == "track_parcel"
+
+def test_cross_references(tmp_path):
+    pkg = tmp_path / "app"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("")
+    (pkg / "engine.py").write_text(SAMPLE)
+    (pkg / "cli.py").write_text(
+        "from .engine import ReasoningEngine, parse_retry_after\n"
+        "def main(header):\n"
+        "    delay = parse_retry_after(header)\n"
+        "    return ReasoningEngine().run_solve(delay)\n"
+    )
+    (tmp_path / "tool.py").write_text("import app.engine as eng\nprint(eng.parse_retry_after('1'))\n")
+
+    indexer = CodeIndexer(str(tmp_path))
+    indexer.index_project()
+    callers = indexer.callers_of("parse_retry_after")
+    assert [(c["path"], c["caller"], c["line"]) for c in callers] == [
+        ("app/cli.py", "main", 3), ("tool.py", "", 2)]
+    assert [c["callee"] for c in indexer.callees_of("ReasoningEngine.run_solve")] == ["chat"]
+    assert indexer.importers_of("app.engine") == ["app/cli.py", "tool.py"]
+    assert indexer.importers_of("app") == ["app/cli.py", "tool.py"]
+    assert indexer.importers_of("ap") == []
+
+    # Persisted next to the index and refreshed incrementally
+    (tmp_path / "tool.py").write_text("print('no imports')\n")
+    reloaded = CodeIndexer(str(tmp_path))
+    reloaded.index_project()
+    assert reloaded.importers_of("app.engine") == ["app/cli.py"]
+    assert [c["path"] for c in reloaded.callers_of("ReasoningEngine.run_solve")] == ["app/cli.py"]
+
+def test_query_cache_follows_index_generation(tmp_path, mocker):
+    project = _make_project(tmp_path)
+    indexer = CodeIndexer(str(project))
+    indexer.index_project()
+    generation = indexer.generation
+
+    spy = mocker.spy(CodeIndexer, "_search")
+    first = indexer.search("Retry-After header")
+    first[0]["name"] = "mutated by caller"
+    # Same normalized query from a fresh indexer (as ContextBuilder does): served from cache
+    again = CodeIndexer(str(project)).search("retry after  HEADER")
+    assert again[0]["name"] == "parse_retry_after"
+    assert spy.call_count == 1
+
+    (project / "util.py").write_text("def retry_after_header():\n    return 'retry after header'\n")
+    indexer.index_project()
+    assert indexer.generation == generation + 1
+    assert indexer.search("retry after header")[0]["name"] == "retry_after_header"
+    assert spy.call_count == 2
+
+def test_query_cache_keyed_on_bound_snapshots(tmp_path):
+    project = _make_project(tmp_path)
+    (project / "pkg").mkdir()
+    (project / "pkg" / "a.py").write_text("def alpha_old():\n    pass\n")
+    CodeIndexer(str(project), sharded=True).index_project()
+    reader = CodeIndexer(str(project))
+    assert reader.search("alpha")[0]["name"] == "alpha_old"
+
+    # Another process re-indexes: the long-lived reader still serves its snapshot,
+    # and must not cache that answer for indexers reading the new one
+    (project / "pkg" / "a.py").write_text("def alpha_new():\n    pass\n")
+    CodeIndexer(str(project)).index_project()
+    assert reader.search("alpha", n_results=3)[0]["name"] == "alpha_old"
+    assert CodeIndexer(str(project)).search("alpha", n_results=3)[0]["name"] == "alpha_new"
+
+def test_query_cache_after_stale_bound_full_rebuild(tmp_path, mocker):
+    from axion.core import indexing
+    project = _make_project(tmp_path)
+    (project / "a.py").write_text("def alpha_old():\n    pass\n")
+    CodeIndexer(str(project)).index_project()
+    stale = CodeIndexer(str(project))
+    assert stale.search("alpha")[0]["name"] == "alpha_old"
+
+    (project / "a.py").write_text("def alpha_mid():\n    pass\n")
+    CodeIndexer(str(project)).index_project()
+    assert CodeIndexer(str(project)).search("alpha")[0]["name"] == "alpha_mid"
+
+    # A full rebuild from the writer bound to the first snapshot publishes a new
+    # one: results cached for the snapshot it replaces are not served for it,
+    # even by processes whose cache the writer cannot invalidate
+    mocker.patch.object(indexing.query_cache, "invalidate")
+    (project / "a.py").write_text("def alpha_new():\n    pass\n")
+    stale.index_project(full=True)
+    assert CodeIndexer(str(project)).search("alpha")[0]["name"] == "alpha_new"
+
+def test_trigram_grep(tmp_path):
+    project = _make_project(tmp_path)
+    indexer = CodeIndexer(str(project))
+    indexer.index_project()
+    assert (project / ".axion" / "gen-000001" / "trigrams.bin").exists()
+
+    hits = indexer.grep("retry_aft")
+    assert [(h["path"], h["line"], h["column"]) for h in hits] == [("engine.py", 7, 11)]
+    assert indexer.grep("RETRY-AFTER", ignore_case=True)[0]["line"] == 8
+    assert indexer.grep("RETRY-AFTER") == []
+
+    hits = indexer.grep(r"def\s+(helper|run_solve)\(", regex=True)
+    assert [(h["path"], h["line"]) for h in hits] == [("engine.py", 4), ("util.py", 1)]
+    assert indexer.grep(r"nothing\s+relevant", regex=True)[0]["path"] == "util.py"
+    # Only files holding every required trigram are read back
+    reader = indexer.shards[""].get_trigram_reader()
+    assert reader.candidates(query_plan(r"nothing\s+relevant", regex=True)) == ["util.py"]
+    assert reader.candidates(query_plan(r"\w+", regex=True)) == ["engine.py", "util.py"]
+
+    (project / "util.py").write_text("def helper():\n    return 'retry_after'\n")
+    indexer.index_project()
+    assert [h["path"] for h in indexer.grep("retry_after")] == ["engine.py", "util.py"]
+
+    # Non-ASCII letters are not case-folded by the index: they break the literal
+    (project / "notes.py").write_text("# Ärger mit Übergrößen\n", encoding="utf-8")
+    indexer.index_project()
+    assert [h["path"] for h in indexer.grep("ärger mit übergrößen", ignore_case=True)] == ["notes.py"]
+    assert indexer.grep("ärger") == []
+
+def test_streaming_build_matches_in_memory(tmp_path, mocker):
+    project = _make_project(tmp_path)
+    (project / "pkg").mkdir()
+    for i in range(5):
+        (project / "pkg" / f"mod{i}.py").write_text(f"def handler_{i}(request):\n    return retry_after_{i}(request)\n")
+    expected = CodeIndexer(str(project), memory_limit=0)
+    expected.index_project()
+    queries = ["retry after", "handler request", "engine"]
+    baseline = [expected.search(q, n_results=10, mode="hybrid") for q in queries]
+    expected_grep = expected.grep("retry_after_")
+    expected_callers = expected.callers_of("retry_after_3")
+
+    # A tiny ceiling spills every file into its own segment
+    indexer = CodeIndexer(str(project), memory_limit=1)
+    indexer.index_project(full=True)
+    assert not indexer.shards[""].loaded
+    assert not (project / ".axion" / "segments").exists()
+    fresh = CodeIndexer(str(project))
+    assert [fresh.search(q, n_results=10, mode="hybrid") for q in queries] == baseline
+    assert fresh.grep("retry_after_") == expected_grep
+    assert fresh.callers_of("retry_after_3") == expected_callers
+    assert fresh.index_project()["unchanged"] == 7
+
+    # An interrupted build resumes from its segments
+    mocker.patch("axion.core.indexing.merge_indexes", side_effect=KeyboardInterrupt)
+    with pytest.raises(KeyboardInterrupt):
+        CodeIndexer(str(project), memory_limit=1).index_project(full=True)
+    mocker.stopall()
+    parse = mocker.spy(CodeIndexer, "_index_file")
+    resumed = CodeIndexer(str(project), memory_limit=1)
+    resumed.index_project(full=True)
+    assert parse.call_count == 0
+    assert CodeIndexer(str(project)).search("handler request", n_results=10, mode="hybrid") == baseline[1]
+
+def test_snapshots_are_published_atomically(tmp_path, mocker):
+    project = _make_project(tmp_path)
+    writer = CodeIndexer(str(project))
+    writer.index_project()
+
+    # A reader bound to generation 1 keeps serving it while a rebuild publishes generation 2
+    reader = CodeIndexer(str(project))
+    assert reader.search("helper")[0]["name"] == "helper"
+    (project / "util.py").write_text("def assistant():\n    pass\n")
+    writer.index_project()
+    assert (project / ".axion" / "CURRENT").read_text() == "gen-000002"
+    assert reader.search("helper")[0]["name"] == "helper"
+    assert CodeIndexer(str(project)).search("assistant")[0]["name"] == "assistant"
+
+    # A writer that dies before publishing leaves the current snapshot untouched
+    (project / "util.py").write_text("def broken():\n    pass\n")
+    mocker.patch("axion.core.indexing.write_trigrams", side_effect=OSError("disk full"))
+    with pytest.raises(OSError):
+        CodeIndexer(str(project)).index_project()
+    mocker.stopall()
+    assert CodeIndexer(str(project)).search("assistant")[0]["name"] == "assistant"
+
+    # Another process published meanwhile: a long-lived writer reloads before updating
+    CodeIndexer(str(project)).index_project()
+    (project / "util.py").write_text("def assistant():\n    pass\n\ndef extra():\n    pass\n")
+    writer.refresh_paths(["util.py"])
+    assert {r["name"] for r in CodeIndexer(str(project)).search("assistant extra", n_results=5)} == {"assistant", "extra"}
+    # The crashed writer's gen-000003 is skipped, then pruned with the older snapshots
+    assert sorted(p.name for p in (project / ".axion").glob("gen-*")) == ["gen-000004", "gen-000005"]
+
+def test_stale_bound_writer_never_reuses_the_current_snapshot(tmp_path, mocker):
+    from axion.core import indexing
+    project = _make_project(tmp_path)
+    CodeIndexer(str(project)).index_project()
+    # Bound to gen-000001 by its first search
+    stale = CodeIndexer(str(project))
+    assert stale.search("helper")[0]["name"] == "helper"
+    (project / "util.py").write_text("def assistant():\n    pass\n")
+    CodeIndexer(str(project)).index_project()
+    assert (project / ".axion" / "CURRENT").read_text() == "gen-000002"
+
+    removed = mocker.spy(indexing.shutil, "rmtree")
+    stale.index_project(full=True)
+    assert (project / ".axion" / "CURRENT").read_text() == "gen-000003"
+    assert all(Path(call.args[0]).name != "gen-000002" for call in removed.call_args_list)
+    assert CodeIndexer(str(project)).generation == 3
+
+def test_symbol_table_lookup(tmp_path, monkeypatch):
+    project = _make_project(tmp_path)
+    (project / "pkg").mkdir()
+    (project / "pkg" / "other.py").write_text("class ReasoningEngineFactory:\n    def build(self):\n        pass\n")
+    indexer = CodeIndexer(str(project), memory_limit=1)
+    indexer.index_project()
+
+    fresh = CodeIndexer(str(project))
+    hit = fresh.find_symbol("ReasoningEngine.run_solve")
+    assert [(e["path"], e["start_line"], e["end_line"]) for e in hit] == [("engine.py", 4, 5)]
+    assert fresh.definition_source(hit[0]).lstrip().startswith("def run_solve(self, query):")
+    assert [e["qualname"] for e in fresh.find_symbol("ReasoningEngine", prefix=True)] == [
+        "ReasoningEngine", "ReasoningEngine.run_solve", "ReasoningEngineFactory", "ReasoningEngineFactory.build"]
+    # Bare method names fall back to the name postings
+    assert [e["qualname"] for e in fresh.find_symbol("build")] == ["ReasoningEngineFactory.build"]
+    assert fresh.find_symbol("missing") == []
+
+    from axion.plugins.symbols import find_symbol
+    monkeypatch.chdir(project)
+    source = find_symbol("parse_retry_after")
+    assert source.startswith("# engine.py:7-9 (parse_retry_after)\ndef parse_retry_after(header):")
+    assert "class ReasoningEngine" not in source
+    assert "Did you mean: ReasoningEngine.run_solve" in find_symbol("ReasoningEngine.run")
+
+    # Lines inserted above a definition: its file is re-indexed, never sliced at stale lines
+    (project / "m.py").write_text("def first():\n    return 1\n\ndef target():\n    return 2\n")
+    CodeIndexer(str(project)).index_project()
+    stale = CodeIndexer(str(project)).find_symbol("target")[0]
+    (project / "m.py").write_text("import os\nimport sys\ndef first():\n    return 1\n\ndef target():\n    return 2\n")
+    with pytest.raises(ValueError):
+        CodeIndexer(str(project)).definition_source(stale)
+    assert find_symbol("target") == "# m.py:6-7 (target)\ndef target():\n    return 2\n"
+
+def test_long_definitions_chunked_and_fetched_lazily(tmp_path):
+    project = _make_project(tmp_path)
+    body = "".join(f"    step_{i} = compute({i})\n" for i in range(150))
+    (project / "long.py").write_text(
+        "def long_pipeline(data):\n    \"\"\"Runs every step.\"\"\"\n" + body + "    return finalize_checksum(data)\n")
+    indexer = CodeIndexer(str(project))
+    indexer.index_project()
+
+    entries = [e for e in indexer.data if e["path"] == "long.py"]
+    head, chunks = entries[0], entries[1:]
+    assert (head["type"], head["start_line"], head["end_line"]) == ("function", 1, 153)
+    assert [c["type"] for c in chunks] == ["chunk"] * len(chunks) and len(chunks) >= 1
+    assert all(c["end_line"] - c["start_line"] < 80 for c in chunks)
+    # Chunks are retrievable but never listed as symbols
+    assert [e["type"] for e in indexer.find_symbol("long_pipeline")] == ["function"]
+
+    hit = indexer.search("finalize_checksum", n_results=1)[0]
+    assert hit["type"] == "chunk" and hit["path"] == "long.py"
+    full = indexer.fetch_spans([hit])[0]
+    assert len(full["content"]) > 500
+    assert full["content"].endswith("    return finalize_checksum(data)\n")
+
+    # A file edited after indexing keeps the stored preview
+    (project / "long.py").write_text("def long_pipeline(data):\n    pass\n")
+    assert indexer.fetch_spans([hit])[0]["content"] == hit["content"]
+
+def test_diff_updates_index_incrementally(tmp_path, mocker):
+    from axion.core.ast_utils import ASTParser, parse_cache
+    from axion.tools.diff import DiffApplier
+    project = _make_project(tmp_path)
+    indexer = CodeIndexer(str(project))
+    indexer.index_project()
+
+    diff = """--- engine.py
++++ engine.py
+@@ -4,2 +4,4 @@
+     def run_solve(self, query):
+-        return self.model.chat(query)
++        # Retry once on a rate limit
++        reply = self.model.chat(query)
++        return reply or self.model.chat(query)
+ 
+"""
+    from axion.core.indexing import IndexShard
+    saves = mocker.spy(IndexShard, "save")
+    full_parse = mocker.spy(ASTParser, "_collect_definitions")
+    assert DiffApplier.apply_unified_diff(diff, base_path=str(project))
+    # Published incrementally in one update: only the edited method (and its class) are re-extracted
+    assert saves.call_count == 1
+    assert [c.kwargs.get("ranges") is not None for c in full_parse.call_args_list] == [True]
+    assert CodeIndexer(str(project)).stale_paths() == []
+    new = (project / "engine.py").read_bytes()
+    misses = parse_cache.misses
+    ASTParser().parse(new)
+    assert parse_cache.misses == misses
+
+    def spans(ix):
+        return sorted((e["qualname"], e["type"], e["start_line"], e["end_line"], e["start_byte"], e["end_byte"], e["content"])
+                      for e in ix.find_symbol("", prefix=True, limit=100))
+
+    updated = CodeIndexer(str(project))
+    assert updated.search("rate limit")[0]["qualname"] == "ReasoningEngine.run_solve"
+    rebuilt = CodeIndexer(str(tmp_path / "copy"))
+    (tmp_path / "copy").mkdir()
+    for name in ("engine.py", "util.py"):
+        (tmp_path / "copy" / name).write_bytes((project / name).read_bytes())
+    rebuilt.index_project()
+    assert spans(updated) == spans(rebuilt)
+    assert [e["start_line"] for e in updated.find_symbol("parse_retry_after")] == [9]
+
+    # Created and deleted files are published too
+    saves.reset_mock()
+    assert DiffApplier.apply_unified_diff(
+        "--- /dev/null\n+++ retry.py\n@@ -0,0 +1,2 @@\n+def backoff_delay(attempt):\n+    return 2 ** attempt\n",
+        base_path=str(project))
+    assert DiffApplier.apply_unified_diff(
+        "--- util.py\n+++ /dev/null\n@@ -1,2 +0,0 @@\n-def helper():\n-    return 'nothing relevant'\n",
+        base_path=str(project))
+    assert saves.call_count == 2 and not (project / "util.py").exists()
+    after = CodeIndexer(str(project))
+    assert [e["path"] for e in after.find_symbol("backoff_delay")] == ["retry.py"]
+    assert after.find_symbol("helper") == []
+
+    # A failed update leaves stale marks, published before the next search
+    mocker.patch.object(CodeIndexer, "apply_edits", side_effect=OSError("disk full"))
+    (project / "retry.py").write_text("def backoff_delay(attempt):\n    return 3 ** attempt\n")
+    assert DiffApplier.apply_unified_diff(
+        "--- a/retry.py\n+++ b/retry.py\n@@ -2 +2 @@\n-    return 3 ** attempt\n+    return min(3 ** attempt, 60)\n",
+        base_path=str(project))
+    assert CodeIndexer(str(project)).stale_paths() == ["retry.py"]
+    from axion.tools.context import ContextBuilder
+    ContextBuilder(str(project)).build(query="backoff delay")
+    assert CodeIndexer(str(project)).stale_paths() == []
+    assert "min(3 ** attempt, 60)" in CodeIndexer(str(project)).search("backoff delay")[0]["content"]
+
+def test_typescript_files_indexed(tmp_path):
+    pytest.importorskip("tree_sitter_typescript", reason="needs tree-sitter-typescript")
+    _make_project(tmp_path)
+    (tmp_path / "client.ts").write_text(
+        "/** Retries failed requests. */\n"
+        "export class RetryClient {\n"
+        "  backoffDelay(attempt: number): number { return 2 ** attempt; }\n"
+        "}\n"
+    )
+    indexer = CodeIndexer(str(tmp_path))
+    indexer.index_project()
+
+    hits = indexer.find_symbol("backoffDelay")
+    assert [(h["path"], h["qualname"], h["start_line"]) for h in hits] == [("client.ts", "RetryClient.backoffDelay", 3)]
+    assert indexer.search("RetryClient", n_results=1)[0]["path"] == "client.ts"
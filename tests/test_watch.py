@@ -0,0 +1,60 @@
+import sys
+import pytest
+from axion.core.indexing import CodeIndexer
+from axion.core.watch import IndexWatcher
+
+def _indexed_project(tmp_path):
+    (tmp_path / "a.py").write_text("def alpha():\n    pass\n")
+    indexer = CodeIndexer(str(tmp_path))
+    indexer.index_project()
+    return indexer
+
+@pytest.mark.parametrize("use_inotify", [
+    pytest.param(True, marks=pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")),
+    False,
+])
+def test_watcher_reindexes_touched_files(tmp_path, use_inotify):
+    indexer = _indexed_project(tmp_path)
+    watcher = IndexWatcher(indexer, use_inotify=use_inotify, poll_interval=0.05)
+    assert watcher.mode == ("inotify" if use_inotify else "polling")
+    try:
+        assert watcher.step(timeout=0.05) is None
+
+        (tmp_path / "a.py").write_text("def alpha_renamed():\n    return 1\n")
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "b.py").write_text("def beta():\n    pass\n")
+        stats = watcher.step(timeout=2)
+        assert stats["modified"] == 1 and stats["added"] == 1
+
+        # Readers opening the published snapshot see the new definitions
+        reader = CodeIndexer(str(tmp_path))
+        assert reader.search("beta")[0]["path"].endswith("b.py")
+        assert reader.search("alpha_renamed")[0]["name"] == "alpha_renamed"
+        reader.close()
+
+        (tmp_path / "sub" / "b.py").unlink()
+        stats = watcher.step(timeout=2)
+        assert stats["deleted"] == 1
+    finally:
+        watcher.backend.close()
+
+def test_watcher_skips_gitignored_paths(tmp_path):
+    import subprocess
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    (tmp_path / ".gitignore").write_text("build/\nnode_modules/\n")
+    (tmp_path / "node_modules" / "dep").mkdir(parents=True)
+    indexer = _indexed_project(tmp_path)
+
+    if sys.platform.startswith("linux"):
+        watcher = IndexWatcher(indexer)
+        try:
+            watched = {str(p.relative_to(tmp_path)) for p in watcher.backend._dirs.values()}
+            assert "node_modules" not in watched and "node_modules/dep" not in watched
+        finally:
+            watcher.backend.close()
+
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "gen.py").write_text("def generated():\n    pass\n")
+    stats = indexer.refresh_paths(["build/gen.py"])
+    assert stats["added"] == 0
+    assert indexer.index_project()["deleted"] == 0